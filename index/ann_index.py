@@ -0,0 +1,197 @@
+import os
+import json
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from index.flat_index import FlatVectorIndex, VECTORS_FILENAME, normalize_rows, top_k
+except ImportError:  # run from inside index/
+    from flat_index import FlatVectorIndex, VECTORS_FILENAME, normalize_rows, top_k
+
+try:
+    import hnswlib
+except ImportError:  # optional: only needed for the HNSW index
+    hnswlib = None
+
+IVF_FILENAME = "ivf.npz"
+HNSW_FILENAME = "hnsw.bin"
+HNSW_PARAMS_FILENAME = "hnsw.json"
+ASSIGN_BLOCK_ROWS = 8192
+
+
+def flat_version(flat: FlatVectorIndex) -> str:
+    """Identifies one write of the flat matrix, so an ANN index built for an older one is not reused"""
+    stat = os.stat(os.path.join(flat.directory, VECTORS_FILENAME))
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _assign(vectors, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product) for each row, in blocks to bound memory"""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(vectors, nlist: int, iterations: int = 10, sample_size: Optional[int] = None,
+                     seed: int = 0) -> np.ndarray:
+    """Unit-norm centroids trained on a sample of (normalized) rows"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, sample_size or nlist * 64)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        # Re-seed empty lists with random sample rows
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over a FlatVectorIndex: nlist k-means lists, nprobe lists scanned per query.
+
+    Only centroids and the row order by list are stored (in ivf.npz); the
+    candidate vectors are read from the flat index's memory-mapped matrix.
+    """
+
+    def __init__(self, flat: FlatVectorIndex, centroids: np.ndarray, order: np.ndarray,
+                 offsets: np.ndarray, nprobe: int = 8):
+        self.flat = flat
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, flat: FlatVectorIndex, nlist: int = 256, nprobe: int = 8,
+              iterations: int = 10) -> "IVFIndex":
+        nlist = max(1, min(nlist, len(flat)))
+        centroids = spherical_kmeans(flat.vectors, nlist, iterations)
+        labels = _assign(flat.vectors, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+        np.savez(os.path.join(flat.directory, IVF_FILENAME), centroids=centroids, order=order, offsets=offsets,
+                 version=np.array(flat_version(flat)))
+        return cls(flat, centroids, order, offsets, nprobe)
+
+    @classmethod
+    def load(cls, flat: FlatVectorIndex, nprobe: int = 8) -> Optional["IVFIndex"]:
+        path = os.path.join(flat.directory, IVF_FILENAME)
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        if str(data["version"]) != flat_version(flat):
+            return None  # built for a different version of the flat index
+        return cls(flat, data["centroids"], data["order"], data["offsets"], nprobe)
+
+    def search(self, query_vectors, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows per query among the nprobe closest lists; rows beyond the candidates are -1"""
+        queries = normalize_rows(query_vectors)
+        nprobe = min(self.nprobe, self.nlist)
+        probes = top_k(queries @ self.centroids.T, nprobe)[0]
+
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            rows = np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+            if len(rows) == 0:
+                continue
+            rows.sort()  # ascending offsets read the mmap sequentially
+            candidate_scores = np.asarray(self.flat.vectors[rows], dtype=np.float32) @ queries[q]
+            best, best_scores = top_k(candidate_scores[None, :], k)
+            indices[q, :best.shape[1]] = rows[best[0]]
+            scores[q, :best.shape[1]] = best_scores[0]
+        return indices, scores
+
+    def memory_bytes(self) -> int:
+        """Resident bytes when searched: the flat matrix plus the IVF structures"""
+        return self.flat.vectors.nbytes + self.centroids.nbytes + self.order.nbytes + self.offsets.nbytes
+
+
+class HNSWIndex:
+    """HNSW graph (hnswlib) over a FlatVectorIndex's vectors, with M / ef_construction / ef_search"""
+
+    def __init__(self, flat: FlatVectorIndex, index, ef_search: int = 64):
+        self.flat = flat
+        self.index = index
+        self.ef_search = ef_search
+        self.index.set_ef(ef_search)
+
+    @staticmethod
+    def _require_hnswlib():
+        if hnswlib is None:
+            raise ImportError("The HNSW index needs hnswlib: pip install hnswlib")
+
+    @classmethod
+    def build(cls, flat: FlatVectorIndex, M: int = 16, ef_construction: int = 200,
+              ef_search: int = 64) -> "HNSWIndex":
+        cls._require_hnswlib()
+        index = hnswlib.Index(space="ip", dim=flat.dimensions)
+        index.init_index(max_elements=max(1, len(flat)), M=M, ef_construction=ef_construction)
+        if len(flat):
+            index.add_items(np.asarray(flat.vectors, dtype=np.float32), np.arange(len(flat)))
+        index.save_index(os.path.join(flat.directory, HNSW_FILENAME))
+        with open(os.path.join(flat.directory, HNSW_PARAMS_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"M": M, "ef_construction": ef_construction, "version": flat_version(flat)}, f)
+        return cls(flat, index, ef_search)
+
+    @classmethod
+    def load(cls, flat: FlatVectorIndex, M: int = 16, ef_construction: int = 200,
+             ef_search: int = 64) -> Optional["HNSWIndex"]:
+        cls._require_hnswlib()
+        params_path = os.path.join(flat.directory, HNSW_PARAMS_FILENAME)
+        if not os.path.exists(params_path):
+            return None
+        with open(params_path, "r", encoding="utf-8") as f:
+            params = json.load(f)
+        if params != {"M": M, "ef_construction": ef_construction, "version": flat_version(flat)}:
+            return None  # built with other parameters or for another version of the flat index
+        index = hnswlib.Index(space="ip", dim=flat.dimensions)
+        index.load_index(os.path.join(flat.directory, HNSW_FILENAME), max_elements=max(1, len(flat)))
+        return cls(flat, index, ef_search)
+
+    def search(self, query_vectors, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(query_vectors)
+        k = min(k, len(self.flat))
+        if k == 0:
+            return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(queries, k=k)
+        # hnswlib's "ip" distance is 1 - inner product
+        return labels.astype(np.int64), (1.0 - distances).astype(np.float32)
+
+    def memory_bytes(self) -> int:
+        """Resident bytes when searched: hnswlib keeps its own float32 copy of the vectors plus the graph"""
+        return os.path.getsize(os.path.join(self.flat.directory, HNSW_FILENAME))
+
+
+def build_ann_index(flat: FlatVectorIndex, config: dict):
+    """Load the ANN index described by `config` for this flat index, building it if needed.
+
+    config: {"type": "ivf", "nlist", "nprobe"} or
+            {"type": "hnsw", "M", "ef_construction", "ef_search"}
+    """
+    kind = config.get("type")
+    if kind == "ivf":
+        index = IVFIndex.load(flat, nprobe=config.get("nprobe", 8))
+        if index is None or index.nlist != max(1, min(config.get("nlist", 256), len(flat))):
+            index = IVFIndex.build(flat, nlist=config.get("nlist", 256), nprobe=config.get("nprobe", 8))
+        return index
+    if kind == "hnsw":
+        params = {"M": config.get("M", 16), "ef_construction": config.get("ef_construction", 200),
+                  "ef_search": config.get("ef_search", 64)}
+        return HNSWIndex.load(flat, **params) or HNSWIndex.build(flat, **params)
+    raise ValueError(f"Unknown ANN index type: {kind!r} (expected 'ivf' or 'hnsw')")
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from index.flat_index import FlatVectorIndex
+from index.dim_reduction import Projector
+from index.generations import active_directory
+from index.evaluate_ann import sample_queries, evaluate, print_results, int_list
+
+
+def synthetic_embeddings(directory, rows, dimensions, intrinsic=256, seed=0):
+    """Unit vectors with a decaying spectrum in a random basis, like real embedding matrices"""
+    rng = np.random.default_rng(seed)
+    basis, _ = np.linalg.qr(rng.standard_normal((dimensions, intrinsic)))
+    latent = rng.standard_normal((rows, intrinsic)) / np.sqrt(1 + np.arange(intrinsic))
+    vectors = latent @ basis.T + 0.01 * rng.standard_normal((rows, dimensions))
+    ids = [f"synthetic:{i}:0" for i in range(rows)]
+    return FlatVectorIndex.build(directory, vectors.astype(np.float32), ids, [""] * rows, [{}] * rows)
+
+
+def cold_open_ms(directory, query):
+    """Open the index and run one search, as a fresh serving process would"""
+    start = time.perf_counter()
+    FlatVectorIndex(directory).search(query[None, :], k=1)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall@k and latency of reduced-dimension flat indexes")
+    parser.add_argument("--db", help="Full-dimension flat index directory; synthetic data if omitted")
+    parser.add_argument("--rows", type=int, default=20000, help="Synthetic vectors")
+    parser.add_argument("--full-dimensions", type=int, default=1536, help="Synthetic vector dimensions")
+    parser.add_argument("--dimensions", type=int_list, default=[256, 512, 1024], help="Reduced sizes to test")
+    parser.add_argument("--methods", default="pca,truncate", help="Projections to test, comma-separated")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.db:
+            full = FlatVectorIndex(active_directory(args.db))
+            print(f"📁 {full.directory}: {len(full):,} vectors x {full.dimensions}")
+        else:
+            full = synthetic_embeddings(os.path.join(scratch, "full"), args.rows, args.full_dimensions)
+            print(f"🧪 Synthetic: {len(full):,} vectors x {full.dimensions}")
+
+        queries = sample_queries(full, args.queries)
+        truth = np.vstack([full.search(query[None, :], k=args.k)[0] for query in queries])
+        vectors = np.asarray(full.vectors, dtype=np.float32)
+
+        results = [evaluate(f"full ({full.dimensions})", full, queries, truth, args.k, full.vectors.nbytes)]
+        results[-1]["cold_ms"] = cold_open_ms(full.directory, queries[0])
+
+        for method in [m for m in args.methods.split(",") if m]:
+            for dimensions in args.dimensions:
+                if dimensions >= full.dimensions:
+                    continue
+                start = time.perf_counter()
+                projector = Projector(method, dimensions).fit(vectors)
+                directory = os.path.join(scratch, f"{method}-{dimensions}")
+                reduced = FlatVectorIndex.build(directory, projector.project(vectors), full.ids,
+                                                [""] * len(full), [{}] * len(full))
+                build_seconds = time.perf_counter() - start
+
+                projected_queries = projector.project(queries)
+                results.append(evaluate(f"{method} {dimensions}", reduced, projected_queries, truth, args.k,
+                                        reduced.vectors.nbytes, build_seconds))
+                results[-1]["cold_ms"] = cold_open_ms(directory, projected_queries[0])
+
+        print_results(results, args.k)
+        print("\n  cold open + first search, vector file size:")
+        for row in results:
+            print(f"  {row['index']:<40} {row['cold_ms']:8.2f} ms  {row['memory_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+import re
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from index.flat_index import top_k
+except ImportError:  # run from inside index/
+    from flat_index import top_k
+
+BM25_FILENAME = "bm25.npz"
+# Terms in (nearly) every chunk, like the "Marketing Status" field label, add almost nothing
+# to any score but cost a pass over every document; they are skipped below this idf
+MIN_IDF = 0.01
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric runs, so "OZEMPIC (semaglutide)" and "ozempic" share a token"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, as compressed posting lists (term -> docs, term frequencies).
+
+    Document positions follow the order the index was built in (for the
+    flat backend, its rows). Also keeps the distinct drug names, so exact
+    brand-name questions can be recognized without an embedding call.
+    """
+
+    def __init__(self, ids: List[str], terms: List[str], indptr: np.ndarray, doc_ids: np.ndarray,
+                 tfs: np.ndarray, lengths: np.ndarray, names: List[str],
+                 k1: float = 1.2, b: float = 0.75):
+        self.ids = ids
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.lengths = lengths
+        self.names = names
+        self.k1 = k1
+        self._positions = None  # chunk ID -> position, built on first use
+        avgdl = float(lengths.mean()) if len(lengths) else 1.0
+        # Per-document part of the BM25 denominator, computed once
+        self._norms = (k1 * (1 - b + b * lengths / max(avgdl, 1e-9))).astype(np.float32)
+        self._names_by_first_token = {}
+        for name in names:
+            tokens = tuple(tokenize(name))
+            if tokens:
+                self._names_by_first_token.setdefault(tokens[0], []).append((tokens, name))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, ids: Iterable[str]) -> np.ndarray:
+        """Sorted positions of the given chunk IDs (unknown IDs are skipped)"""
+        if self._positions is None:
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        return np.array(sorted(self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions),
+                        dtype=np.int64)
+
+    @classmethod
+    def build(cls, ids: List[str], texts: Iterable[str], names: Iterable[str] = ()) -> "BM25Index":
+        term_ids, doc_ids, tfs = [], [], []
+        vocabulary = {}
+        lengths = []
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                tfs.append(tf)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        # Stable sort keeps each posting list in ascending document order
+        order = np.argsort(term_ids, kind="stable")
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=indptr[1:])
+        return cls(list(ids), list(vocabulary),
+                   indptr, np.asarray(doc_ids, dtype=np.int32)[order],
+                   np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16)[order],
+                   np.asarray(lengths, dtype=np.int32), sorted({name for name in names if name}))
+
+    def save(self, directory: str, version: str = "") -> None:
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        path = os.path.join(directory, BM25_FILENAME)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, version=np.array(version), ids=np.array(self.ids, dtype=str),
+                     terms=np.array(terms, dtype=str), indptr=self.indptr, doc_ids=self.doc_ids,
+                     tfs=self.tfs, lengths=self.lengths, names=np.array(self.names, dtype=str))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory: str, version: str = "") -> Optional["BM25Index"]:
+        path = os.path.join(directory, BM25_FILENAME)
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        if str(data["version"]) != version:
+            return None  # built for a different version of the index
+        return cls(data["ids"].tolist(), data["terms"].tolist(), data["indptr"], data["doc_ids"],
+                   data["tfs"], data["lengths"], data["names"].tolist())
+
+    def search(self, query: str, k: int = 5, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and scores of the best k documents containing a query term, best first.
+
+        `rows` (sorted positions, e.g. from a metadata filter) restricts the candidates.
+        """
+        n = len(self)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, stop = self.indptr[term_id], self.indptr[term_id + 1]
+            df = stop - start
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            if idf < MIN_IDF:
+                continue
+            docs = self.doc_ids[start:stop]
+            tf = self.tfs[start:stop].astype(np.float32)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self._norms[docs])
+
+        candidates = np.flatnonzero(scores)
+        if rows is not None:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+        best, best_scores = top_k(scores[candidates][None, :], k)
+        return candidates[best[0]], best_scores[0]
+
+    def names_in(self, text: str) -> List[str]:
+        """Indexed drug names that appear in `text` as whole tokens"""
+        tokens = tokenize(text)
+        found = []
+        for i, token in enumerate(tokens):
+            for name_tokens, name in self._names_by_first_token.get(token, ()):
+                if tuple(tokens[i:i + len(name_tokens)]) == name_tokens and name not in found:
+                    found.append(name)
+        return found
@@ -1,17 +1,18 @@
 import os
 import sys
 import time
+import argparse
 from pathlib import Path
 
 # Add project root to path
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
-from index.vectorstore import DrugVectorStore
+from index.vectorstore import DrugVectorStore, StaleDeltaError
 
 
-def create_production_vectorstore():
-    """Create the full production vector store"""
+def create_production_vectorstore(resume=False, record_mode=False):
+    """Create the full production vector store, or continue an interrupted build with resume=True"""
     
     print("🚀 Creating Production Drug Vector Store")
     print("=" * 60)
@@ -29,14 +30,17 @@ def create_production_vectorstore():
         db_name="drug_vector_db",          # Production database name
         embedding_model="openai",          # Using OpenAI embeddings
         chunk_size=1000,                   # Production chunk size
-        chunk_overlap=200                  # Production overlap
+        chunk_overlap=200,                 # Production overlap
+        record_mode=record_mode,           # Compact, unsplit product records
+        collapse_duplicates=True           # One vector per group of identical products
     )
     
     # Load all documents
     print("📁 Loading all FDA drug documents...")
     start_time = time.time()
     
-    documents = vector_store.load_documents_from_jsonl(jsonl_path)
+    records = vector_store.load_records_from_jsonl(jsonl_path)
+    documents = vector_store.documents_from_records(records)
     load_time = time.time() - start_time
     
     print(f"✅ Loaded {len(documents):,} documents in {load_time:.1f}s")
@@ -46,7 +50,7 @@ def create_production_vectorstore():
     print("⏳ This may take 5-15 minutes depending on your internet connection...")
     
     embedding_start = time.time()
-    vector_store.create_vectorstore(documents)
+    vector_store.create_vectorstore(documents, resume=resume, input_path=jsonl_path, records=records)
     embedding_time = time.time() - embedding_start
     
     print(f"✅ Vector store created in {embedding_time:.1f}s")
@@ -83,10 +87,58 @@ def create_production_vectorstore():
     return True
 
 
+def apply_incremental_update(record_mode=False):
+    """Apply the latest ingest delta to the existing production vector store"""
+    
+    print("🔄 Updating Production Drug Vector Store")
+    print("=" * 60)
+    
+    delta_file = "data/processed/fda_documents.delta.jsonl"
+    if not os.path.exists(delta_file):
+        print(f"❌ Error: {delta_file} not found.")
+        print("Please run incremental ingestion first: python ingest/drug_ingest.py --incremental")
+        return False
+    
+    vector_store = DrugVectorStore(
+        db_name="drug_vector_db",
+        embedding_model="openai",
+        chunk_size=1000,
+        chunk_overlap=200,
+        record_mode=record_mode,
+        collapse_duplicates=True
+    )
+    if not vector_store.load_vectorstore():
+        print("❌ No existing vector store to update. Run a full build first.")
+        return False
+    
+    start_time = time.time()
+    try:
+        vector_store.apply_delta(delta_file)
+    except StaleDeltaError as e:
+        # The delta does not start from what the index holds; only a full rebuild is safe
+        print(f"⚠️  {e}")
+        print("🔁 Falling back to a full rebuild")
+        return create_production_vectorstore(record_mode=record_mode)
+    print(f"⏱️  Update time: {time.time() - start_time:.1f}s")
+    return True
+
+
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Create or update the production drug vector store")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Apply data/processed/fda_documents.delta.jsonl instead of rebuilding")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted build from its last committed batch")
+    parser.add_argument("--record-mode", action="store_true",
+                        help="Index compact product records without splitting (use the same mode for updates)")
+    args = parser.parse_args()
+    
     try:
-        success = create_production_vectorstore()
+        if args.incremental:
+            success = apply_incremental_update(record_mode=args.record_mode)
+        else:
+            success = create_production_vectorstore(resume=args.resume, record_mode=args.record_mode)
         if success:
             print("\n" + "=" * 60)
             print("✅ PRODUCTION VECTOR STORE READY!")
@@ -99,6 +151,7 @@ def main():
             
     except KeyboardInterrupt:
         print("\n⚠️  Vector store creation interrupted by user")
+        print("💡 Run again with --resume to continue from the last committed batch")
         sys.exit(1)
     except Exception as e:
         print(f"\n❌ Error creating vector store: {e}")
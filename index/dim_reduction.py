@@ -0,0 +1,101 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+PROJECTION_FILENAME = "projection.npz"
+FIT_BLOCK_ROWS = 8192
+
+
+class Projector:
+    """Maps full embeddings to `dimensions` dimensions: (x - mean) @ components, L2-normalized.
+
+    PCA fits mean and components on the corpus; truncation keeps the first
+    `dimensions` coordinates (only sensible for models trained for it,
+    e.g. OpenAI text-embedding-3 with its `dimensions` parameter).
+    """
+
+    def __init__(self, kind: str, dimensions: int, mean: Optional[np.ndarray] = None,
+                 components: Optional[np.ndarray] = None):
+        if kind not in ("pca", "truncate"):
+            raise ValueError(f"Unknown projection: {kind!r} (expected 'pca' or 'truncate')")
+        self.kind = kind
+        self.dimensions = dimensions
+        self.mean = mean
+        self.components = components
+
+    @property
+    def fitted(self) -> bool:
+        return self.kind == "truncate" or self.components is not None
+
+    def fit(self, vectors) -> "Projector":
+        """Fit PCA from the covariance of `vectors` (accumulated in blocks); no-op for truncation"""
+        if self.kind == "truncate":
+            return self
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.dimensions = min(self.dimensions, vectors.shape[1])
+        mean = vectors.mean(axis=0)
+        covariance = np.zeros((vectors.shape[1], vectors.shape[1]), dtype=np.float64)
+        for start in range(0, len(vectors), FIT_BLOCK_ROWS):
+            block = vectors[start:start + FIT_BLOCK_ROWS] - mean
+            covariance += block.T @ block
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance / max(1, len(vectors) - 1))
+        top = np.argsort(eigenvalues)[::-1][:self.dimensions]
+        self.mean = mean.astype(np.float32)
+        self.components = eigenvectors[:, top].astype(np.float32)
+        self.explained_variance = float(eigenvalues[top].sum() / eigenvalues.sum()) if eigenvalues.sum() else 1.0
+        return self
+
+    def project(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if self.kind == "truncate":
+            projected = vectors[:, :self.dimensions]
+        else:
+            if self.components is None:
+                raise ValueError("PCA projector is not fitted")
+            projected = (vectors - self.mean) @ self.components
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return projected / norms
+
+    def save(self, directory: str) -> None:
+        arrays = {"kind": np.array(self.kind), "dimensions": np.array(self.dimensions)}
+        if self.kind == "pca":
+            arrays.update(mean=self.mean, components=self.components)
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, PROJECTION_FILENAME), **arrays)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["Projector"]:
+        path = os.path.join(directory, PROJECTION_FILENAME)
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        kind = str(data["kind"])
+        if kind == "pca":
+            return cls(kind, int(data["dimensions"]), data["mean"], data["components"])
+        return cls(kind, int(data["dimensions"]))
+
+
+class ProjectedEmbeddings(Embeddings):
+    """Projects document and query vectors with the same Projector.
+
+    Sits outside the embedding cache, so cached vectors stay full-size and
+    can be reused for any projection.
+    """
+
+    def __init__(self, embeddings: Embeddings, projector: Projector):
+        self.embeddings = embeddings
+        self.projector = projector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.embeddings.embed_documents(texts)
+        if not vectors:
+            return []
+        return self.projector.project(vectors).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.projector.project(self.embeddings.embed_query(text))[0].tolist()
@@ -0,0 +1,147 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for HTTP 429 / provider rate-limit exceptions"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return "RateLimit" in type(error).__name__
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True for failures worth retrying that are not rate limits: dropped connections,
+    timeouts (openai.APIConnectionError / APITimeoutError, httpx, builtins) and HTTP 5xx"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return 500 <= status < 600
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return bool(names & {"APIConnectionError", "APITimeoutError", "TransportError"})
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The Retry-After hint of a rate-limit response, if the provider sent one"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingScheduler(Embeddings):
+    """Embeds documents in batches with a bounded number of concurrent requests.
+
+    On rate-limit responses the allowed concurrency is halved and the batch
+    is retried after an exponential backoff with jitter (or the provider's
+    Retry-After); after a run of successes concurrency grows back by one
+    toward `max_in_flight`. Transient failures (connection errors, timeouts,
+    5xx) are retried with the same backoff but leave concurrency unchanged;
+    other errors are raised at once. Throughput of the last call is kept in
+    `last_run`.
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 batch_size: int = 256,
+                 max_in_flight: int = 4,
+                 max_retries: int = 6,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._condition = threading.Condition()
+        self._limit = max_in_flight
+        self._active = 0
+        self._successes = 0
+        self.last_run = {}
+
+    def _acquire(self):
+        with self._condition:
+            while self._active >= self._limit:
+                self._condition.wait()
+            self._active += 1
+
+    def _release(self, rate_limited: bool, succeeded: bool = True):
+        with self._condition:
+            self._active -= 1
+            if rate_limited:
+                self._limit = max(1, self._limit // 2)
+                self._successes = 0
+            elif succeeded:
+                self._successes += 1
+                if self._successes >= self._limit and self._limit < self.max_in_flight:
+                    self._limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+    def _call_with_backoff(self, call, stats: dict):
+        """Run one embedding request under the concurrency limit, retrying rate-limit and transient errors"""
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                result = call()
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                self._release(rate_limited=rate_limited, succeeded=False)
+                if not (rate_limited or is_transient_error(e)) or attempt == self.max_retries:
+                    raise
+                with self._condition:
+                    stats["rate_limited" if rate_limited else "transient_errors"] += 1
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                    delay *= random.uniform(0.5, 1.0)
+                time.sleep(delay)
+                continue
+            self._release(rate_limited=False)
+            return result
+
+    def _embed_batch(self, texts: List[str], stats: dict) -> List[List[float]]:
+        return self._call_with_backoff(lambda: self.embeddings.embed_documents(texts), stats)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        stats = {"rate_limited": 0, "transient_errors": 0}
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, self.max_in_flight)) as pool:
+            results = list(pool.map(lambda batch: self._embed_batch(batch, stats), batches))
+        elapsed = time.perf_counter() - start
+
+        self.last_run = {
+            "chunks": len(texts),
+            "batches": len(batches),
+            "seconds": elapsed,
+            "chunks_per_sec": len(texts) / elapsed if elapsed > 0 else 0.0,
+            "rate_limited": stats["rate_limited"],
+            "transient_errors": stats["transient_errors"],
+            "final_concurrency": self._limit,
+        }
+        if texts:
+            print(f"⚡ Embedded {len(texts):,} chunks in {len(batches)} batches: "
+                  f"{self.last_run['chunks_per_sec']:,.1f} chunks/sec "
+                  f"({stats['rate_limited']} rate-limited and {stats['transient_errors']} transient retries, "
+                  f"concurrency {self._limit})")
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries share the backoff and concurrency limit, since the wrapped client does not retry
+        return self._call_with_backoff(lambda: self.embeddings.embed_query(text),
+                                       {"rate_limited": 0, "transient_errors": 0})
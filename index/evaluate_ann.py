@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from index.flat_index import FlatVectorIndex, normalize_rows, VECTORS_FILENAME, METADATA_FILENAME
+from index.generations import active_directory
+from index.ann_index import IVFIndex, HNSWIndex, hnswlib
+from index.quantization import QuantizedIndex
+
+
+def synthetic_flat_index(directory, rows, dimensions, clusters=200, seed=0):
+    """A flat index of clustered random unit vectors, shaped like real embedding data"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((rows, dimensions)).astype(np.float32)
+    ids = [f"synthetic:{i}:0" for i in range(rows)]
+    return FlatVectorIndex.build(directory, vectors, ids, [""] * rows, [{}] * rows)
+
+
+def scratch_flat_index(directory, scratch):
+    """Open the flat index at `directory` through links in `scratch`, so the IVF, HNSW and
+    quantized indexes built beside it land in the scratch directory, not the live index"""
+    target = os.path.join(scratch, "flat")
+    os.makedirs(target, exist_ok=True)
+    for name in (VECTORS_FILENAME, METADATA_FILENAME):
+        source = os.path.abspath(os.path.join(directory, name))
+        try:
+            os.symlink(source, os.path.join(target, name))
+        except OSError:  # symlinks not permitted (e.g. Windows without developer mode)
+            shutil.copyfile(source, os.path.join(target, name))
+    return FlatVectorIndex(target)
+
+
+def sample_queries(flat, count, seed=1):
+    """Stored vectors plus noise, so queries land near the data without being exact copies"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(flat), min(count, len(flat)), replace=False)
+    base = np.asarray(flat.vectors[np.sort(rows)], dtype=np.float32)
+    return normalize_rows(base + 0.1 * rng.standard_normal(base.shape).astype(np.float32))
+
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f[f >= 0]) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def evaluate(name, index, queries, truth, k, memory_bytes, build_seconds=0.0):
+    """Recall@k against exact search plus p50/p99 single-query latency"""
+    timings = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        indices, _ = index.search(query[None, :], k=k)
+        timings.append((time.perf_counter() - start) * 1000)
+        found.append(indices[0])
+    return {
+        "index": name,
+        "recall": recall_at_k(found, truth),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "memory_mb": memory_bytes / 1e6,
+        "build_s": build_seconds,
+    }
+
+
+def print_results(results, k):
+    print(f"\n📊 recall@{k} vs exact search")
+    print(f"  {'index':<40} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'memory MB':>10} {'build s':>8}")
+    for row in results:
+        print(f"  {row['index']:<40} {row['recall']:7.3f} {row['p50_ms']:8.3f} {row['p99_ms']:8.3f} "
+              f"{row['memory_mb']:10.1f} {row['build_s']:8.2f}")
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report ANN recall@k, latency and memory against exact search")
+    parser.add_argument("--db", help="Flat index directory (DrugVectorStore backend='flat'); synthetic data if omitted")
+    parser.add_argument("--rows", type=int, default=50000, help="Synthetic vectors")
+    parser.add_argument("--dimensions", type=int, default=384, help="Synthetic vector dimensions")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int_list, default=[256], help="IVF list counts, comma-separated")
+    parser.add_argument("--nprobe", type=int_list, default=[1, 4, 16, 32], help="IVF lists probed per query")
+    parser.add_argument("--M", type=int_list, default=[16], help="HNSW graph degrees")
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int_list, default=[16, 64, 128])
+    parser.add_argument("--quantize", action="store_true", help="Also evaluate int8 and PQ with re-ranking")
+    parser.add_argument("--pq-m", type=int_list, default=[], help="PQ sub-vector counts (default: dimensions / 8)")
+    parser.add_argument("--rerank", type=int_list, default=[50, 200], help="Candidates re-ranked at full precision")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.db:
+            directory = active_directory(args.db)
+            flat = scratch_flat_index(directory, scratch)
+            print(f"📁 {directory}: {len(flat):,} vectors x {flat.dimensions}")
+        else:
+            flat = synthetic_flat_index(scratch, args.rows, args.dimensions)
+            print(f"🧪 Synthetic: {len(flat):,} vectors x {flat.dimensions}")
+
+        queries = sample_queries(flat, args.queries)
+        # One query at a time, like the timed searches, so BLAS rounding cannot reorder ties
+        truth = np.vstack([flat.search(query[None, :], k=args.k)[0] for query in queries])
+        results = [evaluate("exact (flat)", flat, queries, truth, args.k, flat.vectors.nbytes)]
+
+        for nlist in args.nlist:
+            start = time.perf_counter()
+            ivf = IVFIndex.build(flat, nlist=nlist)
+            build_seconds = time.perf_counter() - start
+            for nprobe in args.nprobe:
+                ivf.nprobe = nprobe
+                results.append(evaluate(f"ivf nlist={nlist} nprobe={nprobe}", ivf, queries, truth, args.k,
+                                        ivf.memory_bytes(), build_seconds))
+
+        if hnswlib is None:
+            print("⚠️  hnswlib not installed, skipping HNSW (pip install hnswlib)")
+        else:
+            for M in args.M:
+                start = time.perf_counter()
+                hnsw = HNSWIndex.build(flat, M=M, ef_construction=args.ef_construction)
+                build_seconds = time.perf_counter() - start
+                for ef_search in args.ef_search:
+                    hnsw.ef_search = ef_search
+                    results.append(evaluate(f"hnsw M={M} efc={args.ef_construction} ef={ef_search}", hnsw,
+                                            queries, truth, args.k, hnsw.memory_bytes(), build_seconds))
+
+        if args.quantize:
+            configs = [("int8", None)] + [("pq", m) for m in (args.pq_m or [max(1, flat.dimensions // 8)])]
+            for kind, m in configs:
+                start = time.perf_counter()
+                quantized = QuantizedIndex.build(flat, kind=kind, m=m)
+                build_seconds = time.perf_counter() - start
+                label = kind if m is None else f"pq m={m}"
+                ratio = flat.vectors.nbytes / quantized.memory_bytes()
+                for rerank in args.rerank:
+                    quantized.rerank = rerank
+                    results.append(evaluate(f"{label} rerank={rerank} ({ratio:.0f}x smaller)", quantized,
+                                            queries, truth, args.k, quantized.memory_bytes(), build_seconds))
+
+        print_results(results, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class FakeEmbeddingServer:
+    """Local OpenAI-compatible /v1/embeddings endpoint for testing without network.
+
+    Every request takes `latency` seconds; more than `rate_limit` requests per
+    second are answered with 429 and a Retry-After header, like the real API.
+    Vectors are deterministic per input text.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dimensions: int = 64,
+                 latency: float = 0.2, rate_limit: float = 20.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _allow(self) -> bool:
+        """Token bucket refilled at `rate_limit` requests per second"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            self.requests += 1
+            if self._tokens < 1:
+                self.rejected += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def embed(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if not self.path.rstrip("/").endswith("/embeddings"):
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                if not fake._allow():
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               {"Retry-After": "0.5"})
+                    return
+
+                time.sleep(fake.latency)
+                inputs = body["input"]
+                if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                    inputs = [inputs]
+                data = [{"object": "embedding", "index": i, "embedding": fake.embed(str(text))}
+                        for i, text in enumerate(inputs)]
+                self._send(200, {"object": "list", "data": data, "model": body.get("model", "fake"),
+                                 "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+        return Handler
+
+    def start(self) -> "FakeEmbeddingServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    """Compare serial and scheduled embedding throughput against the fake server"""
+    from langchain_openai import OpenAIEmbeddings
+    try:
+        from index.embedding_scheduler import EmbeddingScheduler
+    except ImportError:
+        from embedding_scheduler import EmbeddingScheduler
+
+    parser = argparse.ArgumentParser(description="Benchmark the embedding scheduler against a local fake server")
+    parser.add_argument("--chunks", type=int, default=2000, help="Number of chunks to embed")
+    parser.add_argument("--batch-size", type=int, default=50, help="Chunks per request")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="Concurrent requests")
+    parser.add_argument("--latency", type=float, default=0.2, help="Server round-trip seconds")
+    parser.add_argument("--rate-limit", type=float, default=20.0, help="Server requests per second")
+    args = parser.parse_args()
+
+    texts = [f"Drug Name: DRUG {i}\nForm: TABLET;ORAL\nStrength: {i % 50}MG" for i in range(args.chunks)]
+
+    with FakeEmbeddingServer(latency=args.latency, rate_limit=args.rate_limit) as server:
+        # Token-length checks need tiktoken downloads, so the fake server gets plain strings
+        base = OpenAIEmbeddings(model="fake-embedding", base_url=server.base_url, api_key="fake",
+                                check_embedding_ctx_length=False, max_retries=0)
+        print(f"🧪 Fake server at {server.base_url}: {args.latency}s latency, {args.rate_limit} req/s limit")
+
+        serial = EmbeddingScheduler(base, batch_size=args.batch_size, max_in_flight=1)
+        serial_vectors = serial.embed_documents(texts)
+
+        scheduled = EmbeddingScheduler(base, batch_size=args.batch_size, max_in_flight=args.max_in_flight)
+        scheduled_vectors = scheduled.embed_documents(texts)
+
+        if serial_vectors != scheduled_vectors:
+            raise AssertionError("Scheduled embeddings differ from serial embeddings")
+
+        print(f"\n📊 {args.chunks:,} chunks in batches of {args.batch_size}:")
+        print(f"  serial:    {serial.last_run['chunks_per_sec']:10,.1f} chunks/sec")
+        print(f"  scheduled: {scheduled.last_run['chunks_per_sec']:10,.1f} chunks/sec "
+              f"({scheduled.last_run['rate_limited']} rate-limited retries)")
+        print(f"  ceiling:   {args.rate_limit * args.batch_size:10,.1f} chunks/sec (rate limit x batch size)")
+        print(f"  server: {server.requests} requests, {server.rejected} rejected with 429")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import json
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTORS_FILENAME = "vectors.npy"
+METADATA_FILENAME = "metadata.json"
+SEARCH_BLOCK_ROWS = 4096
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so inner product equals cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the k largest scores per row, best first (ties by lower index)"""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class FlatVectorIndex:
+    """Exact cosine top-k over a memory-mapped (n, d) float32/float16 matrix.
+
+    Vectors are stored L2-normalized in `vectors.npy`; chunk IDs, texts and
+    metadata sit in `metadata.json` (row i describes vector i) and are only
+    read on first use, so opening the index is a single mmap.
+    
+    float16 halves the file and page-cache footprint, but NumPy has no fast
+    float16 matmul, so those searches upcast blocks of rows and are slower;
+    use float32 when latency matters more than memory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILENAME), mmap_mode="r")
+        self._metadata = None
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return (os.path.exists(os.path.join(directory, VECTORS_FILENAME))
+                and os.path.exists(os.path.join(directory, METADATA_FILENAME)))
+
+    @classmethod
+    def build(cls,
+              directory: str,
+              vectors,
+              ids: List[str],
+              texts: List[str],
+              metadatas: List[dict],
+              dtype: str = "float32") -> "FlatVectorIndex":
+        """Write a new index (replacing any existing one) and open it"""
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"dtype must be float32 or float16, got {dtype!r}")
+        matrix = normalize_rows(vectors) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+        if not (len(matrix) == len(ids) == len(texts) == len(metadatas)):
+            raise ValueError("vectors, ids, texts and metadatas must have the same length")
+        os.makedirs(directory, exist_ok=True)
+
+        # Write beside the target and rename, so readers never see half an index
+        vectors_path = os.path.join(directory, VECTORS_FILENAME)
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, matrix.astype(dtype))
+        metadata_path = os.path.join(directory, METADATA_FILENAME)
+        with open(metadata_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "texts": list(texts), "metadatas": list(metadatas)}, f)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(metadata_path + ".tmp", metadata_path)
+        return cls(directory)
+
+    @property
+    def metadata(self) -> dict:
+        if self._metadata is None:
+            with open(os.path.join(self.directory, METADATA_FILENAME), "r", encoding="utf-8") as f:
+                self._metadata = json.load(f)
+        return self._metadata
+
+    @property
+    def ids(self) -> List[str]:
+        return self.metadata["ids"]
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        if self.vectors.dtype == np.float32:
+            return queries @ self.vectors.T
+        # NumPy has no BLAS path for float16, so upcast one block of rows at a time
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    def search(self, query_vectors, k: int = 5, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows for each query vector: (indices, scores), both shaped (queries, k).
+
+        `rows` (sorted row indices, e.g. from a metadata filter) restricts the
+        search to those rows; only they are read from the memory map.
+        """
+        queries = normalize_rows(query_vectors)
+        if rows is not None:
+            if len(rows) == 0:
+                return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+            subset = np.asarray(self.vectors[rows], dtype=np.float32)
+            positions, scores = top_k(queries @ subset.T, k)
+            return np.asarray(rows, dtype=np.int64)[positions], scores
+        if len(self) == 0:
+            return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+        return top_k(self._scores(queries), k)
+
+    def records(self, indices: Sequence[int]) -> List[Tuple[str, str, dict]]:
+        """(id, text, metadata) for each row index"""
+        metadata = self.metadata
+        return [(metadata["ids"][i], metadata["texts"][i], metadata["metadatas"][i]) for i in indices]
+
+    def update(self,
+               remove_ids: Sequence[str] = (),
+               vectors=None,
+               ids: Optional[List[str]] = None,
+               texts: Optional[List[str]] = None,
+               metadatas: Optional[List[dict]] = None,
+               directory: Optional[str] = None) -> "FlatVectorIndex":
+        """Rewrite the index without `remove_ids` and with the given rows appended; returns the new index.
+
+        The result is written to `directory` if given (e.g. a new generation), else over this index.
+        """
+        remove = set(remove_ids) | set(ids or [])
+        metadata = self.metadata
+        keep = [i for i, chunk_id in enumerate(metadata["ids"]) if chunk_id not in remove]
+
+        kept_vectors = np.asarray(self.vectors[keep], dtype=np.float32)
+        new_ids = [metadata["ids"][i] for i in keep] + list(ids or [])
+        new_texts = [metadata["texts"][i] for i in keep] + list(texts or [])
+        new_metadatas = [metadata["metadatas"][i] for i in keep] + list(metadatas or [])
+        if ids:
+            added = normalize_rows(vectors)
+            kept_vectors = added if len(keep) == 0 else np.vstack([kept_vectors, added])
+
+        return FlatVectorIndex.build(directory or self.directory, kept_vectors, new_ids, new_texts, new_metadatas,
+                                     dtype=self.vectors.dtype.name)
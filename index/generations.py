@@ -0,0 +1,115 @@
+import os
+import shutil
+from datetime import datetime
+from typing import List, Optional
+
+GENERATIONS_DIRNAME = "generations"
+CURRENT_FILENAME = "CURRENT"
+UPDATES_FILENAME = "UPDATES"
+
+# Layout of a versioned database directory:
+#
+#   drug_vector_db/
+#     CURRENT                       name of the live generation
+#     generations/
+#       20261016T231900123456/      one complete index (Chroma or flat files, sidecars, checkpoint)
+#       20261017T020000654321/      a newer build, live once CURRENT names it
+#         UPDATES                   count of in-place updates (Chroma upserts/deletes)
+#
+# Builds write a new generation and publish it by replacing CURRENT, so
+# readers see either the old index or the new one, never a partial build.
+# Chroma updates are applied to the live generation in place and bump its
+# UPDATES counter instead, so readers know to reload their cached state.
+# A directory without CURRENT is a legacy in-place index and is used as is.
+
+
+def generations_dir(root: str) -> str:
+    return os.path.join(root, GENERATIONS_DIRNAME)
+
+
+def list_generations(root: str) -> List[str]:
+    """Generation names, oldest first (names are timestamps)"""
+    try:
+        return sorted(name for name in os.listdir(generations_dir(root))
+                      if os.path.isdir(os.path.join(generations_dir(root), name)))
+    except FileNotFoundError:
+        return []
+
+
+def current_generation(root: str) -> Optional[str]:
+    """Name of the published generation, or None for an unversioned directory"""
+    try:
+        with open(os.path.join(root, CURRENT_FILENAME), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def active_directory(root: str) -> str:
+    """Directory holding the live index: the published generation, else `root` itself"""
+    name = current_generation(root)
+    return os.path.join(generations_dir(root), name) if name else root
+
+
+def new_generation(root: str) -> str:
+    """Create an empty, unpublished generation directory and return its path"""
+    name = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    path = os.path.join(generations_dir(root), name)
+    os.makedirs(path)
+    return path
+
+
+def pending_generation(root: str) -> Optional[str]:
+    """Path of the newest generation built after the live one but never published, if any"""
+    current = current_generation(root)
+    pending = [name for name in list_generations(root) if current is None or name > current]
+    return os.path.join(generations_dir(root), pending[-1]) if pending else None
+
+
+def publish_generation(root: str, directory: str) -> None:
+    """Point CURRENT at `directory` with one atomic rename"""
+    tmp_path = os.path.join(root, CURRENT_FILENAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(os.path.normpath(directory)) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILENAME))
+
+
+def update_count(directory: str) -> int:
+    """Number of in-place updates recorded for the index in `directory` (0 if never updated)"""
+    try:
+        with open(os.path.join(directory, UPDATES_FILENAME), "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def record_update(directory: str) -> int:
+    """Bump the UPDATES counter of `directory` with one atomic rename and return the new count"""
+    count = update_count(directory) + 1
+    tmp_path = os.path.join(directory, UPDATES_FILENAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f"{count}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(directory, UPDATES_FILENAME))
+    return count
+
+
+def collect_garbage(root: str, keep: int = 2) -> List[str]:
+    """Delete generations older than the newest `keep` published ones and return their names.
+
+    Keeping the previous generation lets processes that have not refreshed
+    yet finish their in-flight searches; builds newer than CURRENT (possibly
+    still running) are never touched.
+    """
+    current = current_generation(root)
+    if current is None:
+        return []
+    published = [name for name in list_generations(root) if name <= current]
+    removed = published[:-max(1, keep)]
+    for name in removed:
+        shutil.rmtree(os.path.join(generations_dir(root), name), ignore_errors=True)
+    return removed
@@ -0,0 +1,117 @@
+import os
+import json
+import base64
+import hashlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+STATS_FILENAME = "index_stats.json"
+HISTOGRAM_FIELDS = ("doc_type", "form", "marketing_status")
+DISTINCT_FIELDS = ("drug_name", "sponsor_name")
+
+
+class HyperLogLog:
+    """Distinct-count sketch: 2**p one-byte registers, about 1.04 / sqrt(2**p) relative error.
+
+    Insert-only: values removed from the index stay counted until the
+    statistics are rebuilt, so after deletes the estimate is an upper bound.
+    """
+
+    def __init__(self, p: int = 14, registers: Optional[np.ndarray] = None):
+        self.p = p
+        self.registers = registers if registers is not None else np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, values: Iterable[str]) -> None:
+        for value in set(values):
+            h = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+            bucket = h >> (64 - self.p)
+            rest = h & ((1 << (64 - self.p)) - 1)
+            rank = (64 - self.p) - rest.bit_length() + 1  # leading zeros + 1
+            if rank > self.registers[bucket]:
+                self.registers[bucket] = rank
+
+    def count(self) -> int:
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # linear counting is more accurate for small sets
+        return int(round(estimate))
+
+    def to_json(self) -> dict:
+        return {"p": self.p, "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "HyperLogLog":
+        registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return cls(data["p"], registers)
+
+
+class IndexStats:
+    """Statistics sidecar kept up to date as chunks are written and deleted.
+
+    Exact per-value histograms for low-cardinality fields (decremented on
+    delete) and HyperLogLog sketches for drug and sponsor names, saved as
+    index_stats.json in the database directory so get_stats reads one
+    small file instead of every chunk's metadata.
+    """
+
+    def __init__(self,
+                 total: int = 0,
+                 histograms: Optional[Dict[str, Counter]] = None,
+                 sketches: Optional[Dict[str, HyperLogLog]] = None):
+        self.total = total
+        self.histograms = histograms or {field: Counter() for field in HISTOGRAM_FIELDS}
+        self.sketches = sketches or {field: HyperLogLog() for field in DISTINCT_FIELDS}
+
+    @classmethod
+    def from_metadatas(cls, metadatas: Iterable[dict]) -> "IndexStats":
+        stats = cls()
+        stats.add(metadatas)
+        return stats
+
+    def add(self, metadatas: Iterable[dict]) -> None:
+        metadatas = [metadata or {} for metadata in metadatas]
+        self.total += len(metadatas)
+        for field in HISTOGRAM_FIELDS:
+            self.histograms[field].update(m[field] for m in metadatas if m.get(field))
+        for field in DISTINCT_FIELDS:
+            self.sketches[field].add(m[field] for m in metadatas if m.get(field))
+
+    def remove(self, metadatas: Iterable[dict]) -> None:
+        metadatas = [metadata or {} for metadata in metadatas]
+        self.total = max(0, self.total - len(metadatas))
+        for field in HISTOGRAM_FIELDS:
+            self.histograms[field].subtract(m[field] for m in metadatas if m.get(field))
+            self.histograms[field] = +self.histograms[field]  # drop values that reached zero
+
+    def distinct(self, field: str) -> int:
+        return self.sketches[field].count()
+
+    def values(self, field: str) -> List[str]:
+        return sorted(self.histograms[field])
+
+    def save(self, directory: str) -> None:
+        data = {
+            "total": self.total,
+            "histograms": {field: dict(counts) for field, counts in self.histograms.items()},
+            "sketches": {field: sketch.to_json() for field, sketch in self.sketches.items()},
+        }
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, STATS_FILENAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IndexStats"]:
+        try:
+            with open(os.path.join(directory, STATS_FILENAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        histograms = {field: Counter(data["histograms"][field]) for field in HISTOGRAM_FIELDS}
+        sketches = {field: HyperLogLog.from_json(data["sketches"][field]) for field in DISTINCT_FIELDS}
+        return cls(data["total"], histograms, sketches)
@@ -0,0 +1,172 @@
+import os
+import re
+import time
+import hashlib
+import argparse
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_LOCAL_MODEL = "all-MiniLM-L6-v2"
+QUANTIZE_OPTIONS = (None, "int8", "onnx")
+WARMUP_TEXTS = ["Drug Name: ASPIRIN\nForm: TABLET;ORAL\nStrength: 81MG", "blood pressure tablet"]
+
+
+class LocalCPUEmbeddings(Embeddings):
+    """In-process sentence-transformers embeddings tuned for CPU.
+
+    `batch_size` and `num_threads` control encoding throughput; `quantize`
+    is None (float32 torch), "int8" (dynamic int8 quantization of the
+    Linear layers) or "onnx" (ONNX Runtime backend). The model is loaded
+    and warmed up in the constructor so the first query is not slow.
+    """
+
+    def __init__(self,
+                 model_name: str = DEFAULT_LOCAL_MODEL,
+                 batch_size: int = 64,
+                 num_threads: Optional[int] = None,
+                 quantize: Optional[str] = None,
+                 normalize: bool = True,
+                 warmup: bool = True):
+        if quantize not in QUANTIZE_OPTIONS:
+            raise ValueError(f"quantize must be one of {QUANTIZE_OPTIONS}, got {quantize!r}")
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Local embeddings need sentence-transformers: pip install sentence-transformers") from e
+
+        self.model_name = model_name
+        # Quantized vectors differ slightly, so they get their own embedding cache namespace
+        self.model = model_name if quantize is None else f"{model_name}+{quantize}"
+        self.batch_size = batch_size
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.quantize = quantize
+        self.normalize = normalize
+
+        start = time.perf_counter()
+        if quantize == "onnx":
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = self.num_threads
+            self._model = SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                              model_kwargs={"session_options": session_options})
+        else:
+            import torch
+            torch.set_num_threads(self.num_threads)
+            self._model = SentenceTransformer(model_name, device="cpu")
+            if quantize == "int8":
+                self._model = torch.quantization.quantize_dynamic(self._model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.load_seconds = time.perf_counter() - start
+
+        self.warmup_seconds = 0.0
+        if warmup:
+            self.warmup()
+
+    def warmup(self) -> None:
+        """Run a couple of encodes so lazy initialization happens before the first real query"""
+        start = time.perf_counter()
+        self._encode(WARMUP_TEXTS)
+        self._encode(WARMUP_TEXTS[:1])
+        self.warmup_seconds = time.perf_counter() - start
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(texts, batch_size=self.batch_size, normalize_embeddings=self.normalize,
+                                  convert_to_numpy=True, show_progress_bar=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic feature-hashing embeddings for tests and benchmarks.
+
+    Words and character trigrams of each word are hashed into `dimensions`
+    signed buckets and the vector is L2-normalized. No model, no network,
+    and the same text always maps to the same vector.
+    """
+
+    _word = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for word in self._word.findall(text.lower()):
+            features.append(word)
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimensions] += 1.0 if (digest >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text).tolist()
+
+
+def query_latency_ms(embeddings: Embeddings, queries: List[str], repeats: int = 5) -> dict:
+    """p50/p99 latency of embed_query in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": float(np.percentile(timings, 50)), "p99_ms": float(np.percentile(timings, 99))}
+
+
+def main():
+    """Report load, warm-up, document throughput and query latency of the local backends"""
+    parser = argparse.ArgumentParser(description="Benchmark local CPU embedding backends")
+    parser.add_argument("--model", default=DEFAULT_LOCAL_MODEL, help="sentence-transformers model name")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--quantize", choices=["int8", "onnx"], default=None)
+    parser.add_argument("--documents", type=int, default=2000, help="Synthetic documents to embed")
+    args = parser.parse_args()
+
+    documents = [f"Drug Name: DRUG {i}\nActive Ingredient: INGREDIENT {i % 97}\nForm: TABLET;ORAL\nStrength: {i % 50}MG"
+                 for i in range(args.documents)]
+    queries = ["diabetes medication", "blood pressure tablet", "antibiotic injection", "pain relief capsule"]
+
+    backends = [("hashing", HashingEmbeddings)]
+    backends.append(("local", lambda: LocalCPUEmbeddings(args.model, batch_size=args.batch_size,
+                                                         num_threads=args.threads, quantize=args.quantize)))
+    for name, factory in backends:
+        try:
+            embeddings = factory()
+        except ImportError as e:
+            print(f"⚠️  Skipping {name}: {e}")
+            continue
+
+        start = time.perf_counter()
+        embeddings.embed_documents(documents)
+        elapsed = time.perf_counter() - start
+        latency = query_latency_ms(embeddings, queries)
+
+        print(f"\n📊 {name} ({embeddings.model})")
+        if isinstance(embeddings, LocalCPUEmbeddings):
+            print(f"  load: {embeddings.load_seconds:.2f}s, warm-up: {embeddings.warmup_seconds:.2f}s, "
+                  f"threads: {embeddings.num_threads}")
+        print(f"  documents: {len(documents) / elapsed:,.0f} docs/sec")
+        print(f"  query latency: p50 {latency['p50_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
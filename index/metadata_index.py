@@ -0,0 +1,135 @@
+import os
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FILTER_FIELDS = ("form", "marketing_status", "sponsor_name", "application_no", "drug_name", "product_no")
+METADATA_INDEX_FILENAME = "metadata_index.json"
+
+# A chunk collapsed from duplicate products stands for all of them: besides its
+# own "product_no" it lists every product, comma-separated, in "product_nos"
+# (Chroma metadata values must be scalars). Filters match any of them.
+MULTI_VALUED_FIELDS = {"product_no": "product_nos"}
+
+
+def metadata_values(metadata: dict, field: str) -> List[str]:
+    """The values a chunk holds for a filter field: every product of a collapsed chunk, else its own value"""
+    group = MULTI_VALUED_FIELDS.get(field)
+    if group and metadata.get(group):
+        return metadata[group].split(",")
+    value = metadata.get(field)
+    return [value] if value else []
+
+
+def validate_filter(filter: dict) -> None:
+    """Filters map a field to a value, a list of values, {"$in": [...]} or {"$contains": "text"}"""
+    for field, condition in filter.items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter on {field!r}; indexed fields are {', '.join(FILTER_FIELDS)}")
+        if isinstance(condition, dict) and not set(condition) <= {"$in", "$contains"}:
+            raise ValueError(f"Unsupported filter operator in {condition!r} (use $in or $contains)")
+
+
+def resolve_values(condition, values: List[str]) -> List[str]:
+    """The stored values one field condition matches; $contains is a case-insensitive substring test"""
+    if isinstance(condition, dict):
+        matched = set(condition.get("$in", []))
+        if "$contains" in condition:
+            needle = condition["$contains"].lower()
+            matched.update(value for value in values if needle in value.lower())
+        return sorted(matched)
+    if isinstance(condition, (list, tuple, set)):
+        return sorted(condition)
+    return [condition]
+
+
+def _in_clause(field: str, values: List[str]) -> dict:
+    return {field: values[0]} if len(values) == 1 else {field: {"$in": values}}
+
+
+def to_chroma_where(filter: dict, values_by_field: Dict[str, List[str]]) -> Optional[dict]:
+    """Translate a non-empty filter into a Chroma `where` clause, expanding $contains against the
+    known values; None when some field matches no value, so nothing can match.
+    
+    A multi-valued field also matches the stored groups (values_by_field["product_nos"])
+    holding one of the matched values, since Chroma cannot test membership in a string.
+    """
+    clauses = []
+    for field, condition in filter.items():
+        matched = resolve_values(condition, values_by_field.get(field, []))
+        if not matched:
+            return None
+        clause = _in_clause(field, matched)
+        group = MULTI_VALUED_FIELDS.get(field)
+        if group:
+            groups = [value for value in values_by_field.get(group, []) if set(value.split(",")) & set(matched)]
+            if groups:
+                clause = {"$or": [clause, _in_clause(group, groups)]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class MetadataIndex:
+    """Inverted index from (field, value) to the sorted rows of a flat index holding it.
+
+    A filter ANDs its fields and ORs the values within a field, so the
+    candidate rows come from merging a few posting lists instead of
+    scanning every chunk's metadata.
+    """
+
+    def __init__(self, postings: Dict[str, Dict[str, np.ndarray]], rows: int):
+        self.postings = postings
+        self.rows = rows
+
+    @classmethod
+    def build(cls, metadatas: List[dict]) -> "MetadataIndex":
+        lists = {field: {} for field in FILTER_FIELDS}
+        for row, metadata in enumerate(metadatas):
+            for field in FILTER_FIELDS:
+                for value in metadata_values(metadata, field):
+                    lists[field].setdefault(value, []).append(row)
+        postings = {field: {value: np.asarray(rows, dtype=np.int32) for value, rows in values.items()}
+                    for field, values in lists.items()}
+        return cls(postings, len(metadatas))
+
+    def save(self, directory: str, version: str) -> None:
+        data = {"version": version, "rows": self.rows,
+                "postings": {field: {value: rows.tolist() for value, rows in values.items()}
+                             for field, values in self.postings.items()}}
+        tmp_path = os.path.join(directory, METADATA_INDEX_FILENAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, os.path.join(directory, METADATA_INDEX_FILENAME))
+
+    @classmethod
+    def load(cls, directory: str, version: str) -> Optional["MetadataIndex"]:
+        path = os.path.join(directory, METADATA_INDEX_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != version or set(data["postings"]) != set(FILTER_FIELDS):
+            return None  # built for a different version of the flat index, or other fields
+        postings = {field: {value: np.asarray(rows, dtype=np.int32) for value, rows in values.items()}
+                    for field, values in data["postings"].items()}
+        return cls(postings, data["rows"])
+
+    def values(self, field: str) -> List[str]:
+        return sorted(self.postings.get(field, {}))
+
+    def rows_matching(self, filter: dict) -> np.ndarray:
+        """Sorted rows matching every field of the filter"""
+        validate_filter(filter)
+        result = None
+        # Intersect the smallest field first so later intersections stay cheap
+        per_field = []
+        for field, condition in filter.items():
+            lists = [self.postings[field][value] for value in resolve_values(condition, self.values(field))
+                     if value in self.postings[field]]
+            per_field.append(np.unique(np.concatenate(lists)) if lists else np.empty(0, dtype=np.int32))
+        for rows in sorted(per_field, key=len):
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return np.arange(self.rows, dtype=np.int32) if result is None else result
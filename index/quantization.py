@@ -0,0 +1,193 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from index.flat_index import FlatVectorIndex, normalize_rows, top_k
+    from index.ann_index import flat_version
+except ImportError:  # run from inside index/
+    from flat_index import FlatVectorIndex, normalize_rows, top_k
+    from ann_index import flat_version
+
+INT8_FILENAME = "int8.npz"
+PQ_FILENAME = "pq.npz"
+SCORE_BLOCK_ROWS = 4096
+PQ_CENTROIDS = 256
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    """Euclidean k-means centroids (PQ sub-vectors are not unit length)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(iterations):
+        # argmin |x - c|^2 == argmax x.c - |c|^2 / 2
+        labels = np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class ScalarQuantizer:
+    """Symmetric per-dimension int8 codes: x ~= code * scale (4x smaller than float32)"""
+
+    kind = "int8"
+
+    def __init__(self, scale: np.ndarray, codes: np.ndarray):
+        self.scale = scale
+        self.codes = codes
+
+    @classmethod
+    def train(cls, vectors) -> "ScalarQuantizer":
+        scale = np.zeros(vectors.shape[1], dtype=np.float32)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scale = np.maximum(scale, np.abs(block).max(axis=0))
+        scale = np.where(scale > 0, scale / 127.0, 1.0).astype(np.float32)
+
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + len(block)] = np.clip(np.rint(block / scale), -127, 127)
+        return cls(scale, codes)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate inner products, (queries, rows)"""
+        scaled = queries * self.scale
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        # Upcast a block of codes at a time so the float copy stays small
+        for start in range(0, len(self.codes), SCORE_BLOCK_ROWS):
+            block = self.codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = scaled @ block.T
+        return scores
+
+    def arrays(self) -> dict:
+        return {"scale": self.scale, "codes": self.codes}
+
+    def memory_bytes(self) -> int:
+        return self.scale.nbytes + self.codes.nbytes
+
+
+class ProductQuantizer:
+    """m sub-vectors per vector, each replaced by one of 256 k-means centroids (one byte per sub-vector)"""
+
+    kind = "pq"
+
+    def __init__(self, codebooks: np.ndarray, codes: np.ndarray):
+        self.codebooks = codebooks  # (m, 256, d / m)
+        self.codes = codes          # (m, rows), column-major so each lookup reads contiguous bytes
+
+    @property
+    def m(self) -> int:
+        return len(self.codebooks)
+
+    @classmethod
+    def train(cls, vectors, m: int, sample_size: int = 10000, seed: int = 0) -> "ProductQuantizer":
+        dimensions = vectors.shape[1]
+        if dimensions % m:
+            raise ValueError(f"PQ needs m to divide the {dimensions} dimensions, got m={m}")
+        sub = dimensions // m
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))
+        sample = np.asarray(vectors[rows], dtype=np.float32)
+        codebooks = np.stack([kmeans(sample[:, j * sub:(j + 1) * sub], PQ_CENTROIDS, seed=seed + j)
+                              for j in range(m)])
+
+        codes = np.empty((m, len(vectors)), dtype=np.uint8)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            for j in range(m):
+                part = block[:, j * sub:(j + 1) * sub]
+                centroids = codebooks[j]
+                codes[j, start:start + len(block)] = np.argmax(
+                    part @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+        return cls(codebooks, codes)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Asymmetric distance computation: per-query lookup tables summed over the m codes"""
+        sub = self.codebooks.shape[2]
+        scores = np.zeros((len(queries), self.codes.shape[1]), dtype=np.float32)
+        for q, query in enumerate(queries):
+            tables = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.m, sub))
+            for j in range(self.m):
+                scores[q] += tables[j].take(self.codes[j])
+        return scores
+
+    def arrays(self) -> dict:
+        return {"codebooks": self.codebooks, "codes": self.codes}
+
+    def memory_bytes(self) -> int:
+        return self.codebooks.nbytes + self.codes.nbytes
+
+
+class QuantizedIndex:
+    """Two-pass search: approximate scores over compressed codes, then the best `rerank`
+    candidates re-scored exactly against the flat index's memory-mapped float vectors.
+
+    Only the codes are resident; full-precision rows are read from disk on demand.
+    """
+
+    def __init__(self, flat: FlatVectorIndex, quantizer, rerank: int = 100):
+        self.flat = flat
+        self.quantizer = quantizer
+        self.rerank = rerank
+
+    @classmethod
+    def build(cls, flat: FlatVectorIndex, kind: str = "int8", m: Optional[int] = None,
+              rerank: int = 100) -> "QuantizedIndex":
+        if kind == "int8":
+            quantizer = ScalarQuantizer.train(flat.vectors)
+        elif kind == "pq":
+            quantizer = ProductQuantizer.train(flat.vectors, m or max(1, flat.dimensions // 8))
+        else:
+            raise ValueError(f"Unknown quantization type: {kind!r} (expected 'int8' or 'pq')")
+        filename = INT8_FILENAME if kind == "int8" else PQ_FILENAME
+        np.savez(os.path.join(flat.directory, filename), version=np.array(flat_version(flat)),
+                 **quantizer.arrays())
+        return cls(flat, quantizer, rerank)
+
+    @classmethod
+    def load(cls, flat: FlatVectorIndex, kind: str = "int8", m: Optional[int] = None,
+             rerank: int = 100) -> Optional["QuantizedIndex"]:
+        path = os.path.join(flat.directory, INT8_FILENAME if kind == "int8" else PQ_FILENAME)
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        if str(data["version"]) != flat_version(flat):
+            return None  # built for a different version of the flat index
+        if kind == "int8":
+            return cls(flat, ScalarQuantizer(data["scale"], data["codes"]), rerank)
+        if m and len(data["codebooks"]) != m:
+            return None
+        return cls(flat, ProductQuantizer(data["codebooks"], data["codes"]), rerank)
+
+    def search(self, query_vectors, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize_rows(query_vectors)
+        k = min(k, len(self.flat))
+        candidates, _ = top_k(self.quantizer.scores(queries), max(k, self.rerank))
+
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        for q, rows in enumerate(candidates):
+            rows = np.sort(rows)  # ascending offsets read the mmap sequentially
+            exact = np.asarray(self.flat.vectors[rows], dtype=np.float32) @ queries[q]
+            best, best_scores = top_k(exact[None, :], k)
+            indices[q] = rows[best[0]]
+            scores[q] = best_scores[0]
+        return indices, scores
+
+    def memory_bytes(self) -> int:
+        """Resident bytes: the codes and codebooks (full vectors stay on disk)"""
+        return self.quantizer.memory_bytes()
+
+
+def build_quantized_index(flat: FlatVectorIndex, config: dict) -> QuantizedIndex:
+    """Load the quantized index described by `config`, building it if needed.
+
+    config: {"type": "int8", "rerank"} or {"type": "pq", "m", "rerank"}
+    """
+    params = {"kind": config.get("type", "int8"), "m": config.get("m"), "rerank": config.get("rerank", 100)}
+    return QuantizedIndex.load(flat, **params) or QuantizedIndex.build(flat, **params)
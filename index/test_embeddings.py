@@ -0,0 +1,178 @@
+import sys
+import hashlib
+from pathlib import Path
+
+import httpx
+import numpy as np
+import openai
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from index.embedding_scheduler import EmbeddingScheduler
+from index.embedding_cache import CachedEmbeddings, EmbeddingCache, DEFAULT_CACHE_PATH
+from index.fake_embedding_server import FakeEmbeddingServer
+from index.local_embeddings import HashingEmbeddings
+from index.vectorstore import DrugVectorStore
+
+
+def text_vector(text, dimensions=8):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [byte / 255.0 for byte in digest[:dimensions]]
+
+
+def fake_openai(server):
+    # No client retries and no token-length checks (those download tiktoken files)
+    return OpenAIEmbeddings(model="fake-embedding", base_url=server.base_url, api_key="fake",
+                            check_embedding_ctx_length=False, max_retries=0)
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embedder that records what it was asked to embed"""
+
+    def __init__(self, error=None, failures=()):
+        self.error = error
+        self.failures = list(failures)  # raised once each, before any success
+        self.calls = 0
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        if self.error:
+            raise self.error
+        self.texts.extend(texts)
+        return [text_vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts.append(text)
+        return text_vector(text)
+
+
+def test_cache_persists_document_embeddings_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    embeddings = CountingEmbeddings()
+    first = CachedEmbeddings(embeddings, EmbeddingCache(path))
+    vectors = first.embed_documents(["aspirin", "ibuprofen", "aspirin"])
+    assert embeddings.texts == ["aspirin", "ibuprofen"]  # repeats in a batch are embedded once
+    np.testing.assert_allclose(vectors, [text_vector(t) for t in ["aspirin", "ibuprofen", "aspirin"]], rtol=1e-6)
+    first.cache.close()
+
+    embeddings = CountingEmbeddings()
+    second = CachedEmbeddings(embeddings, EmbeddingCache(path))
+    vectors = second.embed_documents(["ibuprofen", "metformin"])
+    assert embeddings.texts == ["metformin"]
+    np.testing.assert_allclose(vectors, [text_vector("ibuprofen"), text_vector("metformin")], rtol=1e-6)
+    assert (second.hits, second.misses) == (1, 1)
+
+
+def test_cache_keeps_queries_in_a_bounded_lru_not_in_sqlite(tmp_path):
+    embeddings = CountingEmbeddings()
+    cached = CachedEmbeddings(embeddings, EmbeddingCache(str(tmp_path / "cache.sqlite")), query_cache_size=2)
+    cached.embed_documents(["aspirin"])
+
+    vectors = [cached.embed_query(query) for query in ["q1", "q2", "q1", "q3", "q2"]]
+    np.testing.assert_allclose(vectors, [text_vector(q) for q in ["q1", "q2", "q1", "q3", "q2"]], rtol=1e-6)
+    assert len(cached.cache) == 1  # queries are not written to SQLite
+    assert list(cached._queries) == ["q3", "q2"]
+    # Only the second q1 hits; q3 evicted q2, which then evicted q1
+    assert (cached.hits, cached.misses) == (1, 5)
+
+
+def test_only_builds_open_the_persistent_cache(tmp_path):
+    assert Path(DEFAULT_CACHE_PATH) == project_root / "data" / "cache" / "embeddings.sqlite"
+
+    cache_path = tmp_path / "cache" / "embeddings.sqlite"
+    builder = DrugVectorStore(db_name=str(tmp_path / "db"), embedding_model="hashing",
+                              embedding_cache_path=str(cache_path), backend="flat")
+    builder.create_vectorstore([Document(page_content="aspirin tablet",
+                                         metadata={"application_no": "000001", "product_no": "001"})])
+    assert len(builder.cached_embeddings.cache) == 1
+    builder.cached_embeddings.cache.close()
+
+    query_path = tmp_path / "query-cache" / "embeddings.sqlite"
+    reader = DrugVectorStore(db_name=str(tmp_path / "db"), embedding_model="hashing",
+                             embedding_cache_path=str(query_path), backend="flat")
+    assert reader.load_vectorstore() is not None
+    assert reader.similarity_search("aspirin", k=1)[0].page_content == "aspirin tablet"
+    assert not query_path.parent.exists()  # queries never touch SQLite
+
+
+def test_scheduler_backs_off_and_retries_rate_limited_batches():
+    texts = [f"Drug Name: DRUG {i}\nStrength: {i % 7}MG" for i in range(60)]
+    with FakeEmbeddingServer(latency=0.01, rate_limit=4) as server:
+        scheduler = EmbeddingScheduler(fake_openai(server), batch_size=5, max_in_flight=6, base_delay=0.05)
+        vectors = scheduler.embed_documents(texts)
+
+        assert server.rejected > 0
+        assert scheduler.last_run["rate_limited"] == server.rejected
+        assert scheduler.last_run["final_concurrency"] < 6  # halved on 429s
+        np.testing.assert_allclose(vectors, [server.embed(text) for text in texts], rtol=1e-6)
+
+
+
+def test_scheduler_retries_rate_limited_queries():
+    with FakeEmbeddingServer(latency=0.0, rate_limit=1) as server:
+        scheduler = EmbeddingScheduler(fake_openai(server), base_delay=0.05)
+        # The second request in the same second is answered with 429 and Retry-After
+        vectors = [scheduler.embed_query("aspirin"), scheduler.embed_query("ibuprofen")]
+
+        assert server.rejected >= 1
+        np.testing.assert_allclose(vectors, [server.embed("aspirin"), server.embed("ibuprofen")], rtol=1e-6)
+
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+def status_error(cls, status):
+    return cls(f"HTTP {status}", response=httpx.Response(status, request=REQUEST), body=None)
+
+
+@pytest.mark.parametrize("make_error", [
+    lambda: status_error(openai.InternalServerError, 503),
+    lambda: openai.APIConnectionError(request=REQUEST),
+    lambda: openai.APITimeoutError(request=REQUEST),
+], ids=["5xx", "connection", "timeout"])
+def test_scheduler_retries_transient_errors_without_lowering_concurrency(make_error):
+    embeddings = CountingEmbeddings(failures=[make_error(), make_error()])
+    scheduler = EmbeddingScheduler(embeddings, max_in_flight=4, base_delay=0.01)
+    vectors = scheduler.embed_documents(["aspirin", "ibuprofen"])
+
+    assert embeddings.calls == 3
+    np.testing.assert_allclose(vectors, [text_vector("aspirin"), text_vector("ibuprofen")], rtol=1e-6)
+    assert scheduler.last_run["transient_errors"] == 2
+    assert scheduler.last_run["rate_limited"] == 0
+    assert scheduler.last_run["final_concurrency"] == 4
+
+
+@pytest.mark.parametrize("make_error", [
+    lambda: ValueError("bad input"),
+    lambda: status_error(openai.BadRequestError, 400),
+    lambda: status_error(openai.AuthenticationError, 401),
+], ids=["ValueError", "400", "401"])
+def test_scheduler_does_not_retry_other_errors(make_error):
+    error = make_error()
+    embeddings = CountingEmbeddings(error=error)
+    scheduler = EmbeddingScheduler(embeddings, base_delay=0.01)
+    with pytest.raises(type(error)):
+        scheduler.embed_documents(["aspirin"])
+    assert embeddings.calls == 1
+
+
+def test_hashing_embeddings_are_deterministic_unit_vectors():
+    texts = ["Drug Name: METFORMIN\nForm: TABLET;ORAL", "Drug Name: METFORMIN\nForm: CAPSULE;ORAL",
+             "Drug Name: OZEMPIC\nForm: INJECTABLE;INJECTION"]
+    vectors = np.array(HashingEmbeddings().embed_documents(texts))
+    assert vectors.shape == (3, 384)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(HashingEmbeddings().embed_documents(texts), vectors)
+    np.testing.assert_allclose(HashingEmbeddings().embed_query(texts[0]), vectors[0])
+    # Shared words and trigrams make texts closer
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
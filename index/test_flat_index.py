@@ -0,0 +1,205 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from index.flat_index import FlatVectorIndex, normalize_rows
+from index.ann_index import IVFIndex, HNSWIndex, build_ann_index
+from index.quantization import QuantizedIndex, build_quantized_index
+from index.dim_reduction import Projector
+from index import evaluate_ann
+from index.evaluate_ann import synthetic_flat_index, sample_queries, recall_at_k
+from index.generations import new_generation, publish_generation
+
+
+def make_rows(n=500, dimensions=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dimensions)).astype(np.float32)
+    ids = [f"{i:06d}:001:0" for i in range(n)]
+    texts = [f"Drug Name: DRUG {i}" for i in range(n)]
+    metadatas = [{"application_no": f"{i:06d}", "product_no": "001"} for i in range(n)]
+    return vectors, ids, texts, metadatas
+
+
+@pytest.fixture
+def clustered(tmp_path):
+    """Clustered unit vectors, shaped like real embeddings, with queries near them and their exact top 10"""
+    flat = synthetic_flat_index(str(tmp_path / "flat"), rows=3000, dimensions=32, clusters=30)
+    queries = sample_queries(flat, 50)
+    return flat, queries, flat.search(queries, k=10)[0]
+
+
+def exact_top_k(vectors, queries, k):
+    scores = normalize_rows(queries) @ normalize_rows(vectors).T
+    indices = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return indices, np.take_along_axis(scores, indices, axis=1)
+
+
+def test_search_matches_brute_force(tmp_path):
+    vectors, ids, texts, metadatas = make_rows()
+    index = FlatVectorIndex.build(str(tmp_path), vectors, ids, texts, metadatas)
+    queries = np.random.default_rng(1).normal(size=(7, 32))
+
+    indices, scores = index.search(queries, k=10)
+    expected_indices, expected_scores = exact_top_k(vectors, queries, 10)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-6)
+    assert index.records([indices[0][0]]) == [(ids[expected_indices[0][0]], texts[expected_indices[0][0]],
+                                               metadatas[expected_indices[0][0]])]
+
+    reopened = FlatVectorIndex(str(tmp_path))
+    assert (len(reopened), reopened.dimensions) == (500, 32)
+    np.testing.assert_array_equal(reopened.search(queries, k=10)[0], expected_indices)
+
+
+def test_float16_index_ranks_like_float32(tmp_path):
+    vectors, ids, texts, metadatas = make_rows()
+    index = FlatVectorIndex.build(str(tmp_path), vectors, ids, texts, metadatas, dtype="float16")
+    assert index.vectors.dtype == np.float16
+    queries = np.random.default_rng(1).normal(size=(7, 32))
+
+    indices, scores = index.search(queries, k=10)
+    expected_indices, expected_scores = exact_top_k(vectors, queries, 10)
+    np.testing.assert_array_equal(indices[:, 0], expected_indices[:, 0])
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-2)
+    with pytest.raises(ValueError):
+        FlatVectorIndex.build(str(tmp_path / "bad"), vectors, ids, texts, metadatas, dtype="int8")
+
+
+def test_update_removes_replaces_and_appends_rows(tmp_path):
+    vectors, ids, texts, metadatas = make_rows(n=5)
+    index = FlatVectorIndex.build(str(tmp_path), vectors, ids, texts, metadatas)
+    replacement = np.ones((2, 32), dtype=np.float32)
+
+    updated = index.update(remove_ids=[ids[1]], vectors=replacement, ids=[ids[2], "999999:001:0"],
+                           texts=["replaced", "added"], metadatas=[{}, {}])
+    expected_ids = [ids[0], ids[3], ids[4], ids[2], "999999:001:0"]
+    assert updated.ids == expected_ids
+    assert FlatVectorIndex(str(tmp_path)).ids == expected_ids
+    assert [text for _, text, _ in updated.records([3, 4])] == ["replaced", "added"]
+    np.testing.assert_allclose(updated.vectors[3], normalize_rows(replacement)[0], rtol=1e-6)
+    np.testing.assert_allclose(updated.vectors[0], normalize_rows(vectors)[0], rtol=1e-6)
+
+
+def test_search_restricted_to_rows_matches_brute_force_over_them(tmp_path):
+    vectors, ids, texts, metadatas = make_rows()
+    index = FlatVectorIndex.build(str(tmp_path), vectors, ids, texts, metadatas)
+    queries = np.random.default_rng(1).normal(size=(3, 32))
+    rows = np.arange(3, 500, 7)
+
+    indices, _ = index.search(queries, k=5, rows=rows)
+    np.testing.assert_array_equal(indices, rows[exact_top_k(vectors[rows], queries, 5)[0]])
+    assert index.search(queries, k=5, rows=np.array([], dtype=np.int64))[0].shape == (3, 0)
+
+
+def test_empty_index_returns_no_results(tmp_path):
+    index = FlatVectorIndex.build(str(tmp_path), [], [], [], [])
+    indices, scores = index.search(np.ones((2, 8)), k=5)
+    assert indices.shape == scores.shape == (2, 0)
+
+
+def test_ivf_recall_rises_with_nprobe(clustered):
+    flat, queries, truth = clustered
+    index = IVFIndex.build(flat, nlist=30, nprobe=30)
+    assert recall_at_k(index.search(queries, k=10)[0], truth) == 1.0  # every list probed
+
+    recalls = []
+    for nprobe in (1, 4):
+        index.nprobe = nprobe
+        recalls.append(recall_at_k(index.search(queries, k=10)[0], truth))
+    assert recalls[0] <= recalls[1]
+    assert recalls[1] >= 0.9
+
+
+def test_hnsw_reaches_high_recall(clustered):
+    pytest.importorskip("hnswlib")
+    flat, queries, truth = clustered
+    index = HNSWIndex.build(flat, M=16, ef_construction=100, ef_search=64)
+    assert recall_at_k(index.search(queries, k=10)[0], truth) >= 0.95
+    assert HNSWIndex.load(flat, M=16, ef_construction=100) is not None
+    assert HNSWIndex.load(flat, M=8, ef_construction=100) is None  # other parameters: rebuild
+
+
+def test_ann_index_is_rebuilt_when_the_flat_matrix_changes(clustered):
+    flat, _, _ = clustered
+    IVFIndex.build(flat, nlist=16)
+    assert IVFIndex.load(flat).nlist == 16
+
+    updated = flat.update(remove_ids=flat.ids[:1])
+    assert IVFIndex.load(updated) is None
+    assert build_ann_index(updated, {"type": "ivf", "nlist": 16}).nlist == 16
+    assert IVFIndex.load(updated) is not None
+    with pytest.raises(ValueError):
+        build_ann_index(updated, {"type": "lsh"})
+
+
+@pytest.mark.parametrize("kind, m", [("int8", None), ("pq", 8)])
+def test_quantized_codes_rerank_to_high_recall(clustered, kind, m):
+    flat, queries, truth = clustered
+    index = QuantizedIndex.build(flat, kind=kind, m=m, rerank=10)
+    coarse = recall_at_k(index.search(queries, k=10)[0], truth)
+    index.rerank = 200
+    reranked = recall_at_k(index.search(queries, k=10)[0], truth)
+    assert coarse <= reranked
+    assert reranked >= 0.95
+    assert index.memory_bytes() < flat.vectors.nbytes
+
+    assert QuantizedIndex.load(flat, kind=kind, m=m) is not None
+    updated = flat.update(remove_ids=flat.ids[:1])
+    assert QuantizedIndex.load(updated, kind=kind, m=m) is None
+    rebuilt = build_quantized_index(updated, {"type": kind, "m": m, "rerank": 200})
+    assert recall_at_k(rebuilt.search(queries, k=10)[0], updated.search(queries, k=10)[0]) >= 0.95
+
+
+def test_pca_keeps_the_neighbours_of_low_rank_data(tmp_path):
+    # 128-d vectors that only vary in a 16-d subspace
+    rng = np.random.default_rng(0)
+    basis = rng.standard_normal((16, 128)).astype(np.float32)
+    vectors = rng.standard_normal((1000, 16)).astype(np.float32) @ basis + 3.0
+    queries = rng.standard_normal((20, 16)).astype(np.float32) @ basis + 3.0
+
+    projector = Projector("pca", 16).fit(vectors)
+    assert projector.explained_variance > 0.999
+    projected = projector.project(vectors)
+    assert projected.shape == (1000, 16)
+    np.testing.assert_allclose(np.linalg.norm(projected, axis=1), 1.0, rtol=1e-5)
+    # Cosine neighbours of the centered data survive the projection
+    truth = exact_top_k(vectors - projector.mean, queries - projector.mean, 10)[0]
+    found = exact_top_k(projected, projector.project(queries), 10)[0]
+    assert recall_at_k(found, truth) >= 0.99
+
+    projector.save(str(tmp_path))
+    np.testing.assert_allclose(Projector.load(str(tmp_path)).project(queries), projector.project(queries), rtol=1e-6)
+
+
+def test_truncation_keeps_the_leading_coordinates():
+    vectors = np.arange(24, dtype=np.float32).reshape(3, 8) + 1
+    np.testing.assert_allclose(Projector("truncate", 4).project(vectors), normalize_rows(vectors[:, :4]), rtol=1e-6)
+    with pytest.raises(ValueError):
+        Projector("pca", 4).project(vectors)  # not fitted
+    with pytest.raises(ValueError):
+        Projector("random", 4)
+
+
+def test_evaluate_ann_reads_the_published_generation_and_leaves_it_unchanged(tmp_path, monkeypatch, capsys):
+    root = str(tmp_path / "db")
+    generation = new_generation(root)
+    synthetic_flat_index(generation, rows=400, dimensions=16, clusters=8)
+    publish_generation(root, generation)
+    files = sorted(os.listdir(generation))
+
+    monkeypatch.setattr(sys, "argv", ["evaluate_ann.py", "--db", root, "--queries", "5", "-k", "5",
+                                      "--nlist", "8", "--nprobe", "2", "--M", "8", "--ef-search", "32",
+                                      "--quantize", "--rerank", "20"])
+    evaluate_ann.main()
+    output = capsys.readouterr().out
+    assert f"{generation}: 400 vectors x 16" in output
+    assert "exact (flat)" in output and "pq m=2" in output
+    # The candidate IVF, HNSW and quantized indexes were built in scratch, not beside the live index
+    assert sorted(os.listdir(generation)) == files
@@ -0,0 +1,490 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from index.vectorstore import DrugVectorStore, StaleDeltaError
+from index.index_stats import HyperLogLog, IndexStats, STATS_FILENAME
+from index.generations import list_generations, current_generation
+from ingest.incremental import compute_delta, group_documents, hash_documents, snapshot_id, write_delta
+
+FORMS = ["TABLET;ORAL", "CAPSULE;ORAL", "INJECTABLE;INJECTION", "CREAM;TOPICAL"]
+DRUGS = ["OZEMPIC", "METFORMIN", "LISINOPRIL", "ASPIRIN", "IBUPROFEN"]
+SPONSORS = ["PFIZER", "NOVARTIS", "LILLY", "MERCK"]
+RARE_SPONSOR = "ORPHAN PHARMA"
+BACKENDS = ["flat", "chroma"]
+
+
+class InterruptedEmbeddings(Embeddings):
+    """Wraps a store's embedder, counting the texts it embeds and failing after `fail_after` calls"""
+
+    def __init__(self, inner, fail_after=None):
+        self.inner = inner
+        self.fail_after = fail_after
+        self.calls = 0
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("connection lost")
+        self.calls += 1
+        self.embedded += len(texts)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.inner.embed_query(text)
+
+
+def make_records(applications=150):
+    """FDA records with one to three products per application; in every fifth application
+    the first two products render identically"""
+    records = []
+    for a in range(applications):
+        appl_no = f"{a + 1:06d}"
+        drug = DRUGS[a % len(DRUGS)]
+        for p in range(1 + a % 3):
+            variant = 0 if a % 5 == 0 and p == 1 else p
+            records.append({
+                "application_no": appl_no,
+                "product_no": f"{p + 1:03d}",
+                "drug_name": drug,
+                "active_ingredient": f"{drug.lower()} hcl",
+                "form": FORMS[(a + variant) % len(FORMS)],
+                "strength": f"{5 * (variant + 1)}MG",
+                "marketing_status": "Prescription",
+                "sponsor_name": RARE_SPONSOR if a == 7 else SPONSORS[a % len(SPONSORS)],
+                "application_type": "NDA",
+                "description": f"{drug} is a {FORMS[(a + variant) % len(FORMS)]} formulation.",
+            })
+    return records
+
+
+def make_store(db, backend="chroma", **options):
+    return DrugVectorStore(db_name=str(db), embedding_model="hashing", embedding_cache_path=None,
+                           backend=backend, **options)
+
+
+def write_delta_file(old_records, new_records, path):
+    """The delta ingest would write for a rebuild going from `old_records` to `new_records`"""
+    entries, hashes = compute_delta(hash_documents(old_records), group_documents(new_records))
+    write_delta(entries, path, snapshot_id(hash_documents(old_records)), snapshot_id(hashes))
+
+
+def stored_chunks(store):
+    """{chunk id: (text, metadata)} of everything in the store"""
+    if store.backend == "flat":
+        index = store.vectorstore
+        return {chunk_id: (text, metadata) for chunk_id, text, metadata
+                in index.records(range(len(index)))}
+    found = store.vectorstore._collection.get(include=["documents", "metadatas"])
+    return {chunk_id: (text, metadata)
+            for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])}
+
+
+def texts(documents):
+    return [doc.page_content for doc in documents]
+
+
+def comparable_stats(store):
+    return {key: value for key, value in store.get_stats().items() if key != "database_path"}
+
+
+@pytest.fixture
+def records():
+    return make_records()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_upserting_a_product_replaces_all_of_its_chunks(tmp_path, records, backend):
+    store = make_store(tmp_path / "db", backend)
+    store.create_vectorstore(store.documents_from_records(records))
+    assert "000001:001:0" in stored_chunks(store)
+
+    # A product with two TE-code records gets two chunks; shrinking back to one leaves no stale chunk
+    second = dict(records[0], strength="50MG")
+    assert store.upsert_documents(store.documents_from_records([records[0], second])) == 2
+    assert {"000001:001:0", "000001:001:1"} <= set(stored_chunks(store))
+    assert store.upsert_documents(store.documents_from_records([second])) == 1
+    chunks = stored_chunks(store)
+    assert "000001:001:1" not in chunks
+    assert "50MG" in chunks["000001:001:0"][0]
+
+    store.delete_documents([("000002", "001"), ("000002", "002")])
+    assert not [chunk_id for chunk_id in stored_chunks(store) if chunk_id.startswith("000002:")]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_applying_a_delta_matches_a_fresh_build(tmp_path, records, backend):
+    changed = dict(records[3], strength="12.5MG")
+    deleted = records[4]
+    added = dict(records[0], application_no="999999", product_no="001", drug_name="NEWDRUG")
+    new_records = [changed if record is records[3] else record for record in records if record is not deleted]
+    new_records.append(added)
+
+    delta_path = str(tmp_path / "delta.jsonl")
+    write_delta_file(records, new_records, delta_path)
+
+    updated = make_store(tmp_path / "updated", backend)
+    updated.create_vectorstore(updated.documents_from_records(records), records=records)
+    counts = updated.apply_delta(delta_path)
+    assert (counts["added"], counts["changed"], counts["deleted"]) == (1, 1, 1)
+
+    fresh = make_store(tmp_path / "fresh", backend)
+    fresh.create_vectorstore(fresh.documents_from_records(new_records), records=new_records)
+    assert stored_chunks(updated) == stored_chunks(fresh)
+    assert comparable_stats(updated) == comparable_stats(fresh)
+    # The index now records the snapshot it reflects, so the same delta is not applied twice
+    reader = make_store(tmp_path / "updated", backend)
+    reader.load_vectorstore()
+    assert reader.snapshot == updated.snapshot == fresh.snapshot
+    assert reader.apply_delta(delta_path)["chunks_written"] == 0
+    assert stored_chunks(reader) == stored_chunks(fresh)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_apply_delta_refuses_a_delta_computed_against_another_snapshot(tmp_path, records, backend):
+    delta_path = str(tmp_path / "delta.jsonl")
+    write_delta_file(records, records[:-10], delta_path)
+
+    store = make_store(tmp_path / "db", backend)
+    store.create_vectorstore(store.documents_from_records(records[:100]), records=records[:100])
+    before = stored_chunks(store)
+    with pytest.raises(StaleDeltaError):
+        store.apply_delta(delta_path)
+    assert stored_chunks(store) == before
+
+    # An index built without its source records has no snapshot to check against
+    unknown = make_store(tmp_path / "unknown", backend)
+    unknown.create_vectorstore(unknown.documents_from_records(records))
+    with pytest.raises(StaleDeltaError):
+        unknown.apply_delta(delta_path)
+
+
+def test_an_interrupted_build_resumes_after_the_last_commit(tmp_path, records):
+    fresh = make_store(tmp_path / "fresh")
+    fresh.create_vectorstore(fresh.documents_from_records(records))
+
+    store = make_store(tmp_path / "db")
+    store.embeddings = InterruptedEmbeddings(store.embeddings, fail_after=2)
+    with pytest.raises(RuntimeError):
+        store.create_vectorstore(store.documents_from_records(records), commit_batch_size=50)
+    assert store.read_checkpoint()["committed_chunks"] == 100
+
+    resumed = make_store(tmp_path / "db")
+    resumed.embeddings = InterruptedEmbeddings(resumed.embeddings)
+    resumed.create_vectorstore(resumed.documents_from_records(records), resume=True, commit_batch_size=50)
+    assert resumed.embeddings.embedded == len(stored_chunks(fresh)) - 100
+    assert stored_chunks(resumed) == stored_chunks(fresh)
+
+
+def test_record_mode_indexes_compact_unsplit_records(tmp_path, records, monkeypatch):
+    monkeypatch.setitem(sys.modules, "tiktoken", None)  # count tokens as chars/4, offline
+    plain = make_store(tmp_path / "plain")
+    plain.create_vectorstore(plain.documents_from_records(records))
+    compact = make_store(tmp_path / "compact", record_mode=True)
+    compact.create_vectorstore(compact.documents_from_records(records))
+
+    plain_chunks, compact_chunks = stored_chunks(plain), stored_chunks(compact)
+    assert set(compact_chunks) == set(plain_chunks)  # chunk IDs are unchanged
+    for chunk_id, (text, _) in compact_chunks.items():
+        assert "Description:" not in text
+        assert text in plain_chunks[chunk_id][0]
+
+    chunks, _ = compact.split_with_ids(compact.documents_from_records(records))
+    stats = compact.report_token_savings(chunks, records)
+    assert stats["method"] == "chars/4"
+    assert stats["tokens_embedded"] == sum(len(chunk.page_content) for chunk in chunks) // 4
+    assert stats["tokens_saved"] == sum(len(f"\nDescription: {record['description']}") for record in records) // 4
+    assert stats["tokens_deduplicated"] == 0
+
+    # With duplicates collapsed, both counts cover only the products that keep a chunk
+    documents = compact.documents_from_records(records)
+    collapsed = compact.collapse_duplicate_records(documents)
+    kept = {compact.document_key(doc.metadata) for doc in collapsed}
+    duplicates = [doc for doc in documents if compact.document_key(doc.metadata) not in kept]
+    kept_records = [record for record in records if compact.document_key(record) in kept]
+    assert duplicates and len(kept_records) == len(records) - len(duplicates)
+    chunks, _ = compact.split_with_ids(collapsed)
+    stats = compact.report_token_savings(chunks, records, duplicates)
+    assert stats["tokens_saved"] == sum(len(f"\nDescription: {record['description']}") for record in kept_records) // 4
+    full_tokens = sum(len(doc.page_content) for doc in plain.documents_from_records(kept_records)) // 4
+    assert abs(stats["tokens_embedded"] + stats["tokens_saved"] - full_tokens) <= 1  # rounding of two estimates
+    assert stats["tokens_deduplicated"] == sum(len(doc.page_content) for doc in duplicates) // 4
+
+
+def test_flat_and_chroma_backends_return_the_same_results(tmp_path, records):
+    stores = {}
+    for backend in BACKENDS:
+        stores[backend] = make_store(tmp_path / backend, backend)
+        stores[backend].create_vectorstore(stores[backend].documents_from_records(records))
+    assert stores["flat"].get_stats()["total_documents"] == stores["chroma"].get_stats()["total_documents"]
+
+    queries = ["metformin tablet", "ozempic injection pfizer", "aspirin 10MG"]
+    results = {backend: store.similarity_search_batch(queries, k=5) for backend, store in stores.items()}
+    for backend, store in stores.items():
+        assert [len(found) for found in results[backend]] == [5, 5, 5]
+        # The batch call returns what one search per query would
+        assert ([texts(found) for found in results[backend]]
+                == [texts(store.similarity_search(query, k=5)) for query in queries])
+        retrieved = store.as_retriever(search_kwargs={"k": 3}).invoke(queries[0])
+        assert texts(retrieved) == texts(results[backend][0][:3])
+    # Many products render identically, so compare texts rather than which tied product came first
+    for flat, chroma in zip(results["flat"], results["chroma"]):
+        assert texts(flat) == texts(chroma)
+
+
+@pytest.mark.parametrize("options", [{"ann": {"type": "ivf", "nlist": 8, "nprobe": 8}},
+                                     {"ann": {"type": "hnsw", "M": 16, "ef_construction": 200, "ef_search": 200}},
+                                     {"quantization": {"type": "int8", "rerank": 50}},
+                                     {"quantization": {"type": "pq", "m": 48, "rerank": 50}}])
+def test_flat_backend_searches_through_an_ann_index(tmp_path, records, options):
+    if options.get("ann", {}).get("type") == "hnsw":
+        pytest.importorskip("hnswlib")
+    exact = make_store(tmp_path / "exact", "flat")
+    exact.create_vectorstore(exact.documents_from_records(records))
+    store = make_store(tmp_path / "ann", "flat", **options)
+    store.create_vectorstore(store.documents_from_records(records))
+    assert store.ann_index is not None
+
+    # Probing every list, a wide beam or a deep re-rank finds what exact search finds
+    queries = ["metformin tablet", "ozempic injection pfizer", "aspirin 10MG"]
+    assert ([texts(found) for found in store.similarity_search_batch(queries, k=5)]
+            == [texts(found) for found in exact.similarity_search_batch(queries, k=5)])
+
+    # The ANN index follows updates of the flat matrix
+    added = dict(records[0], application_no="999999", product_no="001", drug_name="NEWDRUG")
+    store.upsert_documents(store.documents_from_records([added]))
+    [found] = store.similarity_search_batch([store.documents_from_records([added])[0].page_content], k=1)
+    assert found[0].metadata["application_no"] == "999999"
+
+
+def test_quantization_needs_the_flat_backend_without_ann(tmp_path):
+    with pytest.raises(ValueError):
+        make_store(tmp_path / "db", "chroma", quantization={"type": "int8"})
+    with pytest.raises(ValueError):
+        make_store(tmp_path / "db", "flat", ann={"type": "ivf"}, quantization={"type": "int8"})
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_reduced_dimension_index_is_searched_with_its_saved_projection(tmp_path, records, backend):
+    store = make_store(tmp_path / "db", backend, reduce_dimensions={"type": "pca", "dimensions": 64})
+    store.create_vectorstore(store.documents_from_records(records))
+    assert len(store.embeddings.embed_query("metformin")) == 64
+
+    # A reader gets the writer's PCA from the index directory, not a fresh fit
+    reader = make_store(tmp_path / "db", backend, reduce_dimensions={"type": "pca", "dimensions": 64})
+    reader.load_vectorstore()
+    queries = ["metformin tablet", "ozempic injection pfizer"]
+    assert ([texts(found) for found in reader.similarity_search_batch(queries, k=5)]
+            == [texts(found) for found in store.similarity_search_batch(queries, k=5)])
+    [found] = reader.similarity_search_batch([stored_chunks(store)["000009:001:0"][0]], k=1)
+    assert found[0].page_content == stored_chunks(store)["000009:001:0"][0]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_filtered_dense_search_only_returns_matching_chunks(tmp_path, records, backend):
+    store = make_store(tmp_path / "db", backend)
+    store.create_vectorstore(store.documents_from_records(records))
+    found = store.similarity_search("metformin tablet", k=10, filter={"sponsor_name": "PFIZER"})
+    assert len(found) == 10
+    assert {doc.metadata["sponsor_name"] for doc in found} == {"PFIZER"}
+
+    found = store.similarity_search("metformin", k=10, filter={"form": {"$contains": "tablet"},
+                                                               "sponsor_name": ["PFIZER", "LILLY"]})
+    assert found
+    assert all(doc.metadata["form"] == "TABLET;ORAL" for doc in found)
+    assert {doc.metadata["sponsor_name"] for doc in found} <= {"PFIZER", "LILLY"}
+
+    assert store.similarity_search("metformin", k=5, filter={"sponsor_name": "NOBODY"}) == []
+    with pytest.raises(ValueError):
+        store.similarity_search("metformin", k=5, filter={"strength": "5MG"})
+
+    # Filters see updates: the postings (flat) and the distinct values (Chroma) are refreshed
+    added = dict(records[0], application_no="999999", product_no="001", sponsor_name="NEWCO",
+                 form="PATCH;TRANSDERMAL")
+    store.upsert_documents(store.documents_from_records([added]))
+    found = store.similarity_search("ozempic", k=5, filter={"form": {"$contains": "patch"}})
+    assert [doc.metadata["application_no"] for doc in found] == ["999999"]
+
+
+def test_hyperloglog_estimates_distinct_values():
+    sketch = HyperLogLog()
+    sketch.add(f"SPONSOR {i}" for i in range(20000))
+    sketch.add(f"SPONSOR {i}" for i in range(5000))  # repeats do not count
+    assert abs(sketch.count() - 20000) < 20000 * 0.03
+    assert HyperLogLog.from_json(sketch.to_json()).count() == sketch.count()
+
+    small = HyperLogLog()
+    small.add(["PFIZER", "LILLY", "PFIZER"])
+    assert small.count() == 2
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_stats_sidecar_follows_updates_and_is_recounted_when_stale(tmp_path, records, backend):
+    store = make_store(tmp_path / "db", backend)
+    store.create_vectorstore(store.documents_from_records(records))
+    stats = store.get_stats()
+    assert stats["total_documents"] == len(stored_chunks(store))
+    assert (stats["unique_drugs"], stats["unique_sponsors"]) == (len(DRUGS), len(SPONSORS) + 1)
+    assert stats["document_types"] == ["fda_drug"]
+
+    store.delete_documents([("000002", "001"), ("000002", "002")])
+    store.upsert_documents(store.documents_from_records([dict(records[0], application_no="999999", sponsor_name="NEWCO")]))
+    expected = len(stored_chunks(store))
+    assert store.get_stats()["total_documents"] == expected
+    assert store.get_stats()["unique_sponsors"] == len(SPONSORS) + 2
+
+    sidecar = IndexStats.load(store.db_name)
+    assert sidecar.total == expected
+    assert sidecar.histograms["form"] == IndexStats.from_metadatas(
+        metadata for _, metadata in stored_chunks(store).values()).histograms["form"]
+
+    # A missing or out-of-date sidecar is recounted from the stored metadata
+    for stale in (None, IndexStats(total=1)):
+        if stale is None:
+            os.remove(os.path.join(store.db_name, STATS_FILENAME))
+        else:
+            stale.save(store.db_name)
+        reader = make_store(tmp_path / "db", backend)
+        reader.load_vectorstore()
+        assert reader.get_stats()["total_documents"] == expected
+        assert IndexStats.load(store.db_name).total == expected
+
+
+def test_rebuild_publishes_a_new_generation_and_readers_refresh(tmp_path, records):
+    for backend in BACKENDS:
+        db = tmp_path / backend
+        writer = make_store(db, backend)
+        writer.create_vectorstore(writer.documents_from_records(records[:100]))
+        reader = make_store(db, backend)
+        reader.load_vectorstore()
+        assert reader.refresh_if_stale() is False
+        first = reader.db_name
+
+        writer = make_store(db, backend)
+        writer.create_vectorstore(writer.documents_from_records(records))
+        assert reader.db_name == first  # readers keep the old generation until they refresh
+        assert reader.refresh_if_stale() is True
+        assert reader.db_name == writer.db_name != first
+        assert reader.get_stats()["total_documents"] == writer.get_stats()["total_documents"]
+
+        writer = make_store(db, backend)
+        writer.create_vectorstore(writer.documents_from_records(records[:50]))
+        assert len(list_generations(str(db))) == 2  # the oldest generation is collected
+        assert reader.refresh_if_stale() is True
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_duplicate_products_collapse_into_one_chunk(tmp_path, records, backend):
+    plain = make_store(tmp_path / "plain", backend)
+    plain.create_vectorstore(plain.documents_from_records(records))
+    assert len(stored_chunks(plain)) == len(records)  # collapsing is opt-in
+
+    store = make_store(tmp_path / "db", backend, collapse_duplicates=True)
+    store.create_vectorstore(store.documents_from_records(records))
+    chunks = stored_chunks(store)
+    assert chunks["000006:001:0"][1]["product_nos"] == "001,002"
+    assert "000006:002:0" not in chunks
+    assert len(chunks) == len(records) - sum(1 for a in range(0, 150, 5) if a % 3 >= 1)
+    assert store.get_stats()["total_documents"] == len(chunks)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_product_no_filters_match_every_product_of_a_collapsed_chunk(tmp_path, records, backend):
+    store = make_store(tmp_path / "db", backend, collapse_duplicates=True)
+    store.create_vectorstore(store.documents_from_records(records))
+    text = stored_chunks(store)["000006:001:0"][0]
+
+    for product_no in ("001", "002", ["002", "003"], {"$contains": "02"}):
+        found = store.similarity_search(text, k=3, filter={"application_no": "000006", "product_no": product_no})
+        assert found[0].page_content == text
+        assert found[0].metadata["product_nos"] == "001,002"
+    found = store.similarity_search(text, k=3, filter={"application_no": "000006", "product_no": "003"})
+    assert [doc.metadata["product_no"] for doc in found] == ["003"]
+    assert store.similarity_search(text, k=3, filter={"application_no": "000006", "product_no": "004"}) == []
+    found = store.lexical_search_batch([text], k=3, filter={"product_no": "002", "application_no": "000006"})[0]
+    assert [doc.metadata["product_no"] for doc in found] == ["001"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_deleting_the_primary_product_rehomes_the_collapsed_chunk(tmp_path, records, backend):
+    store = make_store(tmp_path / "db", backend, collapse_duplicates=True)
+    store.create_vectorstore(store.documents_from_records(records))
+    text = stored_chunks(store)["000006:001:0"][0]
+
+    store.delete_documents([("000006", "001")])
+    chunks = stored_chunks(store)
+    assert "000006:001:0" not in chunks
+    assert chunks["000006:002:0"][0] == text
+    assert chunks["000006:002:0"][1]["product_no"] == "002"
+    assert not chunks["000006:002:0"][1].get("product_nos")
+    found = store.similarity_search(text, k=1, filter={"application_no": "000006"})
+    assert [doc.metadata["product_no"] for doc in found] == ["002"]
+
+    store.delete_documents([("000006", "002")])
+    # The application's third product was never part of the duplicate group
+    assert [chunk_id for chunk_id in stored_chunks(store) if chunk_id.startswith("000006:")] == ["000006:003:0"]
+    assert store.get_stats()["total_documents"] == len(stored_chunks(store))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_filtered_lexical_search_scores_only_matching_chunks(tmp_path, records, backend):
+    store = make_store(tmp_path / "db", backend)
+    store.create_vectorstore(store.documents_from_records(records))
+    # Most LISINOPRIL chunks belong to other sponsors; the filter must apply before the top k is taken
+    [found] = store.lexical_search_batch(["lisinopril"], k=1, filter={"sponsor_name": RARE_SPONSOR})
+    assert [(doc.metadata["drug_name"], doc.metadata["sponsor_name"]) for doc in found] == [
+        ("LISINOPRIL", RARE_SPONSOR)]
+
+    [found] = store.lexical_search_batch(["ozempic"], k=3, filter={"sponsor_name": "NOBODY"})
+    assert found == []
+
+
+def test_flat_updates_publish_a_generation_readers_refresh_to(tmp_path, records):
+    db = tmp_path / "db"
+    writer = make_store(db, "flat")
+    writer.create_vectorstore(writer.documents_from_records(records))
+    reader = make_store(db, "flat")
+    reader.load_vectorstore()
+    before = current_generation(str(db))
+
+    added = dict(records[0], application_no="999999", product_no="001", drug_name="NEWDRUG")
+    assert writer.upsert_documents(writer.documents_from_records([added])) == 1
+    assert current_generation(str(db)) != before
+    # The old generation is untouched, so a reader that has not refreshed stays consistent
+    assert "999999:001:0" not in stored_chunks(reader)
+    assert reader.refresh_if_stale() is True
+    assert stored_chunks(reader)["999999:001:0"][1]["drug_name"] == "NEWDRUG"
+
+
+def test_chroma_updates_bump_the_generation_readers_refresh_to(tmp_path, records):
+    db = tmp_path / "db"
+    writer = make_store(db, "chroma")
+    writer.create_vectorstore(writer.documents_from_records(records))
+    reader = make_store(db, "chroma")
+    reader.load_vectorstore()
+    generation = current_generation(str(db))
+    reader.lexical_search_batch(["newdrug"], k=1)  # loads the reader's BM25 index
+    reader.get_stats()
+
+    added = dict(records[0], application_no="999999", product_no="001", drug_name="NEWDRUG")
+    assert writer.upsert_documents(writer.documents_from_records([added])) == 1
+    # Chroma is updated in place, so the generation stays and its update counter moves instead
+    assert current_generation(str(db)) == generation
+    assert writer.refresh_if_stale() is False
+    assert reader.refresh_if_stale() is True
+    assert reader.refresh_if_stale() is False
+    [found] = reader.lexical_search_batch(["newdrug"], k=1)
+    assert [doc.metadata["application_no"] for doc in found] == ["999999"]
+    assert reader.get_stats()["total_documents"] == len(stored_chunks(writer))
+
+    writer.delete_documents([("999999", "001")])
+    assert reader.refresh_if_stale() is True
+    assert reader.lexical_search_batch(["newdrug"], k=1) == [[]]
+    assert reader.get_stats()["total_documents"] == len(stored_chunks(writer))
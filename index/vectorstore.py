@@ -1,6 +1,8 @@
 import os
 import json
-from typing import List, Optional
+import hashlib
+import threading
+from typing import Any, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 
 from langchain.schema import Document
@@ -8,29 +10,169 @@ from langchain.text_splitter import CharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.retrievers import BaseRetriever
+
+try:
+    from index.embedding_cache import CachedEmbeddings, EmbeddingCache, DEFAULT_CACHE_PATH
+except ImportError:  # run from inside index/
+    from embedding_cache import CachedEmbeddings, EmbeddingCache, DEFAULT_CACHE_PATH
+try:
+    from index.embedding_scheduler import EmbeddingScheduler
+    from index.local_embeddings import LocalCPUEmbeddings, HashingEmbeddings
+    from index.flat_index import FlatVectorIndex
+    from index.ann_index import build_ann_index
+    from index.quantization import build_quantized_index
+    from index.dim_reduction import Projector, ProjectedEmbeddings
+    from index.metadata_index import (MetadataIndex, validate_filter, to_chroma_where, metadata_values,
+                                      FILTER_FIELDS, MULTI_VALUED_FIELDS)
+    from index.ann_index import flat_version
+    from index.index_stats import IndexStats
+    from index.bm25 import BM25Index, BM25_FILENAME
+    from index.generations import (active_directory, new_generation, pending_generation,
+                                   publish_generation, collect_garbage, update_count, record_update)
+except ImportError:
+    from embedding_scheduler import EmbeddingScheduler
+    from local_embeddings import LocalCPUEmbeddings, HashingEmbeddings
+    from flat_index import FlatVectorIndex
+    from ann_index import build_ann_index
+    from quantization import build_quantized_index
+    from dim_reduction import Projector, ProjectedEmbeddings
+    from metadata_index import (MetadataIndex, validate_filter, to_chroma_where, metadata_values,
+                                FILTER_FIELDS, MULTI_VALUED_FIELDS)
+    from ann_index import flat_version
+    from index_stats import IndexStats
+    from bm25 import BM25Index, BM25_FILENAME
+    from generations import (active_directory, new_generation, pending_generation,
+                             publish_generation, collect_garbage, update_count, record_update)
 
 # Load environment variables
 load_dotenv(override=True)
 
+CHECKPOINT_FILENAME = "build_checkpoint.json"
+# Ingest snapshot (ingest/incremental.py snapshot_id) of the records an index reflects
+SNAPSHOT_FILENAME = "ingest_snapshot.json"
+
+
+class StaleDeltaError(ValueError):
+    """A delta was computed against a different ingest snapshot than the index reflects"""
+
+
+def file_sha256(path: str) -> str:
+    """Content hash of an input file, streamed in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def count_tokens(texts: List[str]) -> Tuple[int, str]:
+    """Tokens in `texts` under the OpenAI embedding tokenizer, or a chars/4 estimate without it"""
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model("text-embedding-ada-002")
+        return sum(len(tokens) for tokens in encoding.encode_batch(texts)), "tiktoken"
+    except Exception:
+        # tiktoken missing, or its BPE file cannot be downloaded
+        return sum(len(text) for text in texts) // 4, "chars/4"
+
+
+class DrugVectorStoreRetriever(BaseRetriever):
+    """LangChain retriever over DrugVectorStore.similarity_search, for backends without their own"""
+    
+    vector_store: Any
+    k: int = 4
+    filter: Optional[dict] = None
+    
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.vector_store.similarity_search(query, k=self.k, filter=self.filter)
+
+
 class DrugVectorStore:
     """Vector store for FDA drug documents using ChromaDB"""
     
     def __init__(self, 
                  db_name: str = "drug_vector_db",
-                 embedding_model: str = "openai",  # "openai" or "huggingface"
+                 embedding_model: str = "openai",  # "openai", "huggingface", "local" or "hashing"
                  chunk_size: int = 1000,
-                 chunk_overlap: int = 200):
+                 chunk_overlap: int = 200,
+                 embedding_cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 embed_batch_size: int = 256,
+                 max_in_flight: int = 4,
+                 record_mode: bool = False,
+                 local_embedding_options: Optional[dict] = None,
+                 backend: str = "chroma",  # "chroma" or "flat"
+                 flat_dtype: str = "float32",
+                 ann: Optional[dict] = None,
+                 quantization: Optional[dict] = None,
+                 reduce_dimensions: Optional[dict] = None,
+                 keep_generations: int = 2,
+                 collapse_duplicates: bool = False):
         
-        self.db_name = db_name
+        if backend not in ("chroma", "flat"):
+            raise ValueError(f"Unknown backend: {backend}")
+        if ann and backend == "chroma" and ann.get("type") != "hnsw":
+            raise ValueError("The chroma backend only supports an HNSW ann config")
+        if quantization and (backend != "flat" or ann):
+            raise ValueError("Quantization needs the flat backend and no ann config")
+        # Full builds write a new generation under db_root and publish it atomically;
+        # db_name is the directory of the generation in use (see index/generations.py)
+        self.db_root = db_name
+        self.db_name = active_directory(db_name)
+        # In-place updates of db_name (Chroma upserts/deletes) reflected in what is loaded
+        self.loaded_updates = update_count(self.db_name)
+        self.keep_generations = keep_generations
+        self._refresh_lock = threading.Lock()
+        self.backend = backend
+        self.flat_dtype = flat_dtype
+        # ANN settings: {"type": "hnsw", "M", "ef_construction", "ef_search"} or
+        # {"type": "ivf", "nlist", "nprobe"} (flat backend only); None means exact/Chroma defaults
+        self.ann = ann
+        # Compressed codes searched first, then re-ranked at full precision (flat backend only):
+        # {"type": "int8", "rerank"} or {"type": "pq", "m", "rerank"}
+        self.quantization = quantization
+        self.ann_index = None
+        # Inverted (field, value) -> rows index for filtered flat searches, loaded on first use
+        self.metadata_index = None
+        self._metadata_index_store = None
+        # Distinct values per filter field (and product_nos groups) in the Chroma collection,
+        # for expanding $contains and product-number filters
+        self._filter_values = None
+        # BM25 keyword index over the chunk texts, loaded on first lexical search
+        self.bm25_index = None
+        self._bm25_store = None
+        # Counts, histograms and distinct-value sketches, maintained as chunks are written
+        self.index_stats = None
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Record mode: compact text without the redundant Description line, no splitting of short records
+        self.record_mode = record_mode
+        # Store one vector for products of an application whose documents render identically (opt-in)
+        self.collapse_duplicates = collapse_duplicates
+        self.dedup_stats = None
+        # Ingest snapshot the index was built from or last updated to; None if unknown
+        self.snapshot = None
         
         # Initialize embeddings
         if embedding_model == "openai":
             # Set up OpenAI API key
             os.environ['OPENAI_API_KEY'] = os.getenv('OPENAI_API_KEY', 'your-key-if-not-using-env')
-            self.embeddings = OpenAIEmbeddings()
-            print("Using OpenAI embeddings")
+            # Retries are left to the scheduler, which backs off across all in-flight batches
+            self.embeddings = EmbeddingScheduler(
+                OpenAIEmbeddings(max_retries=0),
+                batch_size=embed_batch_size,
+                max_in_flight=max_in_flight
+            )
+            print(f"Using OpenAI embeddings ({max_in_flight} concurrent batches of {embed_batch_size})")
+        elif embedding_model == "local":
+            # In-process CPU model; options: model_name, batch_size, num_threads, quantize, warmup
+            self.embeddings = LocalCPUEmbeddings(**(local_embedding_options or {}))
+            print(f"Using local CPU embeddings ({self.embeddings.model}, {self.embeddings.num_threads} threads, "
+                  f"loaded in {self.embeddings.load_seconds:.1f}s)")
+        elif embedding_model == "hashing":
+            # Deterministic, offline embeddings for tests and benchmarks
+            self.embeddings = HashingEmbeddings(**(local_embedding_options or {}))
+            print(f"Using hashing embeddings ({self.embeddings.dimensions} dimensions)")
         else:
             # Use free HuggingFace embeddings
             try:
@@ -50,6 +192,22 @@ class DrugVectorStore:
                 except Exception as e2:
                     raise ValueError(f"Could not load any HuggingFace embedding model. Error: {e2}")
         
+        # Reuse vectors for chunk texts that were already embedded by this model. The SQLite
+        # file is only opened once documents are embedded (builds and updates); query-only
+        # processes keep query vectors in memory.
+        self.cached_embeddings = None
+        if embedding_cache_path:
+            self.embeddings = self.cached_embeddings = CachedEmbeddings(self.embeddings, EmbeddingCache(embedding_cache_path))
+            print(f"Using embedding cache at {embedding_cache_path} for document embeddings")
+        
+        # Reduced-dimension index: {"type": "pca" or "truncate", "dimensions", "fit_sample"}.
+        # Projection wraps the cache, so cached vectors stay full-size.
+        self.reduce_dimensions = reduce_dimensions
+        if reduce_dimensions:
+            projector = Projector(reduce_dimensions.get("type", "pca"), reduce_dimensions["dimensions"])
+            self.embeddings = ProjectedEmbeddings(self.embeddings, projector)
+            print(f"Projecting embeddings to {projector.dimensions} dimensions ({projector.kind})")
+        
         # Initialize text splitter
         self.text_splitter = CharacterTextSplitter(
             chunk_size=self.chunk_size, 
@@ -58,43 +216,70 @@ class DrugVectorStore:
         
         self.vectorstore = None
     
-    def load_documents_from_jsonl(self, jsonl_path: str) -> List[Document]:
-        """Load FDA drug documents from JSONL file"""
-        documents = []
-        
-        print(f"Loading documents from {jsonl_path}...")
+    def load_records_from_jsonl(self, jsonl_path: str) -> List[dict]:
+        """Load the FDA drug records of a JSONL file"""
+        records = []
         
         with open(jsonl_path, 'r', encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
                 try:
-                    data = json.loads(line.strip())
-                    
-                    # Create document content from drug data
-                    content = self._create_document_content(data)
-                    
-                    # Create metadata
-                    metadata = {
-                        "doc_type": "fda_drug",
-                        "application_no": data.get("application_no", ""),
-                        "product_no": data.get("product_no", ""),
-                        "drug_name": data.get("drug_name", ""),
-                        "form": data.get("form", ""),
-                        "marketing_status": data.get("marketing_status", ""),
-                        "sponsor_name": data.get("sponsor_name", ""),
-                        "source": "FDA"
-                    }
-                    
-                    # Create LangChain Document
-                    doc = Document(page_content=content, metadata=metadata)
-                    documents.append(doc)
+                    records.append(json.loads(line.strip()))
                     
                 except json.JSONDecodeError as e:
                     print(f"Error parsing line {line_num}: {e}")
                     continue
         
+        return records
+    
+    def load_documents_from_jsonl(self, jsonl_path: str) -> List[Document]:
+        """Load FDA drug documents from JSONL file"""
+        print(f"Loading documents from {jsonl_path}...")
+        documents = self.documents_from_records(self.load_records_from_jsonl(jsonl_path))
+        print(f"Loaded {len(documents)} documents")
+        return documents
+    
+    def documents_from_records(self, records: List[dict]) -> List[Document]:
+        """LangChain Documents for FDA drug records"""
+        return [self._record_to_document(data) for data in records]
+    
+    def load_documents_from_store(self, store_path: str, keys: Optional[List[tuple]] = None) -> List[Document]:
+        """Load FDA drug documents from the binary document store (ingest/doc_store.py).
+        
+        With `keys` ((application_no, product_no) pairs), only those products are
+        read, by offset, instead of scanning the whole file.
+        """
+        from ingest.doc_store import DocumentStore
+        
+        print(f"Loading documents from {store_path}...")
+        with DocumentStore(store_path) as store:
+            if keys is None:
+                records = list(store)
+            else:
+                records = [record for key in keys for record in store.get_all(*key)]
+        
+        documents = self.documents_from_records(records)
         print(f"Loaded {len(documents)} documents")
         return documents
     
+    def _record_to_document(self, data: dict) -> Document:
+        """Create a LangChain Document from one FDA drug record"""
+        # Create document content from drug data
+        content = self._create_document_content(data)
+        
+        # Create metadata
+        metadata = {
+            "doc_type": "fda_drug",
+            "application_no": data.get("application_no", ""),
+            "product_no": data.get("product_no", ""),
+            "drug_name": data.get("drug_name", ""),
+            "form": data.get("form", ""),
+            "marketing_status": data.get("marketing_status", ""),
+            "sponsor_name": data.get("sponsor_name", ""),
+            "source": "FDA"
+        }
+        
+        return Document(page_content=content, metadata=metadata)
+    
     def _create_document_content(self, data: dict) -> str:
         """Create searchable content from drug data"""
         content_parts = []
@@ -134,37 +319,273 @@ class DrugVectorStore:
         if data.get("sponsor_name"):
             content_parts.append(f"Sponsor: {data['sponsor_name']}")
         
-        # Add description if available
-        if data.get("description"):
+        # Add description if available; it only restates name, ingredient, form and strength
+        if data.get("description") and not self.record_mode:
             content_parts.append(f"Description: {data['description']}")
         
         return "\n".join(content_parts)
     
-    def create_vectorstore(self, documents: List[Document]) -> None:
-        """Create vector store from documents"""
+    @staticmethod
+    def document_key(metadata: dict) -> Tuple[str, str]:
+        """Products are identified by (application_no, product_no)"""
+        return metadata.get("application_no", ""), metadata.get("product_no", "")
+    
+    @staticmethod
+    def product_nos(metadata: dict) -> List[str]:
+        """Products a chunk stands for: all of a collapsed duplicate group, else just its own"""
+        if metadata.get("product_nos"):
+            return metadata["product_nos"].split(",")
+        return [metadata.get("product_no", "")]
+    
+    def collapse_duplicate_records(self, documents: List[Document]) -> List[Document]:
+        """Keep one document per (application_no, text): products differing only by product number.
+        
+        The first product keeps the document, and with it the chunk IDs;
+        metadata "product_nos" lists every product it stands for,
+        comma-separated, since Chroma metadata values must be scalars.
+        """
+        groups = {}
+        for doc in documents:
+            groups.setdefault((doc.metadata.get("application_no", ""), doc.page_content), []).append(doc)
+        
+        collapsed = []
+        for docs in groups.values():
+            first = docs[0]
+            product_nos = list(dict.fromkeys(doc.metadata.get("product_no", "") for doc in docs))
+            if len(product_nos) > 1:
+                first = Document(page_content=first.page_content,
+                                 metadata={**first.metadata, "product_nos": ",".join(product_nos)})
+            collapsed.append(first)
+        
+        self.dedup_stats = {
+            "records": len(documents),
+            "unique_records": len(collapsed),
+            "dedup_ratio": len(documents) / len(collapsed) if collapsed else 1.0,
+        }
+        print(f"🧬 Collapsed duplicate records: {len(documents):,} → {len(collapsed):,} "
+              f"(dedup ratio {self.dedup_stats['dedup_ratio']:.3f}, "
+              f"{len(documents) - len(collapsed):,} fewer to embed and store)")
+        return collapsed
+    
+    def _collapsed_deletes(self, keys: set, records: List[Tuple[str, dict]]) -> Tuple[List[int], list]:
+        """Which (chunk_id, metadata) records deleting the products `keys` removes, and which of
+        those come back for the rest of their duplicate group: (removed, [(index, new_id, new_metadata)]).
+        
+        A collapsed chunk keeps its text and vector for its remaining products;
+        if its first product is deleted it moves to a free ID under the next one.
+        """
+        removed = []
+        readded = []
+        used_ids = {chunk_id for chunk_id, _ in records}
+        for i, (chunk_id, metadata) in enumerate(records):
+            application_no = metadata.get("application_no", "")
+            products = self.product_nos(metadata)
+            remaining = [product_no for product_no in products if (application_no, product_no) not in keys]
+            if len(remaining) == len(products):
+                continue
+            removed.append(i)
+            if not remaining:
+                continue
+            new_metadata = {key: value for key, value in metadata.items() if key != "product_nos"}
+            new_metadata["product_no"] = remaining[0]
+            if len(remaining) > 1:
+                new_metadata["product_nos"] = ",".join(remaining)
+            new_id = chunk_id
+            if remaining[0] != metadata.get("product_no"):
+                ordinal = 0
+                while f"{application_no}:{remaining[0]}:{ordinal}" in used_ids:
+                    ordinal += 1
+                new_id = f"{application_no}:{remaining[0]}:{ordinal}"
+                used_ids.add(new_id)
+            readded.append((i, new_id, new_metadata))
+        return removed, readded
+    
+    def split_with_ids(self, documents: List[Document]) -> Tuple[List[Document], List[str]]:
+        """Split documents into chunks with stable IDs "application_no:product_no:ordinal".
+        
+        The ordinal counts chunks per product, so products with several
+        TE-code records still get unique IDs. In record mode, documents that
+        fit in one chunk are used as they are instead of going through the splitter.
+        """
+        if self.record_mode:
+            chunks = []
+            for doc in documents:
+                if len(doc.page_content) <= self.chunk_size:
+                    chunks.append(doc)
+                else:
+                    chunks.extend(self.text_splitter.split_documents([doc]))
+        else:
+            chunks = self.text_splitter.split_documents(documents)
+        ordinals = {}
+        ids = []
+        for chunk in chunks:
+            key = self.document_key(chunk.metadata)
+            ordinal = ordinals.get(key, 0)
+            ordinals[key] = ordinal + 1
+            ids.append(f"{key[0]}:{key[1]}:{ordinal}")
+        return chunks, ids
+    
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.db_name, CHECKPOINT_FILENAME)
+    
+    def read_checkpoint(self) -> Optional[dict]:
+        """The build checkpoint in the database directory, if a build has started there"""
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def _write_checkpoint(self, checkpoint: dict) -> None:
+        # Written to a temp file and renamed, so a crash never leaves a torn checkpoint
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+    
+    @staticmethod
+    def _records_snapshot(records: List[dict]) -> str:
+        from ingest.incremental import hash_documents, snapshot_id
+        return snapshot_id(hash_documents(records))
+    
+    def read_snapshot(self) -> Optional[str]:
+        """The ingest snapshot recorded with the index in the database directory, if any"""
+        try:
+            with open(os.path.join(self.db_name, SNAPSHOT_FILENAME), "r", encoding="utf-8") as f:
+                return json.load(f).get("snapshot")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def _save_snapshot(self) -> None:
+        if self.snapshot is None:
+            return
+        path = os.path.join(self.db_name, SNAPSHOT_FILENAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"snapshot": self.snapshot}, f)
+        os.replace(path + ".tmp", path)
+    
+    @staticmethod
+    def _chunks_hash(chunks: List[Document], ids: List[str]) -> str:
+        digest = hashlib.sha256()
+        for chunk_id, chunk in zip(ids, chunks):
+            digest.update(f"{chunk_id}\0{chunk.page_content}\0".encode("utf-8"))
+        return digest.hexdigest()
+    
+    def report_token_savings(self, chunks: List[Document], records: List[dict],
+                             duplicates: Sequence[Document] = ()) -> dict:
+        """Tokens embedded for `chunks` and tokens saved by leaving the Description line out of
+        the `records` those same chunks come from (record mode's compact text).
+        
+        Records of products collapsed into another one's chunk are not part of
+        either count; the tokens not embedded for those `duplicates` are
+        reported on their own.
+        """
+        embedded, method = count_tokens([chunk.page_content for chunk in chunks])
+        keys = {self.document_key(chunk.metadata) for chunk in chunks}
+        # Each omitted line also took a newline separator
+        saved, _ = count_tokens([f"\nDescription: {data['description']}" for data in records
+                                 if data.get("description") and self.document_key(data) in keys])
+        deduplicated, _ = count_tokens([doc.page_content for doc in duplicates])
+        stats = {
+            "tokens_embedded": embedded,
+            "tokens_saved": saved,
+            "saved_pct": 100.0 * saved / (embedded + saved) if embedded + saved else 0.0,
+            "tokens_deduplicated": deduplicated,
+            "method": method,
+        }
+        print(f"🪙 Record mode: {embedded:,} tokens embedded, {saved:,} saved "
+              f"({stats['saved_pct']:.1f}%, counted with {method})")
+        if duplicates:
+            print(f"🪙 Duplicate collapsing: {deduplicated:,} more tokens not embedded "
+                  f"for {len(duplicates):,} duplicate records")
+        return stats
+    
+    def create_vectorstore(self,
+                           documents: List[Document],
+                           resume: bool = False,
+                           input_path: Optional[str] = None,
+                           commit_batch_size: int = 2000,
+                           records: Optional[List[dict]] = None) -> None:
+        """Create vector store from documents, committing `commit_batch_size` chunks at a time.
+        
+        After every commit a checkpoint with the last committed chunk ID and
+        the input hash (of `input_path`, or of the chunks themselves) is
+        written to the database directory. With `resume=True` a build whose
+        checkpoint matches the input continues after that chunk.
+        In record mode, passing the source `records` of `documents` reports
+        the tokens saved by the compact text.
+        """
+        duplicates = []
+        if self.collapse_duplicates:
+            collapsed = self.collapse_duplicate_records(documents)
+            kept = {self.document_key(doc.metadata) for doc in collapsed}
+            duplicates = [doc for doc in documents if self.document_key(doc.metadata) not in kept]
+            documents = collapsed
         print(f"Splitting {len(documents)} documents into chunks...")
-        chunks = self.text_splitter.split_documents(documents)
+        chunks, ids = self.split_with_ids(documents)
         print(f"Created {len(chunks)} chunks")
+        if self.record_mode and records is not None:
+            self.report_token_savings(chunks, records, duplicates)
+        self.snapshot = self._records_snapshot(records) if records is not None else None
         
-        # Delete existing database if it exists
-        if os.path.exists(self.db_name):
-            print(f"Deleting existing vector store: {self.db_name}")
-            try:
-                existing_store = Chroma(persist_directory=self.db_name, embedding_function=self.embeddings)
-                existing_store.delete_collection()
-            except Exception as e:
-                print(f"Error deleting existing collection: {e}")
+        if self.backend == "flat":
+            self._begin_generation(new_generation(self.db_root))
+            self._fit_projection(chunks)
+            self._create_flat_index(chunks, ids, commit_batch_size)
+            self._publish_generation()
+            return
+        
+        input_hash = file_sha256(input_path) if input_path else self._chunks_hash(chunks, ids)
+        start = 0
+        checkpoint = None
+        if resume and pending_generation(self.db_root):
+            self._begin_generation(pending_generation(self.db_root))
+            checkpoint = self.read_checkpoint()
+        if (checkpoint and checkpoint.get("input_hash") == input_hash
+                and checkpoint.get("record_mode", False) == self.record_mode
+                and checkpoint.get("collapse_duplicates", False) == self.collapse_duplicates
+                and checkpoint.get("last_committed_id") in ids):
+            start = ids.index(checkpoint["last_committed_id"]) + 1
+            print(f"⏯️  Resuming build after chunk {checkpoint['last_committed_id']} ({start:,}/{len(chunks):,} committed)")
+            self._open_vectorstore()
+            self._load_projection()
+            self.index_stats = IndexStats.from_metadatas(chunk.metadata for chunk in chunks[:start])
+        else:
+            if resume:
+                print("⚠️  No checkpoint matching this input, starting a fresh build")
+            
+            # The live index stays untouched; the new one is built beside it
+            self._begin_generation(new_generation(self.db_root))
+            self._open_vectorstore()
+            self._fit_projection(chunks)
+            self.index_stats = IndexStats()
         
         # Create new vectorstore
         print("Creating vector store...")
-        self.vectorstore = Chroma.from_documents(
-            documents=chunks, 
-            embedding=self.embeddings, 
-            persist_directory=self.db_name
-        )
+        for batch_start in range(start, len(chunks), commit_batch_size):
+            batch_stop = min(batch_start + commit_batch_size, len(chunks))
+            self.vectorstore.add_documents(chunks[batch_start:batch_stop], ids=ids[batch_start:batch_stop])
+            self.index_stats.add(chunk.metadata for chunk in chunks[batch_start:batch_stop])
+            self.index_stats.save(self.db_name)
+            self._write_checkpoint({
+                "input_hash": input_hash,
+                "record_mode": self.record_mode,
+                "collapse_duplicates": self.collapse_duplicates,
+                "last_committed_id": ids[batch_stop - 1],
+                "committed_chunks": batch_stop,
+                "total_chunks": len(chunks),
+            })
+            print(f"  💾 Committed {batch_stop:,}/{len(chunks):,} chunks")
         
         count = self.vectorstore._collection.count()
         print(f"✅ Vector store created with {count:,} documents")
+        self._save_bm25(chunks, ids)
+        self._publish_generation()
+        
+        if self.cached_embeddings is not None:
+            cache_stats = self.cached_embeddings.get_stats()
+            print(f"💾 Embedding cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} newly embedded")
         
         # Get sample embedding info
         try:
@@ -174,13 +595,312 @@ class DrugVectorStore:
         except Exception as e:
             print(f"Could not get embedding dimensions: {e}")
     
+    def _begin_generation(self, directory: str) -> None:
+        """Point this store at an unpublished generation directory, with nothing loaded yet"""
+        self.db_name = directory
+        self.loaded_updates = 0
+        self.vectorstore = None
+        self.ann_index = None
+        self.index_stats = None
+        self._filter_values = None
+        print(f"🗂️  Building generation {directory}")
+    
+    def _publish_generation(self) -> None:
+        """Make the finished build the live index and drop generations nobody should still be reading"""
+        self._save_snapshot()
+        publish_generation(self.db_root, self.db_name)
+        print(f"🔀 Published {self.db_name}")
+        removed = collect_garbage(self.db_root, self.keep_generations)
+        if removed:
+            print(f"🧹 Removed {len(removed)} old generation(s): {', '.join(removed)}")
+    
+    def _is_stale(self) -> bool:
+        directory = active_directory(self.db_root)
+        return directory != self.db_name or update_count(directory) != self.loaded_updates
+    
+    def refresh_if_stale(self) -> bool:
+        """Reload if a newer generation was published, or the live one was updated in place
+        (Chroma upserts/deletes), since this store was loaded.
+        
+        Costs reads of the small CURRENT and UPDATES files, so servers can
+        call it before every request; returns True when the index was reloaded.
+        """
+        if not self._is_stale():
+            return False
+        with self._refresh_lock:
+            if not self._is_stale():
+                return False  # another request already reloaded
+            directory = active_directory(self.db_root)
+            if directory != self.db_name:
+                print(f"🔄 New index generation published: {directory}")
+            else:
+                print(f"🔄 Index updated in place: {directory}")
+            self.load_vectorstore()
+            return True
+    
+    def _fit_projection(self, chunks: List[Document]) -> None:
+        """Fit the dimension-reduction projector on a sample of chunks and save it with the index.
+        
+        The sample is embedded at full size through the cache, so the build
+        that follows gets those vectors as cache hits.
+        """
+        if not self.reduce_dimensions or not chunks:
+            return
+        projector = self.embeddings.projector
+        if projector.kind == "pca":
+            sample_size = min(len(chunks), self.reduce_dimensions.get("fit_sample", 20000))
+            step = max(1, len(chunks) // sample_size)
+            sample = [chunk.page_content for chunk in chunks[::step][:sample_size]]
+            print(f"📐 Fitting PCA to {projector.dimensions} dimensions on {len(sample):,} chunks...")
+            projector.fit(self.embeddings.embeddings.embed_documents(sample))
+            print(f"  Explained variance: {projector.explained_variance:.1%}")
+        projector.save(self.db_name)
+    
+    def _load_projection(self) -> None:
+        """Use the projector saved with an existing index, so queries are projected like its vectors"""
+        if not self.reduce_dimensions:
+            return
+        projector = Projector.load(self.db_name)
+        if projector is None:
+            raise ValueError(f"No saved projection in {self.db_name}; rebuild the index with reduce_dimensions")
+        self.embeddings.projector = projector
+    
+    def _embed_chunks(self, chunks: List[Document], batch_size: int) -> List[List[float]]:
+        vectors = []
+        for batch_start in range(0, len(chunks), batch_size):
+            batch = chunks[batch_start:batch_start + batch_size]
+            vectors.extend(self.embeddings.embed_documents([chunk.page_content for chunk in batch]))
+            print(f"  🧠 Embedded {batch_start + len(batch):,}/{len(chunks):,} chunks")
+        return vectors
+    
+    def _create_flat_index(self, chunks: List[Document], ids: List[str], batch_size: int) -> None:
+        """Build the flat backend: one memory-mapped matrix plus a metadata table.
+        
+        The matrix is written once at the end; an interrupted build is resumed
+        cheaply by rerunning it, since finished batches come from the embedding cache.
+        """
+        print(f"Creating flat {self.flat_dtype} index...")
+        vectors = self._embed_chunks(chunks, batch_size)
+        self.vectorstore = FlatVectorIndex.build(
+            self.db_name, vectors, ids,
+            [chunk.page_content for chunk in chunks],
+            [chunk.metadata for chunk in chunks],
+            dtype=self.flat_dtype
+        )
+        self.index_stats = IndexStats.from_metadatas(chunk.metadata for chunk in chunks)
+        self.index_stats.save(self.db_name)
+        self._save_bm25(chunks, ids, flat_version(self.vectorstore))
+        print(f"✅ Flat index created with {len(self.vectorstore):,} documents")
+        self._attach_ann_index()
+        
+        if self.cached_embeddings is not None:
+            cache_stats = self.cached_embeddings.get_stats()
+            print(f"💾 Embedding cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} newly embedded")
+        print(f"📊 Vectors: {len(self.vectorstore):,} documents with {self.vectorstore.dimensions:,} dimensions each")
+    
+    def _chroma(self) -> Chroma:
+        """Chroma client for db_name, with the HNSW parameters of the ann config if given"""
+        collection_metadata = None
+        if self.ann:
+            # Chroma reads these when it creates the collection; existing collections keep theirs
+            collection_metadata = {
+                "hnsw:M": self.ann.get("M", 16),
+                "hnsw:construction_ef": self.ann.get("ef_construction", 100),
+                "hnsw:search_ef": self.ann.get("ef_search", 100),
+            }
+        return Chroma(persist_directory=self.db_name, embedding_function=self.embeddings,
+                      collection_metadata=collection_metadata)
+    
+    def _attach_ann_index(self) -> None:
+        """(Re)load the flat backend's ANN or quantized index after the flat index was opened or rewritten"""
+        self.ann_index = None
+        self.metadata_index = None
+        if self.backend != "flat" or not len(self.vectorstore):
+            return
+        if self.ann:
+            self.ann_index = build_ann_index(self.vectorstore, self.ann)
+            print(f"🧭 Using {self.ann['type'].upper()} index over {len(self.vectorstore):,} vectors")
+        elif self.quantization:
+            self.ann_index = build_quantized_index(self.vectorstore, self.quantization)
+            print(f"🗜️  Using {self.quantization['type']} codes ({self.ann_index.memory_bytes() / 1e6:.1f} MB resident), "
+                  f"re-ranking the top {self.ann_index.rerank}")
+    
+    def _open_vectorstore(self) -> Chroma:
+        """The loaded vector store, or an empty persistent one to write into"""
+        if self.vectorstore is None:
+            if self.backend == "flat":
+                self.vectorstore = (FlatVectorIndex(self.db_name) if FlatVectorIndex.exists(self.db_name)
+                                    else FlatVectorIndex.build(self.db_name, [], [], [], [], dtype=self.flat_dtype))
+            else:
+                self.vectorstore = self._chroma()
+        return self.vectorstore
+    
+    def delete_documents(self, keys: List[Tuple[str, str]]) -> None:
+        """Delete every chunk of the given (application_no, product_no) products.
+        
+        Chunks collapsed from several products are kept for the products not deleted.
+        """
+        if not keys:
+            return
+        keys = set(keys)
+        stats = self._stats()
+        if self.backend == "flat":
+            changes = self._flat_deletes(keys, stats)
+            if changes["remove_ids"]:
+                self._publish_flat_update(stats, changes)
+            return
+        collection = self._open_vectorstore()._collection
+        
+        # One read per application, covering all of its products and duplicate groups
+        for application_no in sorted({application_no for application_no, _ in keys}):
+            found = collection.get(where={"application_no": application_no},
+                                   include=["documents", "metadatas", "embeddings"])
+            removed, readded = self._collapsed_deletes(keys, list(zip(found["ids"], found["metadatas"])))
+            if not removed:
+                continue
+            collection.delete(ids=[found["ids"][i] for i in removed])
+            if readded:
+                # Re-added with their stored vectors, so nothing is embedded again
+                collection.add(ids=[new_id for _, new_id, _ in readded],
+                               embeddings=[found["embeddings"][i] for i, _, _ in readded],
+                               documents=[found["documents"][i] for i, _, _ in readded],
+                               metadatas=[new_metadata for _, _, new_metadata in readded])
+            stats.remove(found["metadatas"][i] for i in removed)
+            stats.add(new_metadata for _, _, new_metadata in readded)
+        stats.save(self.db_name)
+        self._filter_values = None
+        self._drop_bm25()
+        self.loaded_updates = record_update(self.db_name)
+    
+    def upsert_documents(self, documents: List[Document]) -> int:
+        """Replace the stored chunks of each product in `documents` and return the chunks written.
+        
+        Pass every document of a changed product: its old chunks are removed
+        first, so a record that now splits into fewer chunks leaves none behind.
+        """
+        if not documents:
+            return 0
+        keys = sorted({self.document_key(doc.metadata) for doc in documents})
+        if self.collapse_duplicates:
+            documents = self.collapse_duplicate_records(documents)
+        chunks, ids = self.split_with_ids(documents)
+        if self.backend == "flat":
+            # Old chunks out and new ones in with a single rewrite, published as one generation
+            stats = self._stats()
+            changes = self._flat_deletes(set(keys), stats)
+            changes["vectors"].extend(self._embed_chunks(chunks, len(chunks)))
+            changes["ids"].extend(ids)
+            changes["texts"].extend(chunk.page_content for chunk in chunks)
+            changes["metadatas"].extend(chunk.metadata for chunk in chunks)
+            stats.add(chunk.metadata for chunk in chunks)
+            self._publish_flat_update(stats, changes)
+            return len(chunks)
+        self.delete_documents(keys)
+        stats = self._stats()  # checked against the chunk count before the new chunks land
+        self._open_vectorstore().add_documents(chunks, ids=ids)
+        self._filter_values = None
+        self._drop_bm25()
+        stats.add(chunk.metadata for chunk in chunks)
+        stats.save(self.db_name)
+        self.loaded_updates = record_update(self.db_name)
+        return len(chunks)
+    
+    def _flat_deletes(self, keys: set, stats: IndexStats) -> dict:
+        """FlatVectorIndex.update arguments that delete the products in `keys`, re-adding the
+        collapsed chunks other products still share; `stats` is adjusted to match"""
+        index = self._open_vectorstore()
+        records = list(zip(index.ids, index.metadata["metadatas"]))
+        removed, readded = self._collapsed_deletes(keys, records)
+        rows = [i for i, _, _ in readded]
+        stats.remove(records[i][1] for i in removed)
+        stats.add(new_metadata for _, _, new_metadata in readded)
+        return {
+            "remove_ids": [records[i][0] for i in removed],
+            "vectors": list(index.vectors[rows]) if rows else [],
+            "ids": [new_id for _, new_id, _ in readded],
+            "texts": [index.metadata["texts"][i] for i in rows],
+            "metadatas": [new_metadata for _, _, new_metadata in readded],
+        }
+    
+    def _publish_flat_update(self, stats: IndexStats, changes: dict) -> None:
+        """Write the flat index with `changes` applied (see FlatVectorIndex.update) as a new generation
+        and publish it.
+        
+        Rewriting in place takes one rename for the vectors and another for
+        the metadata, so a reader could pair old vectors with new metadata;
+        publishing a generation swaps both, and their sidecars, with the one
+        CURRENT rename that refresh_if_stale watches.
+        """
+        index = self._open_vectorstore()
+        self._begin_generation(new_generation(self.db_root))
+        if self.reduce_dimensions:
+            self.embeddings.projector.save(self.db_name)
+        self.vectorstore = index.update(directory=self.db_name, **{**changes, "vectors": changes["vectors"] or None})
+        self._attach_ann_index()
+        self.index_stats = stats
+        stats.save(self.db_name)
+        self._publish_generation()
+    
+    def apply_delta(self, delta_path: str) -> dict:
+        """Apply an ingest delta file (drug_ingest.py --incremental) to the vector store.
+        
+        The delta must have been computed against the ingest snapshot the
+        index reflects; otherwise StaleDeltaError is raised and the index is
+        left untouched (rebuild it from the current JSONL instead). A delta
+        that was already applied is skipped.
+        """
+        from ingest.incremental import read_delta, read_delta_snapshots
+        
+        counts = {"added": 0, "changed": 0, "deleted": 0}
+        base, target = read_delta_snapshots(delta_path)
+        if target is not None and target == self.snapshot:
+            print(f"Delta already applied: the index reflects snapshot {target}")
+            return {**counts, "chunks_written": 0}
+        if base is None or base != self.snapshot:
+            raise StaleDeltaError(f"{delta_path} was computed against snapshot {base}, but the index reflects "
+                                  f"{self.snapshot}; rebuild the index from the current JSONL")
+        
+        upserts = []
+        deletes = []
+        for entry in read_delta(delta_path):
+            counts[entry["op"]] += 1
+            if entry["op"] == "deleted":
+                deletes.append((entry["application_no"], entry["product_no"]))
+            else:
+                upserts.extend(self._record_to_document(data) for data in entry["documents"])
+        
+        print(f"Applying delta: {counts['added']} added, {counts['changed']} changed, {counts['deleted']} deleted")
+        self.delete_documents(deletes)
+        counts["chunks_written"] = self.upsert_documents(upserts)
+        self.snapshot = target
+        self._save_snapshot()
+        print(f"✅ Delta applied, {counts['chunks_written']:,} chunks written (snapshot {base} -> {target})")
+        return counts
+    
     def load_vectorstore(self) -> Optional[Chroma]:
-        """Load existing vector store"""
+        """Load existing vector store (the published generation of db_root, if it is versioned)"""
+        self.db_name = active_directory(self.db_root)
+        self.loaded_updates = update_count(self.db_name)
+        self.snapshot = self.read_snapshot()
+        self.ann_index = None
+        self.index_stats = None
+        self._filter_values = None
+        if self.backend == "flat":
+            if not FlatVectorIndex.exists(self.db_name):
+                print(f"No existing flat index found at {self.db_name}")
+                return None
+            print(f"Loading existing flat index from {self.db_name}")
+            self.vectorstore = FlatVectorIndex(self.db_name)
+            print(f"Loaded flat index with {len(self.vectorstore):,} documents")
+            self._load_projection()
+            self._attach_ann_index()
+            return self.vectorstore
         if os.path.exists(self.db_name):
             print(f"Loading existing vector store from {self.db_name}")
-            self.vectorstore = Chroma(persist_directory=self.db_name, embedding_function=self.embeddings)
+            self.vectorstore = self._chroma()
             count = self.vectorstore._collection.count()
             print(f"Loaded vector store with {count:,} documents")
+            self._load_projection()
             return self.vectorstore
         else:
             print(f"No existing vector store found at {self.db_name}")
@@ -190,41 +910,221 @@ class DrugVectorStore:
         """Get the vector store instance"""
         return self.vectorstore
     
-    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
-        """Perform similarity search"""
-        if not self.vectorstore:
+    def _flat_metadata_index(self, store: FlatVectorIndex) -> MetadataIndex:
+        """The metadata index of flat index `store`, built and saved beside it when missing or stale"""
+        if self.metadata_index is None or self._metadata_index_store is not store:
+            version = flat_version(store)
+            metadata_index = MetadataIndex.load(store.directory, version)
+            if metadata_index is None:
+                metadata_index = MetadataIndex.build(store.metadata["metadatas"])
+                metadata_index.save(store.directory, version)
+            self.metadata_index, self._metadata_index_store = metadata_index, store
+        return self.metadata_index
+    
+    def _chroma_pages(self, include: List[str], where: Optional[dict] = None, page_size: int = 5000):
+        """The Chroma collection (or the chunks matching `where`) one get() page at a time
+        (one get() of everything hits SQLite's variable limit on large collections)"""
+        collection = self.vectorstore._collection
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(where=where, include=include, limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            yield page
+    
+    def _chroma_metadatas(self):
+        """Every chunk's metadata in the Chroma collection"""
+        for page in self._chroma_pages(["metadatas"]):
+            for metadata in page["metadatas"]:
+                yield metadata or {}
+    
+    def _save_bm25(self, chunks: List[Document], ids: List[str], version: str = "") -> None:
+        """Build the BM25 index over the same chunk texts as the vectors and save it beside them"""
+        bm25 = BM25Index.build(ids, [chunk.page_content for chunk in chunks],
+                               (chunk.metadata.get("drug_name") for chunk in chunks))
+        bm25.save(self.db_name, version)
+        print(f"🔤 BM25 index: {len(bm25.vocabulary):,} terms over {len(bm25):,} chunks")
+    
+    def _drop_bm25(self) -> None:
+        """Remove the Chroma backend's BM25 index after a write; it is rebuilt on the next lexical search.
+        (Flat BM25 indexes carry the flat index version and go stale by themselves.)"""
+        self.bm25_index = None
+        path = os.path.join(self.db_name, BM25_FILENAME)
+        if os.path.exists(path):
+            os.remove(path)
+    
+    def _bm25(self, store) -> BM25Index:
+        """The BM25 index of `store`, loaded from its sidecar or rebuilt from the stored chunk texts"""
+        if self.bm25_index is None or self._bm25_store is not store:
+            if self.backend == "flat":
+                directory, version = store.directory, flat_version(store)
+            else:
+                directory, version = self.db_name, ""
+            bm25 = BM25Index.load(directory, version)
+            if bm25 is None:
+                print("🔤 Building BM25 index...")
+                if self.backend == "flat":
+                    ids, texts, metadatas = store.ids, store.metadata["texts"], store.metadata["metadatas"]
+                else:
+                    ids, texts, metadatas = [], [], []
+                    for page in self._chroma_pages(["documents", "metadatas"]):
+                        ids.extend(page["ids"])
+                        texts.extend(page["documents"])
+                        metadatas.extend(metadata or {} for metadata in page["metadatas"])
+                bm25 = BM25Index.build(ids, texts, (metadata.get("drug_name") for metadata in metadatas))
+                bm25.save(directory, version)
+            self.bm25_index, self._bm25_store = bm25, store
+        return self.bm25_index
+    
+    def drug_names_in(self, text: str) -> List[str]:
+        """Drug names in the index that `text` mentions verbatim (case-insensitive, whole tokens)"""
+        if self.vectorstore is None:
             raise ValueError("Vector store not initialized. Call create_vectorstore() or load_vectorstore() first.")
+        return self._bm25(self.vectorstore).names_in(text)
+    
+    def lexical_search_batch(self, queries: List[str], k: int = 5,
+                             filter: Optional[dict] = None) -> List[List[Document]]:
+        """BM25 keyword search for each query, with no embedding call; `filter` as in similarity_search_batch"""
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized. Call create_vectorstore() or load_vectorstore() first.")
+        if filter:
+            validate_filter(filter)
+        store = self.vectorstore
+        bm25 = self._bm25(store)
+        if self.backend == "flat":
+            rows = self._flat_metadata_index(store).rows_matching(filter) if filter else None
+            return [[Document(page_content=text, metadata=metadata)
+                     for _, text, metadata in store.records(bm25.search(query, k=k, rows=rows)[0])]
+                    for query in queries]
+        
+        where = self._chroma_where(filter) if filter else None
+        if filter and where is None:
+            return [[] for _ in queries]
+        rows = None
+        if filter:
+            # Resolve the filter to BM25 positions first, so only matching chunks are scored
+            matching = [chunk_id for page in self._chroma_pages([], where=where) for chunk_id in page["ids"]]
+            rows = bm25.positions(matching)
+        results = []
+        for query in queries:
+            positions, _ = bm25.search(query, k=k, rows=rows)
+            ids = [bm25.ids[position] for position in positions]
+            if not ids:
+                results.append([])
+                continue
+            found = store._collection.get(ids=ids, include=["documents", "metadatas"])
+            by_id = {chunk_id: Document(page_content=text, metadata=metadata or {})
+                     for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])}
+            results.append([by_id[chunk_id] for chunk_id in ids if chunk_id in by_id][:k])
+        return results
+    
+    def _stats(self) -> IndexStats:
+        """The statistics sidecar, recounted from the stored metadata when missing or out of step.
         
+        Indexes built before the sidecar existed, or changed by another
+        writer, have a different chunk count than the sidecar records.
+        """
+        self._open_vectorstore()
+        count = len(self.vectorstore) if self.backend == "flat" else self.vectorstore._collection.count()
+        if self.index_stats is None:
+            self.index_stats = IndexStats.load(self.db_name)
+        if self.index_stats is None or self.index_stats.total != count:
+            print("📊 Recounting index statistics...")
+            metadatas = self.vectorstore.metadata["metadatas"] if self.backend == "flat" else self._chroma_metadatas()
+            self.index_stats = IndexStats.from_metadatas(metadatas)
+            self.index_stats.save(self.db_name)
+        return self.index_stats
+    
+    def _chroma_where(self, filter: dict) -> Optional[dict]:
+        """Chroma `where` clause for a filter; $contains and product numbers of collapsed chunks
+        are expanded to the matching stored values"""
+        if any((isinstance(condition, dict) and "$contains" in condition) or field in MULTI_VALUED_FIELDS
+               for field, condition in filter.items()):
+            if self._filter_values is None:
+                values = {field: set() for field in (*FILTER_FIELDS, *MULTI_VALUED_FIELDS.values())}
+                for metadata in self._chroma_metadatas():
+                    for field in FILTER_FIELDS:
+                        values[field].update(metadata_values(metadata, field))
+                    for group in MULTI_VALUED_FIELDS.values():
+                        if metadata.get(group):
+                            values[group].add(metadata[group])
+                self._filter_values = {field: sorted(found) for field, found in values.items()}
+            return to_chroma_where(filter, self._filter_values)
+        return to_chroma_where(filter, {})
+    
+    def similarity_search(self, query: str, k: int = 5, filter: Optional[dict] = None) -> List[Document]:
+        """Perform similarity search, optionally restricted by a metadata filter (see similarity_search_batch)"""
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized. Call create_vectorstore() or load_vectorstore() first.")
+        
+        if self.backend == "flat" or filter:
+            return self.similarity_search_batch([query], k=k, filter=filter)[0]
         return self.vectorstore.similarity_search(query, k=k)
     
+    def similarity_search_batch(self, queries: List[str], k: int = 5,
+                                filter: Optional[dict] = None) -> List[List[Document]]:
+        """Search several queries (e.g. all multi-query variants) in one batched index call.
+        
+        `filter` restricts candidates before vector scoring. It maps form,
+        marketing_status, sponsor_name, application_no, drug_name or product_no
+        (any product of a collapsed chunk) to a value, a list of values,
+        {"$in": [...]} or {"$contains": "text"} (case-insensitive); fields are ANDed,
+        e.g. {"form": {"$contains": "injectable"}, "sponsor_name": "PFIZER"}.
+        """
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized. Call create_vectorstore() or load_vectorstore() first.")
+        if not queries:
+            return []
+        if filter:
+            validate_filter(filter)
+        
+        # Bound once, so a concurrent refresh_if_stale cannot mix two generations in one search
+        store, ann_index = self.vectorstore, self.ann_index
+        vectors = [self.embeddings.embed_query(query) for query in queries]
+        if self.backend == "flat":
+            if filter:
+                # Exact search over just the matching rows; the ANN index covers the whole corpus
+                rows = self._flat_metadata_index(store).rows_matching(filter)
+                indices, _ = store.search(vectors, k=k, rows=rows)
+            else:
+                if ann_index is not None and ann_index.flat is not store:
+                    ann_index = None  # store was swapped between the two reads above
+                indices, _ = (ann_index or store).search(vectors, k=k)
+            return [[Document(page_content=text, metadata=metadata)
+                     for _, text, metadata in store.records(row[row >= 0])]
+                    for row in indices]
+        
+        where = self._chroma_where(filter) if filter else None
+        if filter and where is None:
+            return [[] for _ in queries]
+        result = store._collection.query(query_embeddings=vectors, n_results=k, where=where,
+                                                    include=["documents", "metadatas"])
+        return [[Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+                for texts, metadatas in zip(result["documents"], result["metadatas"])]
+    
+    def as_retriever(self, **kwargs) -> BaseRetriever:
+        """LangChain retriever for the active backend"""
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized. Call create_vectorstore() or load_vectorstore() first.")
+        if self.backend == "flat":
+            return DrugVectorStoreRetriever(vector_store=self, **kwargs.get("search_kwargs", {}))
+        return self.vectorstore.as_retriever(**kwargs)
+    
     def get_stats(self) -> dict:
-        """Get vector store statistics"""
-        if not self.vectorstore:
+        """Get vector store statistics from the index statistics sidecar.
+        
+        unique_drugs and unique_sponsors are HyperLogLog estimates (within
+        about 1%); products deleted since the last recount are still counted.
+        """
+        if self.vectorstore is None:
             return {"error": "Vector store not initialized"}
         
         try:
-            collection = self.vectorstore._collection
-            count = collection.count()
-            
-            # Get unique document types
-            result = collection.get(include=['metadatas'])
-            doc_types = set()
-            drug_names = set()
-            sponsors = set()
-            
-            for metadata in result['metadatas']:
-                if metadata.get('doc_type'):
-                    doc_types.add(metadata['doc_type'])
-                if metadata.get('drug_name'):
-                    drug_names.add(metadata['drug_name'])
-                if metadata.get('sponsor_name'):
-                    sponsors.add(metadata['sponsor_name'])
-            
+            stats = self._stats()
             return {
-                "total_documents": count,
-                "document_types": list(doc_types),
-                "unique_drugs": len(drug_names),
-                "unique_sponsors": len(sponsors),
+                "total_documents": stats.total,
+                "document_types": stats.values("doc_type"),
+                "unique_drugs": stats.distinct("drug_name"),
+                "unique_sponsors": stats.distinct("sponsor_name"),
                 "database_path": self.db_name
             }
         except Exception as e:
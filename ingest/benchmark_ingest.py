@@ -0,0 +1,159 @@
+import os
+import time
+import argparse
+import pandas as pd
+from fda_ingest import load_txt_files, parse_txt_file, DATA_DIR
+from schema_sniff import load_schema_manifest, infer_dtypes
+from drug_ingest import merge_tables, build_document_frame, iter_document_records
+
+
+def legacy_build_documents(merged):
+    """Original row-by-row builder, kept as the benchmark baseline"""
+    docs = []
+    for _, row in merged.iterrows():
+        drug_name = str(row.get("DrugName", "") or "")
+        form = str(row.get("Form", "") or "")
+        strength = str(row.get("Strength", "") or "")
+        active_ingredient = str(row.get("ActiveIngredient", "") or "")
+
+        doc = {
+            "drug_name": drug_name,
+            "application_no": str(row.get("ApplNo", "")),
+            "product_no": str(row.get("ProductNo", "")),
+            "form": form,
+            "strength": strength,
+            "active_ingredient": active_ingredient,
+            "marketing_status": str(row.get("MarketingStatusDescription", "") or ""),
+            "submission_type": str(row.get("SubmissionType", "") or ""),
+            "submission_status": str(row.get("SubmissionStatus", "") or ""),
+            "te_code": str(row.get("TECode", "") or ""),
+            "sponsor_name": str(row.get("SponsorName", "") or ""),
+            "application_type": str(row.get("ApplType", "") or ""),
+            "description": f"{drug_name} ({active_ingredient}) is a {form} formulation with strength {strength}." if drug_name else ""
+        }
+        docs.append(doc)
+    return docs
+
+
+def vectorized_build_documents(merged):
+    """Column-wise builder materialized into the same list of dicts"""
+    return list(iter_document_records(build_document_frame(merged)))
+
+
+def load_benchmark_tables(tables=None, encode=True):
+    """Load data/raw, deriving a Products table from MarketingStatus keys if it is not bundled.
+
+    The derived table gets the dtypes sniffing would give a real Products.txt
+    (encode=False keeps plain strings, for the all-str baseline).
+    """
+    tables = load_txt_files() if tables is None else tables
+    if "Products" not in tables and "MarketingStatus" in tables:
+        print("⚠️  Products.txt not found, deriving product keys from MarketingStatus.txt")
+        keys = tables["MarketingStatus"][["ApplNo", "ProductNo"]].drop_duplicates()
+        products = keys.assign(
+            Form="TABLET;ORAL",
+            Strength="10MG",
+            DrugName="DRUG " + keys["ApplNo"],
+            ActiveIngredient="INGREDIENT " + keys["ProductNo"],
+        )
+        if encode:
+            sample = products.head(100).astype(str).values.tolist()
+            dtypes = infer_dtypes(list(products.columns), sample)
+            products = products.astype({column: dtype for column, dtype in dtypes.items() if dtype == "category"})
+        tables["Products"] = products
+    return tables
+
+
+def blow_up(merged, factor):
+    """Replicate the merged table `factor` times with distinct application numbers"""
+    copies = []
+    for i in range(factor):
+        copy = merged.copy()
+        copy["ApplNo"] = copy["ApplNo"].astype(str) + f"-{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def time_builder(builder, merged, repeats):
+    """Best-of-N wall time for a builder, in seconds"""
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = builder(merged)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark(merged, label, repeats):
+    rows = len(merged)
+    legacy_time, legacy_docs = time_builder(legacy_build_documents, merged, repeats)
+    vector_time, vector_docs = time_builder(vectorized_build_documents, merged, repeats)
+
+    if legacy_docs != vector_docs:
+        raise AssertionError(f"{label}: vectorized documents differ from the row-wise builder")
+
+    print(f"\n📊 {label}: {rows:,} rows")
+    print(f"  iterrows:   {legacy_time:8.3f}s  {rows / legacy_time:12,.0f} rows/sec")
+    print(f"  vectorized: {vector_time:8.3f}s  {rows / vector_time:12,.0f} rows/sec")
+    print(f"  speedup:    {legacy_time / vector_time:8.1f}x  (outputs identical)")
+
+
+def load_string_tables():
+    """Parse data/raw with every column as a plain string, as before dictionary encoding"""
+    tables = {}
+    for name, schema in load_schema_manifest(DATA_DIR).items():
+        plain = dict(schema, dtypes={column: "str" for column in schema["dtypes"]})
+        tables[name] = parse_txt_file(os.path.join(DATA_DIR, f"{name}.txt"), plain)
+    return tables
+
+
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def benchmark_memory():
+    """Compare deep memory of the tables and the merged frame: plain strings vs categoricals"""
+    string_tables = load_benchmark_tables(load_string_tables(), encode=False)
+    encoded_tables = load_benchmark_tables(load_txt_files(use_cache=False))
+
+    print(f"\n📊 Memory (deep), plain str vs dictionary-encoded:")
+    for name in sorted(encoded_tables):
+        before, after = frame_mb(string_tables[name]), frame_mb(encoded_tables[name])
+        print(f"  {name:<28} {before:8.2f} MB -> {after:8.2f} MB  ({before / max(after, 1e-9):4.1f}x)")
+
+    start = time.perf_counter()
+    string_merged = merge_tables(string_tables)
+    string_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    encoded_merged = merge_tables(encoded_tables)
+    encoded_seconds = time.perf_counter() - start
+
+    before, after = frame_mb(string_merged), frame_mb(encoded_merged)
+    print(f"  {'merged':<28} {before:8.2f} MB -> {after:8.2f} MB  ({before / after:4.1f}x)")
+    print(f"  merge time: {string_seconds:.3f}s -> {encoded_seconds:.3f}s")
+
+    if vectorized_build_documents(string_merged) != vectorized_build_documents(encoded_merged):
+        raise AssertionError("Dictionary-encoded tables produce different documents")
+    print("  documents identical")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FDA document construction")
+    parser.add_argument("--factor", type=int, default=10, help="Synthetic blow-up factor")
+    parser.add_argument("--repeats", type=int, default=1, help="Best-of-N timing repeats")
+    parser.add_argument("--memory", action="store_true", help="Benchmark memory of str vs categorical columns")
+    args = parser.parse_args()
+
+    if args.memory:
+        benchmark_memory()
+        return
+
+    merged = merge_tables(load_benchmark_tables())
+    benchmark(merged, "data/raw", args.repeats)
+    benchmark(blow_up(merged, args.factor), f"data/raw x{args.factor}", args.repeats)
+
+
+if __name__ == "__main__":
+    main()
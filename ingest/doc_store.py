@@ -0,0 +1,133 @@
+import os
+import json
+import zlib
+import struct
+
+MAGIC = b"FDADOCS1"
+HEADER = struct.Struct("<8sB")    # magic, flags
+FRAME = struct.Struct("<I")       # payload length prefix
+FLAG_COMPRESSED = 1
+INDEX_SUFFIX = ".idx.json"
+
+
+def _index_key(application_no, product_no):
+    return f"{application_no}|{product_no}"
+
+
+def serialize(doc, compress=False):
+    """Compact JSON encoding of one document, optionally zlib-compressed"""
+    payload = json.dumps(doc, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return zlib.compress(payload, 6) if compress else payload
+
+
+def deserialize(payload, compressed=False):
+    return json.loads(zlib.decompress(payload) if compressed else payload)
+
+
+def index_path(store_path):
+    return store_path + INDEX_SUFFIX
+
+
+def write_store(records, path, compress=False):
+    """Write documents as length-prefixed frames plus a sidecar offset index.
+
+    The index maps "application_no|product_no" to a list of
+    [offset, length] frames, and also keeps every frame boundary in file
+    order so readers can split the file into byte ranges.
+    """
+    keys = {}
+    frames = []
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FLAG_COMPRESSED if compress else 0))
+        for doc in records:
+            payload = serialize(doc, compress)
+            offset = f.tell()
+            f.write(FRAME.pack(len(payload)))
+            f.write(payload)
+            frame = [offset, FRAME.size + len(payload)]
+            frames.append(frame)
+            key = _index_key(doc.get("application_no", ""), doc.get("product_no", ""))
+            keys.setdefault(key, []).append(frame)
+    os.replace(tmp_path, path)
+
+    tmp_index = index_path(path) + ".tmp"
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump({"compressed": compress, "frames": frames, "keys": keys}, f, separators=(",", ":"))
+    os.replace(tmp_index, index_path(path))
+    return len(frames)
+
+
+class DocumentStore:
+    """Random-access reader for a store written by write_store"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.compressed = index["compressed"]
+        self.frames = index["frames"]
+        self.keys = index["keys"]
+        with open(path, "rb") as f:
+            magic, flags = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a document store")
+        self._file = open(path, "rb")
+
+    def __len__(self):
+        return len(self.frames)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_frame(self, f, offset, length):
+        f.seek(offset + FRAME.size)
+        return deserialize(f.read(length - FRAME.size), self.compressed)
+
+    def get(self, application_no, product_no):
+        """One product's document by key (the first if the product has several TE codes)"""
+        frames = self.keys.get(_index_key(application_no, product_no))
+        if not frames:
+            return None
+        return self._read_frame(self._file, *frames[0])
+
+    def get_all(self, application_no, product_no):
+        """Every document stored under a product key"""
+        return [self._read_frame(self._file, *frame)
+                for frame in self.keys.get(_index_key(application_no, product_no), [])]
+
+    def partitions(self, n):
+        """Split the file into n byte ranges aligned to frame boundaries"""
+        total = len(self.frames)
+        if total == 0:
+            return []
+        n = max(1, min(n, total))
+        bounds = [total * i // n for i in range(n + 1)]
+        end_of_file = self.frames[-1][0] + self.frames[-1][1]
+        ranges = []
+        for start, stop in zip(bounds, bounds[1:]):
+            start_offset = self.frames[start][0]
+            stop_offset = self.frames[stop][0] if stop < total else end_of_file
+            ranges.append((start_offset, stop_offset))
+        return ranges
+
+    def iter_range(self, start, stop):
+        """Yield documents whose frames lie in [start, stop); opens its own handle so ranges can be read in parallel"""
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            position = start
+            while position < stop:
+                (length,) = FRAME.unpack(f.read(FRAME.size))
+                yield deserialize(f.read(length), self.compressed)
+                position += FRAME.size + length
+
+    def __iter__(self):
+        if not self.frames:
+            return iter(())
+        return self.iter_range(*self.partitions(1)[0])
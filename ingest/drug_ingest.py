@@ -1,8 +1,18 @@
 import os
 import json
-from fda_ingest import load_txt_files
+import argparse
+import pandas as pd
+from fda_ingest import load_txt_files, iter_txt_chunks, DATA_DIR
+from join_planner import JoinPlanner
+from doc_store import write_store, index_path
+from ingest_report import IngestReport
+from incremental import (
+    group_documents, compute_delta, load_snapshot, save_snapshot, snapshot_id,
+    write_delta, summarize_delta, delta_path, snapshot_path,
+)
 
 OUTPUT_DIR = "data/processed"
+STORE_FILENAME = "fda_documents.docs"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 def debug_table_structure():
@@ -18,15 +28,64 @@ def debug_table_structure():
     
     return tables
 
-def create_documents():
-    tables = load_txt_files()
+# Output field -> source column in the merged Products/Applications/TE table
+DOCUMENT_FIELDS = {
+    "drug_name": "DrugName",
+    "application_no": "ApplNo",
+    "product_no": "ProductNo",
+    "form": "Form",
+    "strength": "Strength",
+    "active_ingredient": "ActiveIngredient",
+    "marketing_status": "MarketingStatusDescription",
+    "submission_type": "SubmissionType",
+    "submission_status": "SubmissionStatus",
+    "te_code": "TECode",
+    "sponsor_name": "SponsorName",
+    "application_type": "ApplType",
+}
+
+# Dimension tables held in memory by the streaming pipeline; Products and Submissions are streamed
+STREAM_DIMENSION_TABLES = ["Applications", "TE", "MarketingStatus_Lookup"]
+SUBMISSION_FIELDS = ['SubmissionType', 'SubmissionStatus', 'ReviewPriority']
+# TE has one row per therapeutic-equivalence code, so a few products legitimately fan out
+TE_MAX_GROWTH = 1.05
+
+def aggregate_latest_submissions(submissions):
+    """Latest submission fields per ApplNo (last non-null value by SubmissionStatusDate)"""
+    ordered = submissions.sort_values('SubmissionStatusDate', na_position='first', kind='stable')
+    return ordered.groupby('ApplNo').agg({field: 'last' for field in SUBMISSION_FIELDS}).reset_index()
+
+def plan_joins(tables, latest_submissions=None, strict=True, verbose=True):
+    """Key the dimension tables once and declare the expected cardinality of each join"""
+    planner = JoinPlanner(strict=strict, verbose=verbose)
+    planner.add("Applications", tables["Applications"], on="ApplNo")
+
+    # Add marketing status from TE table (more direct)
+    te = tables.get("TE")  # This table has MarketingStatusID linkage
+    if te is not None:
+        planner.add("TE", te, on=['ApplNo', 'ProductNo'], columns=['ApplNo', 'ProductNo', 'MarketingStatusID', 'TECode'],
+                    expect="one_to_many", max_growth=TE_MAX_GROWTH)
+
+        # Add marketing status descriptions
+        if tables.get("MarketingStatus_Lookup") is not None:
+            planner.add("MarketingStatus_Lookup", tables["MarketingStatus_Lookup"], on="MarketingStatusID")
+
+    # Latest submission info is aggregated per ApplNo to avoid explosion
+    if latest_submissions is not None:
+        planner.add("Submissions", latest_submissions, on="ApplNo")
+    return planner
+
+def merge_tables(tables, strict=True, report=None):
+    """Merge Products with Applications, TE, marketing status and latest submission.
 
+    Raises CardinalityError when a join fans out beyond its declared
+    cardinality (unless strict=False). Submission aggregation and each join
+    are recorded as stages when an IngestReport is given.
+    """
+    report = report or IngestReport()
     applications = tables.get("Applications")
     products = tables.get("Products")
     submissions = tables.get("Submissions")
-    marketing_status = tables.get("MarketingStatus")
-    marketing_status_lookup = tables.get("MarketingStatus_Lookup")
-    te = tables.get("TE")  # This table has MarketingStatusID linkage
 
     if applications is None or products is None:
         raise ValueError("Missing core tables")
@@ -34,74 +93,206 @@ def create_documents():
     print(f"\n=== EFFICIENT MERGING STRATEGY ===")
     print(f"Products: {products.shape}")
     print(f"Applications: {applications.shape}")
-    
-    # Start with Products (core table)
-    merged = products.copy()
-    print(f"Starting with Products: {merged.shape}")
-    
-    # Merge with Applications
-    merged = merged.merge(applications, on="ApplNo", how="left")
-    print(f"After Applications merge: {merged.shape}")
-    
-    # Add marketing status from TE table (more direct)
-    if te is not None:
-        print(f"TE table: {te.shape}")
-        merged = merged.merge(te[['ApplNo', 'ProductNo', 'MarketingStatusID', 'TECode']], 
-                            on=['ApplNo', 'ProductNo'], how="left")
-        print(f"After TE merge: {merged.shape}")
-        
-        # Add marketing status descriptions
-        if marketing_status_lookup is not None:
-            merged = merged.merge(marketing_status_lookup, on="MarketingStatusID", how="left")
-            print(f"After MarketingStatus_Lookup merge: {merged.shape}")
-    
-    # Get latest submission info (aggregate to avoid explosion)
+    if tables.get("TE") is not None:
+        print(f"TE table: {tables['TE'].shape}")
+
+    latest_submissions = None
     if submissions is not None:
         print(f"Aggregating submissions data...")
-        # Only aggregate the most recent submission per application
-        latest_submissions = submissions.sort_values('SubmissionStatusDate', na_position='first').groupby('ApplNo').agg({
-            'SubmissionType': 'last',
-            'SubmissionStatus': 'last', 
-            'ReviewPriority': 'last'
-        }).reset_index()
-        
-        merged = merged.merge(latest_submissions, on="ApplNo", how="left")
-        print(f"After aggregated submissions merge: {merged.shape}")
-
-    # Clean up column names and create documents
-    print(f"\n=== CREATING DOCUMENTS ===")
-    docs = []
-    for _, row in merged.iterrows():
-        # Handle missing values gracefully
-        drug_name = str(row.get("DrugName", "") or "")
-        form = str(row.get("Form", "") or "")
-        strength = str(row.get("Strength", "") or "")
-        active_ingredient = str(row.get("ActiveIngredient", "") or "")
-        
-        doc = {
-            "drug_name": drug_name,
-            "application_no": str(row.get("ApplNo", "")),
-            "product_no": str(row.get("ProductNo", "")),
-            "form": form,
-            "strength": strength,
-            "active_ingredient": active_ingredient,
-            "marketing_status": str(row.get("MarketingStatusDescription", "") or ""),
-            "submission_type": str(row.get("SubmissionType", "") or ""),
-            "submission_status": str(row.get("SubmissionStatus", "") or ""),
-            "te_code": str(row.get("TECode", "") or ""),
-            "sponsor_name": str(row.get("SponsorName", "") or ""),
-            "application_type": str(row.get("ApplType", "") or ""),
-            "description": f"{drug_name} ({active_ingredient}) is a {form} formulation with strength {strength}." if drug_name else ""
-        }
-        docs.append(doc)
-
-    # Save each doc as JSONL
-    with open(os.path.join(OUTPUT_DIR, "fda_documents.jsonl"), "w", encoding="utf-8") as f:
-        for doc in docs:
-            json.dump(doc, f)
-            f.write("\n")
-
-    print(f"✅ Saved {len(docs)} documents to {OUTPUT_DIR}/fda_documents.jsonl")
+        with report.stage("aggregate_submissions", rows=len(submissions)) as stage:
+            latest_submissions = aggregate_latest_submissions(submissions)
+            stage["rows_after"] = len(latest_submissions)
+
+    planner = plan_joins(tables, latest_submissions, strict=strict)
+    merged = planner.join(products)
+    planner.finish()
+    planner.print_report()
+    report.add_joins(planner.report)
+
+    return merged
+
+def _latest_submission_candidates(chunk):
+    """Rows of a Submissions chunk that can still win aggregate_latest_submissions"""
+    ordered = chunk.sort_values('SubmissionStatusDate', na_position='first', kind='stable')
+    keep = set(ordered.groupby('ApplNo').tail(1).index)
+    for field in SUBMISSION_FIELDS:
+        keep.update(ordered[ordered[field].notna()].groupby('ApplNo').tail(1).index)
+    return chunk.loc[sorted(keep)]
+
+def stream_latest_submissions(chunks):
+    """aggregate_latest_submissions over a chunked Submissions table, keeping only candidate rows"""
+    candidates = [_latest_submission_candidates(chunk) for chunk in chunks]
+    if not candidates:
+        return None
+    return aggregate_latest_submissions(pd.concat(candidates))
+
+def iter_streamed_documents(chunksize=10000, strict=True, report=None):
+    """Yield document dicts while streaming Products in chunks; memory stays bounded by the chunk size"""
+    report = report or IngestReport(mode="stream")
+    with report.stage("load_tables") as stage:
+        tables = load_txt_files(names=STREAM_DIMENSION_TABLES, timings=report.tables)
+        stage["rows"] = sum(len(df) for df in tables.values())
+    if tables.get("Applications") is None or not os.path.exists(os.path.join(DATA_DIR, "Products.txt")):
+        raise ValueError("Missing core tables")
+
+    latest_submissions = None
+    if os.path.exists(os.path.join(DATA_DIR, "Submissions.txt")):
+        with report.stage("aggregate_submissions") as stage:
+            latest_submissions = stream_latest_submissions(iter_txt_chunks("Submissions", chunksize))
+            stage["rows_after"] = len(latest_submissions) if latest_submissions is not None else 0
+
+    planner = plan_joins(tables, latest_submissions, strict=strict, verbose=False)
+    del tables
+
+    for products in iter_txt_chunks("Products", chunksize):
+        yield from iter_document_records(build_document_frame(planner.join(products)))
+
+    planner.finish()
+    planner.print_report()
+    report.add_joins(planner.report)
+
+def _column_as_str(frame, column):
+    """Whole-column equivalent of str(value or "") with missing values kept as "nan"."""
+    if column not in frame.columns:
+        return pd.Series("", index=frame.index, dtype=object)
+    values = frame[column].astype(object)
+    return values.where(values.notna(), "nan").astype(str)
+
+def build_document_frame(merged):
+    """Build the document records column-wise from the merged table"""
+    docs = pd.DataFrame(
+        {field: _column_as_str(merged, column) for field, column in DOCUMENT_FIELDS.items()},
+        index=merged.index,
+    )
+    description = (
+        docs["drug_name"] + " (" + docs["active_ingredient"] + ") is a "
+        + docs["form"] + " formulation with strength " + docs["strength"] + "."
+    )
+    docs["description"] = description.where(docs["drug_name"] != "", "")
+    return docs.reset_index(drop=True)
+
+def iter_document_records(docs):
+    """Yield one dict per document, in the fda_documents.jsonl field order"""
+    fields = list(docs.columns)
+    for values in zip(*(docs[field].tolist() for field in fields)):
+        yield dict(zip(fields, values))
+
+def write_records_jsonl(records, path):
+    """Write an iterable of document dicts as JSONL and return the number written.
+
+    Records go to `path`.tmp, which replaces `path` only once the iterable is
+    exhausted. When streaming, that is after JoinPlanner.finish() has checked
+    the join cardinalities, so a failed build leaves the previous output intact.
+    """
+    count = 0
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc in records:
+                f.write(json.dumps(doc))
+                f.write("\n")
+                count += 1
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+def write_documents_jsonl(docs, path):
+    """Write document records as JSONL and return the number written"""
+    return write_records_jsonl(iter_document_records(docs), path)
+
+def write_incremental_delta(docs, output_path):
+    """Diff the new documents against the previous snapshot and write the delta file"""
+    previous_hashes = load_snapshot(output_path)
+    groups = group_documents(iter_document_records(docs))
+    entries, hashes = compute_delta(previous_hashes, groups)
+
+    path = delta_path(output_path)
+    write_delta(entries, path, snapshot_id(previous_hashes), snapshot_id(hashes))
+    counts = summarize_delta(entries)
+    print(f"🔄 Delta vs previous build: {counts['added']} added, {counts['changed']} changed, "
+          f"{counts['deleted']} deleted ({len(hashes)} products)")
+    print(f"✅ Saved {len(entries)} delta records to {path}")
+    return hashes
+
+def iter_jsonl_records(path):
+    """Read document dicts back from a JSONL file one line at a time"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def create_documents(incremental=False, stream=False, chunksize=10000, workers=1, strict=True,
+                     store=False, compress=False):
+    output_path = os.path.join(OUTPUT_DIR, "fda_documents.jsonl")
+    store_path = os.path.join(OUTPUT_DIR, STORE_FILENAME)
+    if stream and incremental:
+        raise ValueError("Incremental mode needs the full document set; it cannot be combined with streaming")
+
+    report = IngestReport(mode="stream" if stream else "incremental" if incremental else "full")
+
+    if stream:
+        print(f"\n=== STREAMING DOCUMENTS ===")
+        # Joins, document build and write are interleaved per chunk, so they share one stage
+        with report.stage("stream_build_and_write") as stage:
+            count = write_records_jsonl(iter_streamed_documents(chunksize, strict=strict, report=report), output_path)
+            stage["rows"] = count
+        hashes = None
+        if store:
+            # The stream is consumed by the JSONL writer, so the store is built from its output
+            with report.stage("write_store", rows=count):
+                write_store(iter_jsonl_records(output_path), store_path, compress=compress)
+    else:
+        with report.stage("load_tables") as stage:
+            tables = load_txt_files(workers=workers, timings=report.tables)
+            stage["rows"] = sum(len(df) for df in tables.values())
+        merged = merge_tables(tables, strict=strict, report=report)
+
+        print(f"\n=== CREATING DOCUMENTS ===")
+        with report.stage("build_documents", rows=len(merged)):
+            docs = build_document_frame(merged)
+
+        if incremental:
+            with report.stage("incremental_delta", rows=len(docs)):
+                hashes = write_incremental_delta(docs, output_path)
+        else:
+            hashes = None
+
+        # Save each doc as JSONL
+        with report.stage("write_jsonl") as stage:
+            count = write_documents_jsonl(docs, output_path)
+            stage["rows"] = count
+        if store:
+            with report.stage("write_store", rows=count):
+                write_store(iter_document_records(docs), store_path, compress=compress)
+
+    if hashes is not None:
+        save_snapshot(output_path, hashes)
+    elif os.path.exists(snapshot_path(output_path)):
+        # A full rebuild invalidates the snapshot; the next incremental run re-hashes the JSONL
+        os.remove(snapshot_path(output_path))
+
+    print(f"✅ Saved {count} documents to {OUTPUT_DIR}/fda_documents.jsonl")
+    if store:
+        print(f"✅ Saved document store to {store_path} (+{os.path.basename(index_path(store_path))})")
+    print(f"📊 Saved ingest report to {report.write(output_path, documents=count)}")
 
 if __name__ == "__main__":
-    create_documents()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build fda_documents.jsonl from the FDA tables")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--incremental", action="store_true",
+                      help="Also write a delta of added/changed/deleted products vs the previous build")
+    mode.add_argument("--stream", action="store_true",
+                      help="Stream Products in chunks with bounded memory")
+    parser.add_argument("--chunksize", type=int, default=10000, help="Rows per Products chunk when streaming")
+    parser.add_argument("--workers", type=int, default=1, help="Parse uncached tables in this many processes")
+    parser.add_argument("--allow-fanout", action="store_true",
+                        help="Warn instead of failing when a join exceeds its expected cardinality")
+    parser.add_argument("--store", action="store_true",
+                        help=f"Also write the binary document store ({STORE_FILENAME}) with an offset index")
+    parser.add_argument("--compress", action="store_true", help="zlib-compress document store records")
+    args = parser.parse_args()
+    create_documents(incremental=args.incremental, stream=args.stream, chunksize=args.chunksize,
+                     workers=args.workers, strict=not args.allow_fanout,
+                     store=args.store, compress=args.compress)
@@ -1,36 +1,145 @@
 import os
+import time
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from table_cache import TableCache
+from schema_sniff import load_schema_manifest, parse_options
 
 DATA_DIR = "data/raw"
 
-def load_txt_files():
-    """Loads all .txt files from data/raw folder"""
+def _read_csv_kwargs(schema):
+    """read_csv settings for a sniffed schema"""
+    return {
+        "delimiter": schema["delimiter"],
+        "encoding": schema["encoding"],
+        "dtype": {column: (str if dtype == "str" else dtype) for column, dtype in schema["dtypes"].items()},
+        "on_bad_lines": "skip",
+    }
+
+def parse_txt_file(path, schema=None):
+    """Parses one FDA .txt table with its sniffed schema, or by trying tab then pipe delimiters"""
+    filename = os.path.basename(path)
+    if schema is not None:
+        print(f"Loading {filename} ({schema['delimiter']!r}, {schema['encoding']})...")
+        return pd.read_csv(path, **_read_csv_kwargs(schema))
+
+    # Try tab delimiter first (most common for FDA files)
+    print(f"Attempting to load {filename}...")
+    try:
+        df = pd.read_csv(path, delimiter='\t', dtype=str, encoding="latin1", on_bad_lines='skip')
+        print(f"Tab delimiter successful for {filename}: {df.shape}")
+        if df.shape[1] == 1:  # If only 1 column, might be pipe-delimited
+            raise ValueError("Single column detected, trying pipe delimiter")
+    except Exception as tab_error:
+        print(f"Tab delimiter failed for {filename}: {tab_error}")
+        # Fallback to pipe delimiter
+        try:
+            df = pd.read_csv(path, delimiter='|', dtype=str, encoding="latin1", on_bad_lines='skip')
+            print(f"Pipe delimiter successful for {filename}: {df.shape}")
+        except Exception as pipe_error:
+            print(f"Pipe delimiter also failed for {filename}: {pipe_error}")
+            raise pipe_error
+    return df
+
+def iter_txt_chunks(name, chunksize=10000):
+    """Streams one data/raw table in DataFrame chunks with its sniffed schema"""
+    path = os.path.join(DATA_DIR, f"{name}.txt")
+    schema = load_schema_manifest(DATA_DIR).get(name)
+    if schema is None:
+        raise FileNotFoundError(f"No {name}.txt in {DATA_DIR}")
+    print(f"Streaming {name}.txt in chunks of {chunksize:,} rows...")
+    yield from pd.read_csv(path, chunksize=chunksize, **_read_csv_kwargs(schema))
+
+def _parse_table_worker(name, path, schema, options, cache_dir):
+    """Process-pool task: parse one table and hand it back through the Feather cache when possible"""
+    start = time.perf_counter()
+    df = parse_txt_file(path, schema)
+    cache = TableCache(cache_dir) if cache_dir else None
+    if cache and cache.write_table(name, df):
+        # The parent memory-maps the Feather file instead of unpickling the frame
+        return name, None, cache.make_entry(path, options), time.perf_counter() - start
+    return name, df, None, time.perf_counter() - start
+
+def _parse_tables_parallel(pending, cache, workers, tables, timings):
+    """Parse cache misses concurrently; results arrive as Feather files or, without pyarrow, pickled frames"""
+    cache_dir = cache.cache_dir if cache and cache.enabled else None
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_parse_table_worker, name, path, schema, options, cache_dir): (name, filename, path, options)
+            for name, filename, path, schema, options in pending
+        }
+        for future in as_completed(futures):
+            name, filename, path, options = futures[future]
+            start = time.perf_counter()
+            try:
+                _, df, entry, parse_seconds = future.result()
+                if entry is not None:
+                    entries[name] = entry
+                    df = cache.read_table(name)
+                tables[name] = df
+                timings[name] = parse_seconds + (time.perf_counter() - start)
+                print(f"✅ Successfully loaded {name}: {df.shape}")
+            except Exception as e:
+                print(f"❌ Error loading {filename}: {e}")
+    if cache:
+        cache.record(entries)
+
+def load_txt_files(use_cache=True, names=None, workers=1, timings=None):
+    """Loads all .txt files (or only `names`) from data/raw folder, reusing cached parses when unchanged.
+
+    With workers > 1, tables that are not cached are parsed in a process pool.
+    Per-table load seconds are written into `timings` when a dict is given.
+    """
+    cache = TableCache() if use_cache else None
+    schemas = load_schema_manifest(DATA_DIR)
+    timings = {} if timings is None else timings
+    order = []
+    pending = []
     tables = {}
     for filename in os.listdir(DATA_DIR):
         if filename.endswith(".txt"):
             name = filename.replace(".txt", "")
+            if names is not None and name not in names:
+                continue
             path = os.path.join(DATA_DIR, filename)
+            order.append(name)
+            schema = schemas.get(name)
+            options = parse_options(schema) if schema else None
+            start = time.perf_counter()
+            try:
+                df = cache.get(name, path, options) if cache else None
+            except Exception as e:
+                print(f"⚠️  Cache lookup failed for {name}: {e}")
+                df = None
+            if df is not None:
+                print(f"⚡ Loaded {name} from cache: {df.shape}")
+                tables[name] = df
+                timings[name] = time.perf_counter() - start
+                print(f"✅ Successfully loaded {name}: {df.shape}")
+            else:
+                pending.append((name, filename, path, schema, options))
+
+    if workers > 1 and len(pending) > 1:
+        print(f"Parsing {len(pending)} tables with {min(workers, len(pending))} worker processes...")
+        _parse_tables_parallel(pending, cache, min(workers, len(pending)), tables, timings)
+    else:
+        for name, filename, path, schema, options in pending:
+            start = time.perf_counter()
             try:
-                # Try tab delimiter first (most common for FDA files)
-                print(f"Attempting to load {filename}...")
-                try:
-                    df = pd.read_csv(path, delimiter='\t', dtype=str, encoding="latin1", on_bad_lines='skip')
-                    print(f"Tab delimiter successful for {filename}: {df.shape}")
-                    if df.shape[1] == 1:  # If only 1 column, might be pipe-delimited
-                        raise ValueError("Single column detected, trying pipe delimiter")
-                except Exception as tab_error:
-                    print(f"Tab delimiter failed for {filename}: {tab_error}")
-                    # Fallback to pipe delimiter
-                    try:
-                        df = pd.read_csv(path, delimiter='|', dtype=str, encoding="latin1", on_bad_lines='skip')
-                        print(f"Pipe delimiter successful for {filename}: {df.shape}")
-                    except Exception as pipe_error:
-                        print(f"Pipe delimiter also failed for {filename}: {pipe_error}")
-                        raise pipe_error
-                
+                df = parse_txt_file(path, schema)
+                if cache:
+                    cache.put(name, path, df, options)
+
                 tables[name] = df
+                timings[name] = time.perf_counter() - start
                 print(f"✅ Successfully loaded {name}: {df.shape}")
             except Exception as e:
                 print(f"❌ Error loading {filename}: {e}")
                 # Continue with other files
-    return tables
\ No newline at end of file
+
+    print("⏱️  Table load times:")
+    for name in sorted(timings, key=timings.get, reverse=True):
+        print(f"  {name}: {timings[name]:.3f}s")
+
+    return {name: tables[name] for name in order if name in tables}
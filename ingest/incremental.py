@@ -0,0 +1,158 @@
+import os
+import json
+import hashlib
+
+SNAPSHOT_SUFFIX = ".snapshot.json"
+DELTA_SUFFIX = ".delta.jsonl"
+# op of a delta's header line
+SNAPSHOT_OP = "snapshot"
+
+
+def document_key(doc):
+    """Products are identified by (ApplNo, ProductNo)"""
+    return f"{doc.get('application_no', '')}|{doc.get('product_no', '')}"
+
+
+def group_documents(docs):
+    """Group document dicts by product key, keeping file order within a key.
+
+    A key normally maps to one document; products with several TE codes
+    map to one document per code.
+    """
+    groups = {}
+    for doc in docs:
+        groups.setdefault(document_key(doc), []).append(doc)
+    return groups
+
+
+def content_hash(documents):
+    """Stable hash of all documents sharing one product key"""
+    payload = json.dumps(documents, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def hash_documents(docs):
+    """{product key: content hash} of document dicts, the form snapshots are kept in"""
+    return {key: content_hash(group) for key, group in group_documents(docs).items()}
+
+
+def snapshot_id(hashes):
+    """Identifier of one build's document set, independent of document order.
+
+    Deltas name the snapshot they were computed against and the one they
+    produce, and vector stores record the snapshot they reflect, so a delta
+    is only ever applied to the index it was diffed from.
+    """
+    payload = json.dumps(hashes, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def snapshot_path(jsonl_path):
+    return os.path.splitext(jsonl_path)[0] + SNAPSHOT_SUFFIX
+
+
+def delta_path(jsonl_path):
+    return os.path.splitext(jsonl_path)[0] + DELTA_SUFFIX
+
+
+def load_snapshot(jsonl_path):
+    """Return {product key: content hash} for the previous build.
+
+    Uses the hash snapshot written next to the JSONL, or rebuilds it from the
+    previous JSONL the first time incremental mode is used.
+    """
+    path = snapshot_path(jsonl_path)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    if not os.path.exists(jsonl_path):
+        return {}
+
+    print(f"No snapshot found, hashing previous {jsonl_path}...")
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f if line.strip()]
+    return hash_documents(docs)
+
+
+def save_snapshot(jsonl_path, hashes):
+    path = snapshot_path(jsonl_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(hashes, f)
+    os.replace(tmp_path, path)
+
+
+def compute_delta(previous_hashes, groups):
+    """Compare grouped documents against the previous snapshot.
+
+    Returns (delta entries, new snapshot hashes). Each entry has an `op` of
+    added, changed or deleted, the product key fields and the content hash;
+    added/changed entries carry the product's documents.
+    """
+    entries = []
+    hashes = {}
+    for key, documents in groups.items():
+        digest = content_hash(documents)
+        hashes[key] = digest
+        previous = previous_hashes.get(key)
+        if previous == digest:
+            continue
+        application_no, product_no = key.split("|", 1)
+        entries.append({
+            "op": "added" if previous is None else "changed",
+            "application_no": application_no,
+            "product_no": product_no,
+            "content_hash": digest,
+            "documents": documents,
+        })
+
+    for key, digest in previous_hashes.items():
+        if key not in hashes:
+            application_no, product_no = key.split("|", 1)
+            entries.append({
+                "op": "deleted",
+                "application_no": application_no,
+                "product_no": product_no,
+                "content_hash": digest,
+            })
+
+    return entries, hashes
+
+
+def write_delta(entries, path, base_snapshot, snapshot):
+    """Write the delta from snapshot `base_snapshot` to `snapshot` (see snapshot_id).
+
+    The first line is a header {"op": "snapshot", "base_snapshot", "snapshot"};
+    the entries follow, one per line.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"op": SNAPSHOT_OP, "base_snapshot": base_snapshot, "snapshot": snapshot}))
+        f.write("\n")
+        for entry in entries:
+            f.write(json.dumps(entry))
+            f.write("\n")
+
+
+def read_delta(path):
+    """Read delta entries written by write_delta (without the header)"""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [entry for entry in entries if entry.get("op") != SNAPSHOT_OP]
+
+
+def read_delta_snapshots(path):
+    """(base_snapshot, snapshot) from a delta's header, or (None, None) for a delta without one"""
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+    header = json.loads(first) if first.strip() else {}
+    if header.get("op") != SNAPSHOT_OP:
+        return None, None
+    return header.get("base_snapshot"), header.get("snapshot")
+
+
+def summarize_delta(entries):
+    counts = {"added": 0, "changed": 0, "deleted": 0}
+    for entry in entries:
+        counts[entry["op"]] += 1
+    return counts
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; peak RSS is reported as None
+    resource = None
+
+REPORT_SUFFIX = ".report.json"
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def report_path(output_path):
+    return os.path.splitext(output_path)[0] + REPORT_SUFFIX
+
+
+class IngestReport:
+    """Collects wall time, CPU time, peak RSS and row counts per ingest stage"""
+
+    def __init__(self, mode="full"):
+        self.mode = mode
+        self.stages = []
+        self.tables = {}
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time a block; set entry["rows"] inside the block if the count is only known there"""
+        entry = {"stage": name, "rows": rows}
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield entry
+        finally:
+            entry["wall_seconds"] = round(time.perf_counter() - wall_start, 4)
+            entry["cpu_seconds"] = round(time.process_time() - cpu_start, 4)
+            entry["peak_rss_mb"] = peak_rss_mb()
+            self.stages.append(entry)
+
+    def add_stage(self, name, wall_seconds, cpu_seconds, rows=None, **extra):
+        """Record a stage measured elsewhere (e.g. one join of the JoinPlanner)"""
+        entry = {
+            "stage": name,
+            "rows": rows,
+            "wall_seconds": round(wall_seconds, 4),
+            "cpu_seconds": round(cpu_seconds, 4),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        entry.update(extra)
+        self.stages.append(entry)
+        return entry
+
+    def add_joins(self, join_report):
+        for step in join_report:
+            self.add_stage(f"merge:{step['step']}", step["wall_seconds"], step["cpu_seconds"],
+                           rows=step["rows_after"], rows_before=step["rows_before"], growth=step["growth"])
+
+    def to_dict(self, output_path=None, documents=None):
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "mode": self.mode,
+            "output": output_path,
+            "documents": documents,
+            "total": {
+                "wall_seconds": round(time.perf_counter() - self._wall_start, 4),
+                "cpu_seconds": round(time.process_time() - self._cpu_start, 4),
+                "peak_rss_mb": peak_rss_mb(),
+            },
+            "tables": self.tables,
+            "stages": self.stages,
+        }
+
+    def write(self, output_path, documents=None):
+        """Write the report as JSON next to `output_path` and return its path"""
+        path = report_path(output_path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(output_path, documents), f, indent=2)
+        return path
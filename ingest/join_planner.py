@@ -0,0 +1,116 @@
+import time
+
+EXPECTATIONS = ("one_to_one", "many_to_one", "one_to_many")
+
+
+class CardinalityError(ValueError):
+    """A join produced (or would produce) more rows than its declared cardinality allows"""
+
+
+class JoinPlanner:
+    """Left-joins a fact table against dimension tables keyed once up front.
+
+    Each step declares its expected cardinality:
+      - "many_to_one" / "one_to_one": the dimension key must be unique, so the
+        join can never add rows (one_to_one also requires unique left keys)
+      - "one_to_many": the dimension may repeat keys, but the row count may
+        grow by at most `max_growth`
+    A violated expectation raises CardinalityError, or only warns when
+    strict=False. Row counts per step accumulate in `report`, so running the
+    same planner over many chunks reports totals; growth is checked on those
+    totals once `min_rows` rows have passed a step, and for every step by
+    finish().
+    """
+
+    def __init__(self, strict=True, verbose=True, min_rows=1000):
+        self.strict = strict
+        self.verbose = verbose
+        self.min_rows = min_rows
+        self.steps = []
+        self.report = []
+        self._violated = set()
+
+    def _violation(self, message):
+        if self.strict:
+            raise CardinalityError(message)
+        print(f"⚠️  {message}")
+
+    def add(self, name, table, on, columns=None, expect="many_to_one", max_growth=1.0):
+        """Register a dimension table, keying it by `on` once"""
+        if expect not in EXPECTATIONS:
+            raise ValueError(f"Unknown cardinality expectation: {expect}")
+
+        keys = [on] if isinstance(on, str) else list(on)
+        columns = list(columns) if columns is not None else list(table.columns)
+        index = table[columns].set_index(keys)
+
+        if expect != "one_to_many" and not index.index.is_unique:
+            duplicates = int(index.index.duplicated().sum())
+            self._violation(f"{name}: {duplicates} duplicate {keys} keys in a {expect} join")
+
+        self.steps.append({
+            "name": name,
+            "on": keys,
+            "index": index,
+            "expect": expect,
+            "max_growth": max_growth,
+        })
+        self.report.append({
+            "step": name,
+            "on": keys,
+            "expect": expect,
+            "rows_before": 0,
+            "rows_after": 0,
+            "growth": 1.0,
+            "wall_seconds": 0.0,
+            "cpu_seconds": 0.0,
+        })
+        return self
+
+    def join(self, left):
+        """Run every registered join against `left` and return the merged frame"""
+        merged = left
+        for step, entry in zip(self.steps, self.report):
+            keys = step["on"]
+            rows_before = len(merged)
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+
+            if step["expect"] == "one_to_one" and merged.duplicated(keys).any():
+                self._violation(f"{step['name']}: left side has duplicate {keys} keys in a one_to_one join")
+
+            merged = merged.join(step["index"], on=keys[0] if len(keys) == 1 else keys)
+            rows_after = len(merged)
+            entry["wall_seconds"] += time.perf_counter() - wall_start
+            entry["cpu_seconds"] += time.process_time() - cpu_start
+
+            entry["rows_before"] += rows_before
+            entry["rows_after"] += rows_after
+            entry["growth"] = entry["rows_after"] / entry["rows_before"] if entry["rows_before"] else 1.0
+
+            if entry["rows_before"] >= self.min_rows:
+                self._check_growth(step, entry)
+            if self.verbose:
+                print(f"After {step['name']} merge: {merged.shape} (x{rows_after / max(rows_before, 1):.3f})")
+
+        return merged
+
+    def _check_growth(self, step, entry):
+        if entry["growth"] > step["max_growth"] and step["name"] not in self._violated:
+            self._violated.add(step["name"])
+            self._violation(
+                f"{step['name']}: join grew rows {entry['rows_before']:,} -> {entry['rows_after']:,} "
+                f"(x{entry['growth']:.3f}, limit x{step['max_growth']:.3f})"
+            )
+
+    def finish(self):
+        """Check the accumulated growth of every step and return the report"""
+        for step, entry in zip(self.steps, self.report):
+            self._check_growth(step, entry)
+        return self.report
+
+    def print_report(self):
+        print("\n=== JOIN REPORT ===")
+        for entry in self.report:
+            print(f"  {entry['step']:<24} {entry['expect']:<12} "
+                  f"{entry['rows_before']:>10,} -> {entry['rows_after']:>10,}  x{entry['growth']:.3f}")
@@ -0,0 +1,154 @@
+import os
+import json
+import codecs
+
+SNIFF_BYTES = 8192
+VERIFY_BLOCK_BYTES = 1 << 20
+CANDIDATE_DELIMITERS = ["\t", "|"]
+DEFAULT_DELIMITER = "\t"
+DEFAULT_ENCODING = "latin1"
+MANIFEST_PATH = "data/cache/schema_manifest.json"
+# Bump when inference changes so existing manifests are re-sniffed
+SCHEMA_VERSION = 3
+
+# Join keys must stay plain strings so every table agrees on their dtype
+KEY_COLUMNS = {"ApplNo", "ProductNo", "MarketingStatusID"}
+# Sorted as text (latest submission per application), so never dictionary-encoded
+SORT_COLUMNS = {"SubmissionStatusDate"}
+# Columns known to repeat a small vocabulary across tens of thousands of rows, even
+# where the sampled head of a file happens to show few repeats
+CATEGORICAL_COLUMNS = {
+    "SponsorName", "ApplType", "Form", "MarketingStatusDescription", "TECode",
+    "SubmissionStatus", "SubmissionType", "ReviewPriority",
+}
+# Other columns are encoded when the sample has enough values and at most this share is distinct
+CATEGORY_MIN_SAMPLE = 20
+CATEGORY_MAX_DISTINCT_RATIO = 0.5
+
+
+def _read_sample(path, sniff_bytes=SNIFF_BYTES):
+    """Read the first few KB of a file, dropping a trailing partial line"""
+    with open(path, "rb") as f:
+        sample = f.read(sniff_bytes)
+        truncated = bool(f.read(1))
+    if truncated and b"\n" in sample:
+        sample = sample[:sample.rindex(b"\n")]
+    return sample
+
+
+def detect_encoding(sample):
+    """UTF-8 only when the sample has non-ASCII bytes that decode as UTF-8; FDA files default to latin1"""
+    if sample.isascii():
+        return DEFAULT_ENCODING
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return DEFAULT_ENCODING
+
+
+def decodes_as(path, encoding):
+    """True if the whole file decodes strictly with `encoding` (read in blocks, not held in memory)"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(VERIFY_BLOCK_BYTES), b""):
+                decoder.decode(block)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_delimiter(lines):
+    """Pick the candidate delimiter that splits the header into the most columns"""
+    header = lines[0] if lines else ""
+    counts = {d: header.count(d) for d in CANDIDATE_DELIMITERS}
+    # Prefer delimiters whose count is consistent across the sampled rows
+    consistent = {d: c for d, c in counts.items()
+                  if c > 0 and all(line.count(d) == c for line in lines[1:])}
+    ranked = consistent or {d: c for d, c in counts.items() if c > 0}
+    if not ranked:
+        return DEFAULT_DELIMITER
+    return max(ranked, key=ranked.get)
+
+
+def infer_dtypes(columns, rows):
+    """Per-column dtypes for the full parse, from the sampled rows.
+
+    Low-cardinality text columns (the known vocabularies, plus any column
+    whose sampled values mostly repeat) are dictionary-encoded as
+    "category"; the document builder decodes them back to strings.
+    Everything else stays "str", and so do the join keys: ApplNo/ProductNo
+    are zero-padded and the merges in drug_ingest join on them as strings.
+    """
+    dtypes = {}
+    for i, column in enumerate(columns):
+        values = [row[i] for row in rows if i < len(row) and row[i]]
+        repeats = (len(values) >= CATEGORY_MIN_SAMPLE
+                   and len(set(values)) <= CATEGORY_MAX_DISTINCT_RATIO * len(values))
+        encode = (column in CATEGORICAL_COLUMNS or repeats) and column not in KEY_COLUMNS | SORT_COLUMNS
+        dtypes[column] = "category" if encode else "str"
+    return dtypes
+
+
+def sniff_file(path, sniff_bytes=SNIFF_BYTES):
+    """Decide delimiter, encoding, columns and dtypes from the head of a file"""
+    sample = _read_sample(path, sniff_bytes)
+    encoding = detect_encoding(sample)
+    # A UTF-8 head says nothing about the rest; one bad byte later would fail the whole parse
+    if encoding != DEFAULT_ENCODING and not decodes_as(path, encoding):
+        encoding = DEFAULT_ENCODING
+    lines = [line.rstrip("\r") for line in sample.decode(encoding, errors="replace").split("\n") if line.strip()]
+    delimiter = detect_delimiter(lines)
+    columns = lines[0].split(delimiter) if lines else []
+    rows = [line.split(delimiter) for line in lines[1:]]
+
+    stat = os.stat(path)
+    return {
+        "delimiter": delimiter,
+        "encoding": encoding,
+        "columns": columns,
+        "dtypes": infer_dtypes(columns, rows),
+        "version": SCHEMA_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def parse_options(schema):
+    """The subset of a schema that determines how a table is parsed"""
+    return {key: schema[key] for key in ("delimiter", "encoding", "dtypes")}
+
+
+def load_schema_manifest(data_dir, manifest_path=MANIFEST_PATH):
+    """Return {table name: schema} for data_dir, re-sniffing only files that changed"""
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    updated = {}
+    changed = False
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith(".txt"):
+            continue
+        name = filename.replace(".txt", "")
+        path = os.path.join(data_dir, filename)
+        stat = os.stat(path)
+        schema = manifest.get(name)
+        if (not schema or schema.get("version") != SCHEMA_VERSION
+                or schema["size"] != stat.st_size or schema["mtime_ns"] != stat.st_mtime_ns):
+            schema = sniff_file(path)
+            changed = True
+        updated[name] = schema
+
+    if changed or set(updated) != set(manifest):
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(updated, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+    return updated
@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional, loads fall back to parsing the .txt files
+    feather = None
+
+CACHE_DIR = "data/cache/tables"
+MANIFEST_NAME = "manifest.json"
+
+
+def file_content_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TableCache:
+    """Feather cache of parsed FDA tables keyed by source size, mtime and content hash.
+
+    A cached table is reused when the source file has the same size and mtime,
+    or the same size and content hash (e.g. after a fresh checkout touched it).
+    `options` records the parse settings; changing them invalidates the entry.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.enabled = feather is not None
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+        self.manifest = self._read_manifest() if self.enabled else {}
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _table_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.feather")
+
+    def get(self, name, source_path, options=None):
+        """Return the cached DataFrame for `source_path`, or None if stale or missing"""
+        if not self.enabled:
+            return None
+
+        entry = self.manifest.get(name)
+        table_path = self._table_path(name)
+        if not entry or not os.path.exists(table_path):
+            return None
+        if entry.get("options") != (options or {}):
+            return None
+
+        stat = os.stat(source_path)
+        if stat.st_size != entry["size"]:
+            return None
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            # Same size, new mtime: only the content hash can tell
+            if file_content_hash(source_path) != entry["sha256"]:
+                return None
+            entry["mtime_ns"] = stat.st_mtime_ns
+            self._write_manifest()
+
+        return self.read_table(name)
+
+    def read_table(self, name):
+        """Memory-map a cached Feather table into a DataFrame"""
+        try:
+            return feather.read_table(self._table_path(name), memory_map=True).to_pandas()
+        except Exception as e:
+            print(f"⚠️  Could not read cached {name}: {e}")
+            return None
+
+    def write_table(self, name, df):
+        """Write the Feather file for a table; returns False if it could not be written"""
+        if not self.enabled:
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        table_path = self._table_path(name)
+        tmp_path = f"{table_path}.{os.getpid()}.tmp"
+        try:
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+            os.replace(tmp_path, table_path)
+            return True
+        except Exception as e:
+            print(f"⚠️  Could not cache {name}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    @staticmethod
+    def make_entry(source_path, options=None):
+        """Manifest entry describing the current state of a source file"""
+        stat = os.stat(source_path)
+        return {
+            "source": os.path.basename(source_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_content_hash(source_path),
+            "options": options or {},
+        }
+
+    def record(self, entries):
+        """Add {name: entry} to the manifest in one write (entries may come from worker processes)"""
+        if not self.enabled or not entries:
+            return
+        self.manifest.update(entries)
+        self._write_manifest()
+
+    def put(self, name, source_path, df, options=None):
+        """Store a parsed DataFrame for `source_path`"""
+        if self.write_table(name, df):
+            self.record({name: self.make_entry(source_path, options)})
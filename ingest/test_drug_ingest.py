@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Ingest scripts import their siblings directly
+sys.path.insert(0, str(Path(__file__).parent))
+
+import fda_ingest
+import schema_sniff
+from drug_ingest import create_documents, merge_tables, OUTPUT_DIR, STORE_FILENAME
+from fda_ingest import load_txt_files, parse_txt_file, DATA_DIR
+from benchmark_ingest import (legacy_build_documents, vectorized_build_documents, load_string_tables,
+                              load_benchmark_tables, frame_mb)
+from doc_store import DocumentStore
+from ingest_report import report_path
+from join_planner import CardinalityError
+from incremental import read_delta, read_delta_snapshots, delta_path, hash_documents, snapshot_id
+from schema_sniff import load_schema_manifest, sniff_file, infer_dtypes, MANIFEST_PATH
+
+FORMS = ["TABLET;ORAL", "CAPSULE;ORAL", "INJECTABLE;INJECTION", "CREAM;TOPICAL"]
+DRUGS = ["OZEMPIC", "METFORMIN", "LISINOPRIL", "ASPIRIN", "IBUPROFEN"]
+SPONSORS = ["PFIZER", "NOVARTIS", "LILLY"]
+
+
+def make_products(applications=40):
+    """{(ApplNo, ProductNo): Products row}, one to three products per application"""
+    products = {}
+    for a in range(applications):
+        appl_no = f"{a * 37 + 4:06d}"
+        for p in range(1 + a % 3):
+            drug = DRUGS[(a + p) % len(DRUGS)]
+            products[(appl_no, f"{p + 1:03d}")] = [
+                appl_no, f"{p + 1:03d}", FORMS[(a + p) % len(FORMS)], f"{5 * (p + 1)}MG",
+                "0", drug, f"{drug.lower()} hcl", "0",
+            ]
+    return products
+
+
+def write_table(name, columns, rows):
+    with open(os.path.join(DATA_DIR, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.write("\t".join(columns) + "\n")
+        for row in rows:
+            f.write("\t".join(row) + "\n")
+
+
+def write_raw_tables(products):
+    """The FDA tables drug_ingest joins, for the given products (values derive from the keys,
+    so removing a product leaves every other row unchanged)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    applications = sorted({key[0] for key in products})
+    write_table("Products", ["ApplNo", "ProductNo", "Form", "Strength", "ReferenceDrug", "DrugName",
+                             "ActiveIngredient", "ReferenceStandard"], products.values())
+    write_table("Applications", ["ApplNo", "ApplType", "ApplPublicNotes", "SponsorName"],
+                [[appl_no, "NDA", "", SPONSORS[int(appl_no) % len(SPONSORS)]] for appl_no in applications])
+    te_rows = [[appl_no, product_no, str(1 + int(appl_no) % 3), "AB"] for appl_no, product_no in products]
+    te_rows.append(te_rows[0][:3] + ["AB1"])  # one product with two TE codes
+    write_table("TE", ["ApplNo", "ProductNo", "MarketingStatusID", "TECode"], te_rows)
+    write_table("MarketingStatus_Lookup", ["MarketingStatusID", "MarketingStatusDescription"],
+                [["1", "Prescription"], ["2", "Over-the-counter"], ["3", "Discontinued"]])
+    submissions = []
+    for appl_no in applications:
+        submissions.append([appl_no, "7", "ORIG", "1", "AP", f"20{10 + int(appl_no) % 10}-05-01 00:00:00", "", ""])
+        if int(appl_no) % 4 == 0:
+            submissions.append([appl_no, "3", "SUPPL", "2", "AP", "2021-01-01 00:00:00", "", "PRIORITY"])
+    write_table("Submissions", ["ApplNo", "SubmissionClassCodeID", "SubmissionType", "SubmissionNo",
+                                "SubmissionStatus", "SubmissionStatusDate", "SubmissionsPublicNotes",
+                                "ReviewPriority"], submissions)
+
+
+def read_output():
+    with open(os.path.join(OUTPUT_DIR, "fda_documents.jsonl"), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def raw_tables(tmp_path, monkeypatch):
+    """A small FDA data set under a temporary data/raw, used as the working directory"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(OUTPUT_DIR)
+    products = make_products()
+    write_raw_tables(products)
+    return products
+
+
+def test_column_wise_builder_matches_the_row_loop(raw_tables):
+    products = dict(raw_tables)
+    products[("999998", "001")] = ["999998", "001", "TABLET;ORAL", "1MG", "0", "", "", "0"]
+    write_raw_tables(products)
+    tables = load_txt_files()
+    # Products without a TE code or a submission merge as missing values
+    tables["TE"] = tables["TE"].iloc[::2]
+    tables["Submissions"] = tables["Submissions"].iloc[::3]
+    merged = merge_tables(tables)
+    assert merged["TECode"].isna().any() and merged["SubmissionType"].isna().any()
+    assert vectorized_build_documents(merged) == legacy_build_documents(merged)
+
+    create_documents()
+    expected = legacy_build_documents(merge_tables(load_txt_files()))
+    assert read_output().decode("utf-8").splitlines() == [json.dumps(doc) for doc in expected]
+
+
+def test_table_cache_reparses_only_changed_files(raw_tables, monkeypatch):
+    parsed = load_txt_files()
+    calls = []
+    parse = fda_ingest.parse_txt_file
+    monkeypatch.setattr(fda_ingest, "parse_txt_file",
+                        lambda path, *args: calls.append(os.path.basename(path)) or parse(path, *args))
+    cached = load_txt_files()
+    assert calls == []
+    for name in parsed:
+        pd.testing.assert_frame_equal(cached[name], parsed[name])
+
+    # Rewriting every table gives each a new mtime; only Products.txt has new bytes (same size)
+    products = dict(raw_tables)
+    key = next(iter(products))
+    products[key] = products[key][:3] + ["7MG"] + products[key][4:]
+    write_raw_tables(products)
+    for filename in os.listdir(DATA_DIR):
+        path = os.path.join(DATA_DIR, filename)
+        mtime = os.stat(path).st_mtime_ns + 5 * 10**9
+        os.utime(path, ns=(mtime, mtime))
+    reloaded = load_txt_files()
+    assert calls == ["Products.txt"]
+    assert reloaded["Products"]["Strength"].iloc[0] == "7MG"
+
+
+def test_sniffed_schemas_parse_each_table_once(raw_tables, monkeypatch):
+    with open(os.path.join(DATA_DIR, "Pipes.txt"), "w", encoding="utf-8") as f:
+        f.write("ApplNo|ProductNo|Notes\n000004|001|first\n000041|002|second\n")
+    calls = []
+    read_csv = pd.read_csv
+    monkeypatch.setattr(pd, "read_csv", lambda path, *args, **kwargs:
+                        calls.append(os.path.basename(path)) or read_csv(path, *args, **kwargs))
+    tables = load_txt_files(use_cache=False)
+    assert sorted(calls) == sorted(os.listdir(DATA_DIR))
+    assert list(tables["Pipes"].columns) == ["ApplNo", "ProductNo", "Notes"]
+    assert tables["Pipes"]["ApplNo"].tolist() == ["000004", "000041"]
+
+    with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+        assert json.load(f)["Pipes"]["delimiter"] == "|"
+    sniffed = []
+    sniff_file = schema_sniff.sniff_file
+    monkeypatch.setattr(schema_sniff, "sniff_file", lambda path: sniffed.append(path) or sniff_file(path))
+    load_schema_manifest(DATA_DIR)
+    assert sniffed == []  # unchanged files are not sniffed again
+
+
+
+def test_sniffed_utf8_falls_back_to_latin1_for_a_late_invalid_byte(tmp_path):
+    path = tmp_path / "Late.txt"
+    head = "ApplNo\tSponsorName\n" + "".join(f"{i:06d}\tCAFÉ LABS\n" for i in range(1000))
+    path.write_bytes(head.encode("utf-8") + b"001000\tSOCI\xc9T\xc9\n")
+
+    schema = sniff_file(str(path))
+    assert schema["encoding"] == "latin1"
+    df = parse_txt_file(str(path), schema)
+    assert len(df) == 1001
+    assert df["SponsorName"].iloc[-1] == "SOCIÉTÉ"
+
+def test_infer_dtypes_encodes_repeated_columns_but_not_keys():
+    rows = [[f"{i:06d}", "TABLET;ORAL" if i % 2 else "CAPSULE;ORAL", f"NOTE {i}", f"20{i:02d}-01-01"]
+            for i in range(40)]
+    dtypes = infer_dtypes(["ApplNo", "Dosage", "Notes", "SubmissionStatusDate"], rows)
+    assert dtypes == {"ApplNo": "str", "Dosage": "category", "Notes": "str", "SubmissionStatusDate": "str"}
+    # Too few sampled values to tell
+    assert infer_dtypes(["Dosage"], rows[:4]) == {"Dosage": "str"}
+
+
+def test_incremental_delta_lists_added_changed_and_deleted_products(raw_tables):
+    create_documents()
+    previous = [json.loads(line) for line in read_output().splitlines()]
+    create_documents(incremental=True)
+    assert read_delta(delta_path(os.path.join(OUTPUT_DIR, "fda_documents.jsonl"))) == []
+
+    products = dict(raw_tables)
+    (changed, _), (deleted, _) = list(products.items())[:2]
+    products[changed] = products[changed][:3] + ["12.5MG"] + products[changed][4:]
+    del products[deleted]
+    products[("999999", "001")] = ["999999", "001", "TABLET;ORAL", "1MG", "0", "NEWDRUG", "newdrug", "0"]
+    write_raw_tables(products)
+    create_documents(incremental=True)
+
+    entries = read_delta(delta_path(os.path.join(OUTPUT_DIR, "fda_documents.jsonl")))
+    ops = {(entry["application_no"], entry["product_no"]): entry["op"] for entry in entries}
+    assert ops == {changed: "changed", deleted: "deleted", ("999999", "001"): "added"}
+    documents = {(entry["application_no"], entry["product_no"]): entry.get("documents") for entry in entries}
+    # The changed product has two TE codes, so two documents
+    assert [doc["strength"] for doc in documents[changed]] == ["12.5MG", "12.5MG"]
+    assert [doc["drug_name"] for doc in documents[("999999", "001")]] == ["NEWDRUG"]
+    # The header names the snapshot the delta starts from and the one it produces
+    current = [json.loads(line) for line in read_output().splitlines()]
+    assert read_delta_snapshots(delta_path(os.path.join(OUTPUT_DIR, "fda_documents.jsonl"))) == (
+        snapshot_id(hash_documents(previous)), snapshot_id(hash_documents(current)))
+
+
+def test_streamed_ingest_writes_the_same_jsonl(raw_tables):
+    create_documents()
+    full = read_output()
+    assert full.count(b"\n") == len(raw_tables) + 1  # plus the second TE code
+
+    # Chunks smaller than an application's run of products
+    for chunksize in (1, 7):
+        create_documents(stream=True, chunksize=chunksize)
+        assert read_output() == full
+
+
+def test_parallel_ingest_writes_the_same_jsonl(raw_tables):
+    create_documents()
+    full = read_output()
+
+    # A cold table cache, so the tables really are parsed in worker processes
+    shutil.rmtree("data/cache")
+    create_documents(workers=2)
+    assert read_output() == full
+
+    # Without the cache, workers return the frames themselves
+    serial = load_txt_files(use_cache=False)
+    timings = {}
+    parallel = load_txt_files(use_cache=False, workers=2, timings=timings)
+    assert list(parallel) == list(serial)
+    assert set(timings) == set(serial)
+    for name in serial:
+        pd.testing.assert_frame_equal(parallel[name], serial[name])
+
+
+def test_joins_fail_on_duplicate_keys_and_undeclared_fanout(raw_tables):
+    create_documents()
+    previous = read_output()
+    output_path = os.path.join(OUTPUT_DIR, "fda_documents.jsonl")
+
+    applications = os.path.join(DATA_DIR, "Applications.txt")
+    with open(applications, "r", encoding="utf-8") as f:
+        original = f.read()
+    with open(applications, "a", encoding="utf-8") as f:
+        f.write(original.splitlines()[1] + "\n")
+    for stream in (False, True):
+        with pytest.raises(CardinalityError, match="Applications"):
+            create_documents(stream=stream)
+    with open(applications, "w", encoding="utf-8") as f:
+        f.write(original)
+
+    # A second TE code for every product doubles the rows, far over the TE allowance
+    with open(os.path.join(DATA_DIR, "TE.txt"), "a", encoding="utf-8") as f:
+        for appl_no, product_no in raw_tables:
+            f.write(f"{appl_no}\t{product_no}\t1\tBX\n")
+    for stream in (False, True):
+        with pytest.raises(CardinalityError, match="TE"):
+            create_documents(stream=stream)
+        # The stream fails only after writing every chunk; the previous output must survive
+        assert read_output() == previous
+        assert not os.path.exists(output_path + ".tmp")
+
+    create_documents(strict=False)  # --allow-fanout only warns
+    assert read_output().count(b"\n") == 2 * len(raw_tables) + 1
+
+
+def test_known_vocabularies_are_dictionary_encoded(raw_tables):
+    # Known vocabularies are encoded even without repeats in the sample
+    assert infer_dtypes(["SponsorName"], [["A"], ["B"]]) == {"SponsorName": "category"}
+    tables = load_txt_files()
+    assert isinstance(tables["Applications"]["SponsorName"].dtype, pd.CategoricalDtype)
+    assert tables["Applications"]["ApplNo"].dtype == tables["Products"]["ApplNo"].dtype
+
+    encoded = merge_tables(tables)
+    plain = merge_tables(load_string_tables())
+    assert frame_mb(encoded) < frame_mb(plain)
+    assert vectorized_build_documents(encoded) == vectorized_build_documents(plain)
+
+
+
+def test_derived_benchmark_products_table_gets_the_sniffed_dtypes():
+    keys = pd.DataFrame([(f"{a:06d}", f"{p:03d}") for a in range(30) for p in (1, 2)],
+                        columns=["ApplNo", "ProductNo"])
+    encoded = load_benchmark_tables({"MarketingStatus": keys})["Products"]
+    plain = load_benchmark_tables({"MarketingStatus": keys}, encode=False)["Products"]
+
+    assert [str(encoded[column].dtype) for column in ("Form", "Strength")] == ["category", "category"]
+    assert str(encoded["ApplNo"].dtype) != "category"
+    assert not any(str(dtype) == "category" for dtype in plain.dtypes)
+    assert encoded.astype(str).equals(plain.astype(str))
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_document_store_reads_back_the_jsonl_records(raw_tables, compress):
+    create_documents(stream=compress, store=True, compress=compress)
+    records = [json.loads(line) for line in read_output().decode("utf-8").splitlines()]
+
+    with DocumentStore(os.path.join(OUTPUT_DIR, STORE_FILENAME)) as store:
+        assert len(store) == len(records)
+        assert list(store) == records
+        # Frame-aligned partitions cover the file exactly once, in order
+        assert [doc for start, stop in store.partitions(3) for doc in store.iter_range(start, stop)] == records
+
+        appl_no, product_no = next(iter(raw_tables))
+        both = store.get_all(appl_no, product_no)
+        assert [doc["te_code"] for doc in both] == ["AB", "AB1"]
+        assert store.get(appl_no, product_no) == both[0]
+        assert store.get("999999", "001") is None
+
+
+def test_ingest_report_records_every_stage(raw_tables):
+    output_path = os.path.join(OUTPUT_DIR, "fda_documents.jsonl")
+    reports = {}
+    for stream in (False, True):
+        create_documents(stream=stream, store=True)
+        with open(report_path(output_path), "r", encoding="utf-8") as f:
+            reports[stream] = json.load(f)
+
+    full, streamed = reports[False], reports[True]
+    assert full["mode"] == "full" and streamed["mode"] == "stream"
+    assert full["documents"] == streamed["documents"] == len(raw_tables) + 1
+    stages = {entry["stage"]: entry for entry in full["stages"]}
+    assert {"load_tables", "aggregate_submissions", "merge:Applications", "merge:TE",
+            "merge:MarketingStatus_Lookup", "merge:Submissions", "build_documents",
+            "write_jsonl", "write_store"} <= set(stages)
+    assert stages["write_jsonl"]["rows"] == full["documents"]
+    assert set(full["tables"]) == {name[:-4] for name in os.listdir(DATA_DIR)}
+    assert all(entry["wall_seconds"] >= 0 and entry["cpu_seconds"] >= 0 for entry in full["stages"])
+
+    # Streaming sums each join over the chunks, so the row counts match the full run
+    streamed_stages = {entry["stage"]: entry for entry in streamed["stages"]}
+    assert "stream_build_and_write" in streamed_stages
+    for name in ("merge:Applications", "merge:TE", "merge:Submissions"):
+        assert (streamed_stages[name]["rows_before"], streamed_stages[name]["rows"]) == (
+            stages[name]["rows_before"], stages[name]["rows"])
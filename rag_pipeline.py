@@ -129,7 +129,8 @@ class DrugRAGPipeline:
               question: str, 
               k: int = 5,
               include_sources: bool = True,
-              response_format: str = "comprehensive") -> Dict[str, Any]:
+              response_format: str = "comprehensive",
+              filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Process a complete drug query through the RAG pipeline
         
@@ -138,6 +139,8 @@ class DrugRAGPipeline:
             k: Number of documents to retrieve
             include_sources: Whether to include source documents
             response_format: "simple", "comprehensive", or "structured"
+            filter: Optional metadata filter on form, marketing_status,
+                sponsor_name, application_no, drug_name or product_no, applied before vector scoring
             
         Returns:
             Complete response with answer, sources, and metadata
@@ -149,9 +152,14 @@ class DrugRAGPipeline:
         try:
             self.logger.info(f"Processing query: {question}")
             
+            # 0. Pick up a newly published index generation between requests
+            if self.vector_store.refresh_if_stale():
+                self.retriever.refresh_retriever()
+                self.logger.info(f"🔄 Switched to index generation {self.vector_store.db_name}")
+            
             # 1. Retrieve relevant documents using multi-query
             self.logger.info("🔍 Retrieving relevant documents...")
-            retrieved_docs = self.retriever.retrieve_documents(question, k=k)
+            retrieved_docs = self.retriever.retrieve_documents(question, k=k, filter=filter)
             
             if not retrieved_docs:
                 self.logger.warning("No documents retrieved")
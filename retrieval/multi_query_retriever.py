@@ -5,8 +5,9 @@ Implements advanced retrieval strategies adapted from the user's Jupyter noteboo
 
 import os
 import sys
+import logging
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # LangChain imports
@@ -20,10 +21,13 @@ from operator import itemgetter
 # Local imports
 sys.path.append(str(Path(__file__).parent.parent))
 from index.vectorstore import DrugVectorStore
+from index.metadata_index import validate_filter
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 class DrugMultiQueryRetriever:
     """
@@ -31,21 +35,36 @@ class DrugMultiQueryRetriever:
     Generates multiple perspectives of drug-related queries for better retrieval
     """
     
-    def __init__(self, vector_store: DrugVectorStore, model_name: str = "gpt-4o-mini"):
+    def __init__(self,
+                 vector_store: DrugVectorStore,
+                 model_name: str = "gpt-4o-mini",
+                 retrieval_mode: str = "dense",  # "dense" or "hybrid" (dense + BM25)
+                 name_shortcut: bool = False):
+        if retrieval_mode not in ("hybrid", "dense"):
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}")
         self.vector_store = vector_store
         self.model_name = model_name
+        self.retrieval_mode = retrieval_mode
+        # Opt-in, hybrid mode only: answer questions naming an indexed drug from BM25 over
+        # that drug's chunks alone (no query generation or embedding calls). Drug names that
+        # are ordinary words ("ALLERGY") would capture semantic questions, so it is off by default.
+        self.name_shortcut = name_shortcut
         self.llm = ChatOpenAI(model=model_name, temperature=0)
         
         # Get the basic retriever from vector store
-        if not vector_store.vectorstore:
+        if vector_store.vectorstore is None:
             raise ValueError("Vector store not loaded. Call load_vectorstore() first.")
         
-        self.retriever = vector_store.vectorstore.as_retriever()
+        self.retriever = vector_store.as_retriever()
         
         # Set up multi-query prompt template for drug queries
         self.setup_drug_query_prompt()
         self.setup_rag_prompt()
         
+    def refresh_retriever(self):
+        """Rebind the LangChain retriever after the vector store loaded a new index generation"""
+        self.retriever = self.vector_store.as_retriever()
+    
     def setup_drug_query_prompt(self):
         """Set up the prompt template for generating multiple drug query perspectives"""
         
@@ -111,19 +130,58 @@ Answer:"""
         # Return as Document objects
         return [loads(doc) for doc in unique_docs]
     
-    def retrieve_documents(self, question: str, k: int = 5) -> List:
+    def reciprocal_rank_fusion(self, results: List[List], k: int = 60) -> List:
+        """
+        Merge ranked document lists with reciprocal rank fusion
+        Each document scores the sum of 1 / (k + rank) over the lists it appears in
+        """
+        fused_scores = {}
+        for docs in results:
+            for rank, doc in enumerate(docs):
+                doc_str = dumps(doc)
+                fused_scores[doc_str] = fused_scores.get(doc_str, 0) + 1 / (rank + k)
+        
+        reranked = sorted(fused_scores.items(), key=lambda item: item[1], reverse=True)
+        return [loads(doc) for doc, _ in reranked]
+    
+    def retriever_k(self) -> int:
+        """Results per query of the LangChain retriever: its search_kwargs["k"], else Chroma's default of 4"""
+        search_kwargs = getattr(self.retriever, "search_kwargs", None)
+        if search_kwargs is not None:
+            return search_kwargs.get("k", 4)
+        return getattr(self.retriever, "k", 4)  # DrugVectorStoreRetriever (flat backend)
+    
+    def retrieve_documents(self, question: str, k: int = 5, filter: Optional[dict] = None) -> List:
         """
         Retrieve documents using multi-query strategy
         
         Args:
             question: Original user question
-            k: Number of documents to retrieve per query
+            k: Number of documents to retrieve per query, capped by the retriever's k (retriever_k)
+            filter: Metadata filter applied before vector scoring,
+                e.g. {"form": {"$contains": "injectable"}} (see DrugVectorStore.similarity_search_batch)
             
         Returns:
             List of unique retrieved documents
         """
+        if filter:
+            validate_filter(filter)  # fail loudly rather than inside the retrieval try block
         print(f"🔍 Original question: {question}")
         
+        if self.retrieval_mode == "hybrid" and self.name_shortcut and "drug_name" not in (filter or {}):
+            names = self.vector_store.drug_names_in(question)
+            if names:
+                # Rank only the named drugs' chunks, by the rest of the question's terms
+                name_filter = {**(filter or {}), "drug_name": names}
+                docs = self.vector_store.lexical_search_batch([question], k=k, filter=name_filter)[0]
+                if docs:
+                    message = (f"Exact drug name match ({', '.join(names)}): "
+                               f"{len(docs)} BM25 results, skipping query generation and dense search")
+                    print(f"🎯 {message}")
+                    logger.info(message)
+                    return docs
+                logger.info(f"Exact drug name match ({', '.join(names)}) found no BM25 results, using hybrid search")
+        
         # Generate multiple query perspectives
         print("🧠 Generating query variations...")
         queries = self.generate_queries.invoke({"question": question})
@@ -135,18 +193,44 @@ Answer:"""
         for i, query in enumerate(queries, 1):
             print(f"  {i}. {query}")
         
-        # Retrieve documents for each query
+        # Retrieve documents for all queries in one batched search, each limited to what
+        # self.retriever would return for it
         print("🔎 Retrieving documents for each query...")
+        per_query_k = min(k, self.retriever_k())
         all_documents = []
         
-        for i, query in enumerate(queries):
+        try:
+            all_documents = self.vector_store.similarity_search_batch(queries, k=per_query_k, filter=filter)
+            for i, docs in enumerate(all_documents):
+                print(f"  Query {i+1}: Retrieved {len(docs)} documents")
+        except Exception as e:
+            # Retry one query at a time so a failing query does not take the others with it
+            print(f"  Batched retrieval error - {e}, retrieving queries one at a time")
+            for i, query in enumerate(queries):
+                try:
+                    docs = self.vector_store.similarity_search_batch([query], k=per_query_k, filter=filter)[0]
+                    all_documents.append(docs)
+                    print(f"  Query {i+1}: Retrieved {len(docs)} documents")
+                except Exception as e:
+                    print(f"  Query {i+1}: Error - {e}")
+                    continue
+        
+        if self.retrieval_mode == "hybrid":
+            # BM25 results for the original question and each variation, fused with the dense lists
+            lexical_documents = []
             try:
-                docs = self.retriever.invoke(query)
-                all_documents.append(docs[:k])  # Limit to k documents per query
-                print(f"  Query {i+1}: Retrieved {len(docs[:k])} documents")
+                lexical_documents = self.vector_store.lexical_search_batch([question] + queries, k=per_query_k,
+                                                                           filter=filter)
+                print(f"  BM25: Retrieved {sum(len(docs) for docs in lexical_documents)} documents "
+                      f"for {len(lexical_documents)} queries")
             except Exception as e:
-                print(f"  Query {i+1}: Error - {e}")
-                continue
+                print(f"  Lexical retrieval error - {e}")
+            
+            # No more documents than the dense-only union could return
+            limit = per_query_k * max(1, len(queries))
+            fused_docs = self.reciprocal_rank_fusion(all_documents + lexical_documents)[:limit]
+            print(f"✅ Total unique documents retrieved: {len(fused_docs)} (hybrid, reciprocal rank fusion)")
+            return fused_docs
         
         # Get unique union of all retrieved documents
         unique_docs = self.get_unique_union(all_documents)
@@ -211,6 +295,7 @@ Answer:"""
         stats.update({
             "retrieval_model": self.model_name,
             "multi_query_enabled": True,
+            "retrieval_mode": self.retrieval_mode,
             "queries_per_question": 5
         })
         
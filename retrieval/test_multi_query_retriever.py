@@ -0,0 +1,154 @@
+import sys
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from index.vectorstore import DrugVectorStore
+from retrieval.multi_query_retriever import DrugMultiQueryRetriever
+
+FORMS = ["TABLET;ORAL", "CAPSULE;ORAL", "INJECTABLE;INJECTION", "CREAM;TOPICAL"]
+DRUGS = ["OZEMPIC", "METFORMIN", "LISINOPRIL", "ASPIRIN", "IBUPROFEN"]
+SPONSORS = ["PFIZER", "NOVARTIS", "LILLY", "MERCK"]
+RARE_SPONSOR = "ORPHAN PHARMA"
+
+
+def make_records(applications=60):
+    records = []
+    for a in range(applications):
+        drug = DRUGS[a % len(DRUGS)]
+        for p in range(1 + a % 2):
+            records.append({
+                "application_no": f"{a + 1:06d}",
+                "product_no": f"{p + 1:03d}",
+                "drug_name": drug,
+                "active_ingredient": f"{drug.lower()} hcl",
+                "form": FORMS[(a + p) % len(FORMS)],
+                "strength": f"{5 * (p + 1)}MG",
+                "marketing_status": "Prescription",
+                "sponsor_name": RARE_SPONSOR if a == 7 else SPONSORS[a % len(SPONSORS)],
+                "application_type": "NDA",
+                "description": f"{drug} is a {FORMS[(a + p) % len(FORMS)]} formulation.",
+            })
+    return records
+
+
+class FakeQueries:
+    """Stands in for the LLM query generation chain, recording the questions it was asked"""
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.questions = []
+
+    def __call__(self, inputs):
+        self.questions.append(inputs["question"])
+        return list(self.queries)
+
+
+class SpySearch:
+    """Wraps a store's similarity_search_batch, recording each call and failing batches of
+    several queries (the batch call) and any query in `failing`"""
+
+    def __init__(self, inner, fail_batches=False, failing=()):
+        self.inner = inner
+        self.fail_batches = fail_batches
+        self.failing = set(failing)
+        self.calls = []
+
+    def __call__(self, queries, k=5, filter=None):
+        self.calls.append((list(queries), k))
+        if (self.fail_batches and len(queries) > 1) or self.failing & set(queries):
+            raise RuntimeError("search failed")
+        return self.inner(queries, k=k, filter=filter)
+
+
+def texts_of(documents):
+    return sorted(doc.page_content for doc in documents)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DrugVectorStore(db_name=str(tmp_path / "db"), embedding_model="hashing",
+                            embedding_cache_path=None, backend="flat")
+    store.create_vectorstore(store.documents_from_records(make_records()))
+    return store
+
+
+def make_retriever(store, monkeypatch, queries=("metformin tablet", "oral diabetes drugs"), **options):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")  # the chat model is built but never called
+    retriever = DrugMultiQueryRetriever(store, **options)
+    fake = FakeQueries(queries)
+    retriever.generate_queries = RunnableLambda(fake)
+    return retriever, fake
+
+
+def test_reciprocal_rank_fusion_favours_documents_ranked_high_in_several_lists(store, monkeypatch):
+    retriever, _ = make_retriever(store, monkeypatch)
+    a, b, c = (Document(page_content=name, metadata={"drug_name": name}) for name in "ABC")
+
+    fused = retriever.reciprocal_rank_fusion([[a, b, c], [b, c]])
+    # a: 1/60; b: 1/61 + 1/60; c: 1/62 + 1/61
+    assert [doc.page_content for doc in fused] == ["B", "C", "A"]
+    assert [doc.page_content for doc in retriever.reciprocal_rank_fusion([[c], [], [a, c]])] == ["C", "A"]
+
+
+def test_dense_is_the_default_and_hybrid_fuses_lexical_results(store, monkeypatch):
+    retriever, fake = make_retriever(store, monkeypatch)
+    assert (retriever.retrieval_mode, retriever.name_shortcut) == ("dense", False)
+    retriever.retrieve_documents("What is the approval status of Ozempic?", k=3)
+    assert fake.questions == ["What is the approval status of Ozempic?"]  # no shortcut by default
+
+    retriever, _ = make_retriever(store, monkeypatch, retrieval_mode="hybrid")
+    docs = retriever.retrieve_documents("lisinopril", k=3, filter={"sponsor_name": RARE_SPONSOR})
+    assert 0 < len(docs) <= 3 * 2  # no more than the dense union of two variations could return
+    assert {doc.metadata["sponsor_name"] for doc in docs} == {RARE_SPONSOR}
+    # BM25 for the question itself contributes the rare sponsor's LISINOPRIL chunk
+    assert "LISINOPRIL" in {doc.metadata["drug_name"] for doc in docs}
+
+    with pytest.raises(ValueError):
+        DrugMultiQueryRetriever(store, retrieval_mode="sparse")
+
+
+def test_name_shortcut_answers_from_bm25_and_falls_back_when_it_finds_nothing(store, monkeypatch):
+    retriever, fake = make_retriever(store, monkeypatch, retrieval_mode="hybrid", name_shortcut=True)
+
+    docs = retriever.retrieve_documents("What is the approval status of Ozempic?", k=4)
+    assert len(docs) == 4
+    assert {doc.metadata["drug_name"] for doc in docs} == {"OZEMPIC"}
+    assert fake.questions == []  # no query generation
+
+    # The rare sponsor has no OZEMPIC products, so the shortcut finds nothing and hybrid search runs
+    docs = retriever.retrieve_documents("Is Ozempic an oral tablet?", k=4, filter={"sponsor_name": RARE_SPONSOR})
+    assert fake.questions == ["Is Ozempic an oral tablet?"]
+    assert docs
+    assert {doc.metadata["sponsor_name"] for doc in docs} == {RARE_SPONSOR}
+
+
+def test_each_query_returns_at_most_the_retrievers_k(store, monkeypatch):
+    retriever, _ = make_retriever(store, monkeypatch)
+    spy = SpySearch(store.similarity_search_batch)
+    monkeypatch.setattr(store, "similarity_search_batch", spy)
+
+    assert retriever.retriever_k() == 4  # Chroma's default
+    assert len(retriever.retrieve_documents("metformin", k=10)) <= 4 * 2
+    assert len(retriever.retrieve_documents("metformin", k=3)) <= 3 * 2
+    retriever.retriever = store.as_retriever(search_kwargs={"k": 2})
+    retriever.retrieve_documents("metformin", k=10)
+    assert [k for _, k in spy.calls] == [4, 3, 2]
+
+
+def test_a_failed_batch_falls_back_to_one_search_per_query(store, monkeypatch):
+    retriever, _ = make_retriever(store, monkeypatch)
+    spy = SpySearch(store.similarity_search_batch, fail_batches=True, failing=["oral diabetes drugs"])
+    monkeypatch.setattr(store, "similarity_search_batch", spy)
+
+    docs = retriever.retrieve_documents("metformin", k=3)
+    assert [queries for queries, _ in spy.calls] == [["metformin tablet", "oral diabetes drugs"],
+                                                     ["metformin tablet"], ["oral diabetes drugs"]]
+    # The query that failed on its own is skipped; the other one's results are kept
+    assert texts_of(docs) == texts_of(store.similarity_search("metformin tablet", k=3))